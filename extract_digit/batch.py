@@ -0,0 +1,296 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple, Sequence
+
+import numpy as np
+
+from .cache import DEFAULT_MAX_BYTES, ResultCache
+from .loader import open_frame_stack
+from .param_config import DEFAULT_CONFIG_PATH, Configurations
+from .pipeline import (
+    DisplayReading,
+    ExtractDigitPipeline,
+    MultiDisplayPipeline,
+)
+from .timing import StageRecord, StageTimer
+
+DIGIT_COLUMNS = ("4th-digit", "3rd-digit", "2nd-digit", "1st-digit")
+
+# The pipeline built once per worker process by `_init_worker`
+_worker_pipeline: ExtractDigitPipeline | MultiDisplayPipeline | None = None
+# The frame stack mapped once per worker process by `_init_frame_worker`
+_worker_stack: np.ndarray | None = None
+# Closes the cache of `_worker_pipeline`, at the latest when the process exits
+_worker_close_cache: Finalize | None = None
+
+
+class ImageResult(NamedTuple):
+    path: Path
+    # The digits of every display in the order of `digit_columns`
+    digits: list[str]
+    # `repr` of the exception if the image could not be processed
+    error: str | None = None
+    records: tuple[StageRecord, ...] = ()
+    # The index of the frame if `path` is a frame stack
+    frame_index: int | None = None
+
+    @property
+    def label(self) -> str:
+        """`path`, followed by "[<frame_index>]" for a frame of a stack"""
+        if self.frame_index is None:
+            return str(self.path)
+        return frame_label(self.path, self.frame_index)
+
+
+def frame_label(stack_path: str | Path, index: int) -> str:
+    return f"{stack_path}[{index}]"
+
+
+def digit_columns(cfg: Configurations) -> tuple[str, ...]:
+    """Columns of the digits of the results
+
+    Returns:
+        tuple[str, ...]: `DIGIT_COLUMNS`, or one set of them prefixed with "<name>." for each display of `cfg.displays`.
+    """  # noqa: E501
+    if not cfg.displays:
+        return DIGIT_COLUMNS
+    return tuple(
+        f"{display.name}.{column}"
+        for display in cfg.displays
+        for column in DIGIT_COLUMNS
+    )
+
+
+def _displays_result(
+    img_path: Path, readings: list[DisplayReading]
+) -> ImageResult:
+    errors = [f"{r.name}: {r.error}" for r in readings if r.error is not None]
+    return ImageResult(
+        img_path,
+        [digit for reading in readings for digit in reading.digits],
+        "; ".join(errors) or None,
+    )
+
+
+def _init_worker(
+    config_path: str | Path,
+    is_timed: bool = False,
+    cache_path: str | Path | None = None,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+) -> None:
+    global _worker_pipeline, _worker_close_cache
+    cfg = Configurations.load_json(config_path)
+    timer = StageTimer() if is_timed else None
+    if cfg.displays:
+        _worker_pipeline = MultiDisplayPipeline(cfg, timer)
+        return
+    # Each process opens its own connection to the cache
+    cache = (
+        None
+        if cache_path is None
+        else ResultCache(cache_path, cache_max_bytes)
+    )
+    if cache is not None:
+        # The workers of a pool exit without `_close_worker`, and the cache
+        # writes the statistics kept in memory when closed
+        _worker_close_cache = Finalize(cache, cache.close, exitpriority=10)
+    _worker_pipeline = ExtractDigitPipeline(cfg, timer, cache)
+
+
+def _read(
+    img_path: Path,
+    read: Callable[[ExtractDigitPipeline | MultiDisplayPipeline], list],
+    frame_index: int | None = None,
+) -> ImageResult:
+    pipeline = _worker_pipeline
+    if pipeline is None:
+        raise RuntimeError("`_init_worker` must be called first")
+    try:
+        if isinstance(pipeline, MultiDisplayPipeline):
+            result = _displays_result(img_path, read(pipeline))
+        else:
+            result = ImageResult(img_path, read(pipeline))
+    except Exception as e:
+        num_displays = (
+            len(pipeline.pipelines)
+            if isinstance(pipeline, MultiDisplayPipeline)
+            else 1
+        )
+        result = ImageResult(
+            img_path, [""] * len(DIGIT_COLUMNS) * num_displays, repr(e)
+        )
+    result = result._replace(frame_index=frame_index)
+    # Stage records are sent back with the digits, since the timer of a
+    # worker process is not visible to the main process
+    timer = pipeline.timer
+    if timer is not None:
+        result = result._replace(records=tuple(timer.records))
+        timer.reset()
+    return result
+
+
+def _process_one(img_path: Path) -> ImageResult:
+    return _read(img_path, lambda pipeline: pipeline.process_path(img_path))
+
+
+def _init_frame_worker(
+    config_path: str | Path,
+    is_timed: bool,
+    stack_path: str | Path,
+    frame_shape: tuple[int, int] | None,
+    offset: int,
+) -> None:
+    global _worker_stack
+    _init_worker(config_path, is_timed)
+    # Each process maps the file itself, so only indices are sent to it
+    _worker_stack = open_frame_stack(stack_path, frame_shape, offset)
+
+
+def _process_frame(stack_path: Path, index: int) -> ImageResult:
+    stack = _worker_stack
+    if stack is None:
+        raise RuntimeError("`_init_frame_worker` must be called first")
+    # A view of the mapping, which the crop reads without copying
+    frame = stack[index]
+
+    def read(pipeline: ExtractDigitPipeline | MultiDisplayPipeline) -> list:
+        if isinstance(pipeline, MultiDisplayPipeline):
+            # Frames are not decoded at the reduction of the displays
+            return pipeline.process(frame, is_reduced=False)
+        return pipeline.process(frame)
+
+    return _read(stack_path, read, index)
+
+
+def _close_worker() -> None:
+    global _worker_stack, _worker_close_cache
+    pipeline = _worker_pipeline
+    if isinstance(pipeline, MultiDisplayPipeline):
+        pipeline.close()
+    if _worker_close_cache is not None:
+        # Runs `close` once and unregisters it from the exit of the process
+        _worker_close_cache()
+        _worker_close_cache = None
+    _worker_stack = None
+
+
+def process_paths(
+    img_paths: Sequence[Path],
+    config_path: str | Path = DEFAULT_CONFIG_PATH,
+    workers: int = 1,
+    timer: StageTimer | None = None,
+    cache_path: str | Path | None = None,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+) -> Iterator[ImageResult]:
+    """Extracts digits from images, in parallel if `workers` > 1
+
+    An image that cannot be processed does not stop the others. Its digits
+    are empty and the error is set instead. If the configuration has
+    `displays`, the digits of every display are read from each image, and
+    the cache is not used.
+
+    Args:
+        img_paths (Sequence[Path]): Paths to the images.
+        config_path (str | Path, optional): Path to the configuration file. Defaults to DEFAULT_CONFIG_PATH.
+        workers (int, optional): Number of worker processes. Images are processed serially if 1. Defaults to 1.
+        timer (StageTimer | None, optional): The stages of every image, including those processed in the worker processes, are recorded in it. Defaults to None.
+        cache_path (str | Path | None, optional): Path to a `ResultCache` database shared by the workers. Nothing is cached if None. Defaults to None.
+        cache_max_bytes (int, optional): Maximum total size of the entries of the cache. Defaults to DEFAULT_MAX_BYTES.
+
+    Yields:
+        Iterator[ImageResult]: The result of each image in the order of `img_paths`.
+    """  # noqa: E501
+    is_timed = timer is not None
+    initargs = (config_path, is_timed, cache_path, cache_max_bytes)
+    if workers > 1:
+        # Small chunks so that results come back steadily and can be
+        # written as they complete
+        chunksize = max(1, min(len(img_paths) // (workers * 4), 16))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=initargs,
+        ) as executor:
+            # `map` yields the results in the order of `img_paths`
+            for result in executor.map(
+                _process_one, img_paths, chunksize=chunksize
+            ):
+                if timer is not None:
+                    timer.extend(result.records)
+                yield result
+    else:
+        _init_worker(*initargs)
+        try:
+            for img_path in img_paths:
+                result = _process_one(img_path)
+                if timer is not None:
+                    timer.extend(result.records)
+                yield result
+        finally:
+            _close_worker()
+
+
+def process_frame_stack(
+    stack_path: str | Path,
+    config_path: str | Path = DEFAULT_CONFIG_PATH,
+    workers: int = 1,
+    timer: StageTimer | None = None,
+    frame_shape: tuple[int, int] | None = None,
+    offset: int = 0,
+    indices: Sequence[int] | None = None,
+) -> Iterator[ImageResult]:
+    """Extracts digits from the frames of a stack, in parallel if `workers` > 1
+
+    The stack is mapped by `open_frame_stack` in every process, so the
+    workers only receive the indices of the frames and the frames are never
+    copied or pickled. The cache is not used.
+
+    Args:
+        stack_path (str | Path): Path to a `.npy` or raw file of grayscale frames.
+        config_path (str | Path, optional): Path to the configuration file. Defaults to DEFAULT_CONFIG_PATH.
+        workers (int, optional): Number of worker processes. Frames are processed serially if 1. Defaults to 1.
+        timer (StageTimer | None, optional): The stages of every frame are recorded in it. Defaults to None.
+        frame_shape (tuple[int, int] | None, optional): (height, width) of the frames of a raw file. Defaults to None.
+        offset (int, optional): Bytes of the header of a raw file to skip. Defaults to 0.
+        indices (Sequence[int] | None, optional): Frames to process. Every frame if None. Defaults to None.
+
+    Raises:
+        ValueError: If the file is not a stack of frames.
+
+    Yields:
+        Iterator[ImageResult]: The result of each frame in the order of `indices`, with its `frame_index`.
+    """  # noqa: E501
+    stack_path = Path(stack_path)
+    # Check the file before starting the workers
+    num_frames = len(open_frame_stack(stack_path, frame_shape, offset))
+    if indices is None:
+        indices = range(num_frames)
+    is_timed = timer is not None
+    initargs = (config_path, is_timed, stack_path, frame_shape, offset)
+    if workers > 1:
+        chunksize = max(1, min(len(indices) // (workers * 4), 16))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_frame_worker,
+            initargs=initargs,
+        ) as executor:
+            for result in executor.map(
+                _process_frame,
+                [stack_path] * len(indices),
+                indices,
+                chunksize=chunksize,
+            ):
+                if timer is not None:
+                    timer.extend(result.records)
+                yield result
+    else:
+        _init_frame_worker(*initargs)
+        try:
+            for index in indices:
+                result = _process_frame(stack_path, index)
+                if timer is not None:
+                    timer.extend(result.records)
+                yield result
+        finally:
+            _close_worker()
@@ -0,0 +1,282 @@
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Sequence
+
+import cv2
+import numpy as np
+
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.processing import AllocationCounter
+from extract_digit.synthetic import (
+    expected_digits,
+    random_reading,
+    render_photo,
+    synthetic_config,
+)
+from extract_digit.timing import StageTimer
+
+DEFAULT_RESOLUTIONS = ((720, 960), (2000, 2500), (3000, 4000))
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _environment() -> dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def _latency_summary(latencies: Sequence[float]) -> dict[str, float]:
+    latency = np.array(latencies)
+    return {
+        "mean": float(latency.mean()),
+        "p50": float(np.percentile(latency, 50)),
+        "p95": float(np.percentile(latency, 95)),
+        "max": float(latency.max()),
+    }
+
+
+def benchmark_case(
+    img_size: tuple[int, int],
+    num_images: int = 20,
+    mode: str = "full",
+    noise: float = 4.0,
+    rotation: float = 7.0,
+    skew: float = 0.05,
+    seed: int = 0,
+    work_dir: str | Path | None = None,
+    engine: str = "contours",
+    scale: float = 1.0,
+) -> dict[str, Any]:
+    """Measures the pipeline on synthetic photos of one resolution
+
+    Half of the photos show 3 digits and the other half "1" and 3 digits.
+    They are written as JPEG files so that decoding is measured as well.
+
+    Args:
+        img_size (tuple[int, int]): Size of the photos. (height, width)
+        num_images (int, optional): Number of photos. Defaults to 20.
+        mode (str, optional): Binalization mode. Defaults to "full".
+        noise (float, optional): Standard deviation of the Gaussian noise. Defaults to 4.0.
+        rotation (float, optional): Rotation of the display in degrees. Defaults to 7.0.
+        skew (float, optional): How much shorter the right edge of the display is than the left edge. Defaults to 0.05.
+        seed (int, optional): Seed of the readings and the noise. Defaults to 0.
+        work_dir (str | Path | None, optional): Where the photos are written. A temporary directory if None. Defaults to None.
+        engine (str, optional): How the area of digits is extracted. Defaults to "contours".
+        scale (float, optional): `crop_transform.scale` of the pipeline. Defaults to 1.0.
+
+    Returns:
+        dict[str, Any]: Accuracy, end-to-end latency and throughput, arrays allocated to extract the area of digits per image, and the summary of each stage. Times are in seconds.
+    """  # noqa: E501
+    cfg = synthetic_config(img_size, rotation, skew)
+    cfg.binalize.mode = mode  # type: ignore
+    cfg.filtering_digit.engine = engine  # type: ignore
+    cfg.crop_transform.scale = scale
+    timer = StageTimer()
+    allocations = AllocationCounter()
+    pipeline = ExtractDigitPipeline(cfg, timer, allocations=allocations)
+    rng = np.random.default_rng(seed)
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        readings = []
+        img_paths = []
+        for i in range(num_images):
+            reading = random_reading(rng, 3 + i % 2)
+            img = render_photo(
+                reading,
+                cfg.crop_transform.crop_area_vertices,
+                img_size,
+                noise,
+                rng,
+            )
+            img_path = Path(tmp_dir) / f"{i:05d}.jpg"
+            cv2.imwrite(str(img_path), img)
+            readings.append(reading)
+            img_paths.append(img_path)
+
+        # Warm up so that the first image does not pay for lazy setup
+        pipeline.process_path(img_paths[0])
+        timer.reset()
+
+        latencies = []
+        misread = []
+        num_arrays = []
+        num_bytes = []
+        start = time.perf_counter()
+        for reading, img_path in zip(readings, img_paths):
+            img_start = time.perf_counter()
+            try:
+                digits = pipeline.process_path(img_path)
+            except Exception:
+                digits = [""] * 4
+            latencies.append(time.perf_counter() - img_start)
+            num_arrays.append(allocations.num_arrays)
+            num_bytes.append(allocations.num_bytes)
+            if digits != expected_digits(reading):
+                misread.append({"reading": reading, "digits": digits})
+        elapsed = time.perf_counter() - start
+
+    return {
+        "img_size": list(img_size),
+        "mode": mode,
+        "engine": engine,
+        "scale": scale,
+        "noise": noise,
+        "rotation": rotation,
+        "skew": skew,
+        "num_images": num_images,
+        "accuracy": 1 - len(misread) / num_images,
+        "misread": misread,
+        "throughput": num_images / elapsed,
+        "latency": _latency_summary(latencies),
+        "allocations": {
+            "num_arrays": float(np.mean(num_arrays)),
+            "num_bytes": float(np.mean(num_bytes)),
+        },
+        "stages": [s._asdict() for s in timer.summary()],
+    }
+
+
+def run_benchmark(
+    resolutions: Sequence[tuple[int, int]] = DEFAULT_RESOLUTIONS,
+    modes: Sequence[str] = ("full",),
+    num_images: int = 20,
+    noise: float = 4.0,
+    rotation: float = 7.0,
+    skew: float = 0.05,
+    seed: int = 0,
+    engines: Sequence[str] = ("contours",),
+    scales: Sequence[float] = (1.0,),
+) -> dict[str, Any]:
+    """Runs `benchmark_case` for every resolution, mode, engine and scale
+
+    Returns:
+        dict[str, Any]: The environment and the result of each case.
+    """
+    cases = [
+        benchmark_case(
+            img_size,
+            num_images,
+            mode,
+            noise,
+            rotation,
+            skew,
+            seed,
+            engine=engine,
+            scale=scale,
+        )
+        for img_size in resolutions
+        for mode in modes
+        for engine in engines
+        for scale in scales
+    ]
+    return {"environment": _environment(), "cases": cases}
+
+
+def _parse_resolution(txt: str) -> tuple[int, int]:
+    height, width = txt.lower().split("x")
+    return int(height), int(width)
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(
+        "size        mode  engine      scale  accuracy  img/s    p50 [ms]  "
+        "p95 [ms]  arrays/img"
+    )
+    for case in report["cases"]:
+        height, width = case["img_size"]
+        print(
+            f"{height:>4}x{width:<6} {case['mode']:<5} {case['engine']:<10}  "
+            f"{case['scale']:>5.2f}  {case['accuracy']:>8.1%}  "
+            f"{case['throughput']:>7.1f}  "
+            f"{case['latency']['p50'] * 1000:>8.2f}  "
+            f"{case['latency']['p95'] * 1000:>8.2f}  "
+            f"{case['allocations']['num_arrays']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Measures the speed and accuracy of the pipeline on synthetic "
+            "photos of the display."
+        )
+    )
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        type=_parse_resolution,
+        default=list(DEFAULT_RESOLUTIONS),
+        help="Sizes of the photos as HEIGHTxWIDTH.",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["full"],
+        choices=["full", "fast", "otsu", "auto"],
+        help="Binalization modes to compare.",
+    )
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=["contours"],
+        choices=["contours", "components"],
+        help="Engines extracting the area of digits to compare.",
+    )
+    parser.add_argument(
+        "--scales",
+        nargs="+",
+        type=float,
+        default=[1.0],
+        help="Values of crop_transform.scale to compare, e.g. 1 0.75 0.5.",
+    )
+    parser.add_argument("--num-images", type=int, default=20)
+    parser.add_argument("--noise", type=float, default=4.0)
+    parser.add_argument("--rotation", type=float, default=7.0)
+    parser.add_argument("--skew", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        default="benchmark.json",
+        help="Path of the JSON report.",
+    )
+    args = parser.parse_args()
+    report = run_benchmark(
+        args.resolutions,
+        args.modes,
+        args.num_images,
+        args.noise,
+        args.rotation,
+        args.skew,
+        args.seed,
+        args.engines,
+        args.scales,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    _print_report(report)
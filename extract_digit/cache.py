@@ -0,0 +1,288 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+from pydantic import BaseModel
+
+from .lookup import lookup_index_hash
+from .param_config import Configurations
+
+# Bump this when a change of the pipeline changes its intermediate images or
+# readings, so that old entries are never reused.
+CACHE_VERSION = 2
+DEFAULT_MAX_BYTES = 1 << 30
+
+CACHE_KINDS = ("crop", "mask", "reading")
+
+
+class CacheKeys(NamedTuple):
+    crop: str
+    mask: str
+    reading: str
+
+
+class CacheStats(NamedTuple):
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _hash(*parts: bytes | str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode() if isinstance(part, str) else part)
+        # Separate the parts so that ("ab", "c") and ("a", "bc") differ
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _model_json(model: BaseModel, exclude: set[str] | None = None) -> str:
+    return model.model_dump_json(exclude=exclude)
+
+
+def cache_keys(content: bytes, cfg: Configurations) -> CacheKeys:
+    """Keys of the intermediate images and the reading of an image
+
+    Each key only depends on the content of the image and the parameters of
+    the stages up to it, so for example a change of `EstimationParams` keeps
+    the keys of the crop and the mask.
+
+    Args:
+        content (bytes): Content of the image file.
+        cfg (Configurations): The configuration of the pipeline.
+
+    Returns:
+        CacheKeys: Keys of the rectified crop, the binary mask and the reading.
+    """  # noqa: E501
+    content_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+    crop = _hash(
+        str(CACHE_VERSION),
+        content_hash,
+        # Only change how the crop is shown
+        _model_json(cfg.crop_transform, {"imshow", "close_up_area"}),
+    )
+    mask_parts = [crop, _model_json(cfg.binalize)]
+    if cfg.binalize.mode == "auto":
+        # The fallback of "auto" depends on the filtering of contours
+        mask_parts.append(_model_json(cfg.filtering_digit))
+    mask = _hash(*mask_parts)
+    reading_parts = [
+        mask,
+        _model_json(cfg.filtering_digit),
+        _model_json(cfg.estimation),
+    ]
+    if (
+        cfg.estimation.engine == "lookup"
+        and cfg.estimation.lookup_index is not None
+    ):
+        # The index may be rewritten at the same path
+        reading_parts.append(lookup_index_hash(cfg.estimation.lookup_index))
+    reading = _hash(*reading_parts)
+    return CacheKeys(f"crop:{crop}", f"mask:{mask}", f"reading:{reading}")
+
+
+class ResultCache:
+    """Caches readings and intermediate images in a SQLite database
+
+    Entries are evicted in least recently used order when their total size
+    exceeds `max_bytes`. The database can be shared by worker processes.
+    Hits and misses of each kind of entry are counted both for this
+    instance (`session_stats`) and for every instance (`stats`).
+
+    A lookup only reads the database. The access times of the entries and
+    the hits and misses are kept in memory and written every `flush_every`
+    lookups, before an eviction and when closed, so that concurrent
+    lookups of workers do not wait for each other's writes.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        flush_every: int = 256,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.session_stats = {kind: CacheStats() for kind in CACHE_KINDS}
+        # Not written to the database yet
+        self._unflushed_stats = {kind: CacheStats() for kind in CACHE_KINDS}
+        self._unflushed_accesses: dict[str, float] = {}
+        self._num_unflushed = 0
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access "
+            "ON entries (last_access)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stats ("
+            "kind TEXT PRIMARY KEY, hits INTEGER NOT NULL, "
+            "misses INTEGER NOT NULL)"
+        )
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO stats VALUES (?, 0, 0)",
+                [(kind,) for kind in CACHE_KINDS],
+            )
+        # Estimated total size of the entries. It is synchronized with the
+        # database from time to time, since other processes also add entries.
+        self._total_bytes = self.total_bytes
+        self._num_puts = 0
+
+    def _get(self, key: str) -> bytes | None:
+        kind = key.split(":", 1)[0]
+        row = self._conn.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        is_hit = row is not None
+        if is_hit:
+            self._unflushed_accesses[key] = time.time()
+        for stats in (self.session_stats, self._unflushed_stats):
+            hits, misses = stats[kind]
+            stats[kind] = CacheStats(hits + is_hit, misses + (not is_hit))
+        self._num_unflushed += 1
+        if self._num_unflushed >= self.flush_every:
+            self.flush()
+        return None if row is None else bytes(row[0])
+
+    def flush(self) -> None:
+        """Writes the access times and the statistics kept in memory"""
+        if self._num_unflushed == 0:
+            return
+        with self._conn:
+            # Another process may have used an entry later
+            self._conn.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?) "
+                "WHERE key = ?",
+                [(t, key) for key, t in self._unflushed_accesses.items()],
+            )
+            self._conn.executemany(
+                "UPDATE stats SET hits = hits + ?, misses = misses + ? "
+                "WHERE kind = ?",
+                [
+                    (hits, misses, kind)
+                    for kind, (hits, misses) in self._unflushed_stats.items()
+                ],
+            )
+        self._unflushed_stats = {kind: CacheStats() for kind in CACHE_KINDS}
+        self._unflushed_accesses = {}
+        self._num_unflushed = 0
+
+    def _put(self, key: str, value: bytes) -> None:
+        with self._conn:
+            replaced = self._conn.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+        self._total_bytes += len(value) - (
+            0 if replaced is None else replaced[0]
+        )
+        self._num_puts += 1
+        if self._num_puts % 64 == 0:
+            self._total_bytes = self.total_bytes
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Deletes the least recently used entries until they fit"""
+        self.flush()
+        excess = self.total_bytes - self.max_bytes
+        if excess > 0:
+            self._delete_oldest(excess)
+        self._total_bytes = self.total_bytes
+
+    def _delete_oldest(self, num_bytes: int) -> None:
+        with self._conn:
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access"
+            )
+            keys = []
+            # The cursor reads the rows lazily, so only the deleted rows are
+            # fetched
+            for key, size in rows:
+                keys.append((key,))
+                num_bytes -= size
+                if num_bytes <= 0:
+                    break
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+
+    @property
+    def total_bytes(self) -> int:
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return int(total)
+
+    def get_array(self, key: str) -> np.ndarray | None:
+        value = self._get(key)
+        if value is None:
+            return None
+        img = cv2.imdecode(
+            np.frombuffer(value, np.uint8), cv2.IMREAD_UNCHANGED
+        )
+        if img is None:
+            raise ValueError(f"The entry of {key} is broken")
+        return np.asarray(img)
+
+    def put_array(self, key: str, img: np.ndarray) -> None:
+        # PNG is lossless, and binary masks compress very well
+        ok, encoded = cv2.imencode(
+            ".png", img, [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        )
+        if not ok:
+            raise ValueError(f"Could not encode an image of {key}")
+        self._put(key, encoded.tobytes())
+
+    def get_reading(self, key: str) -> list[str] | None:
+        value = self._get(key)
+        if value is None:
+            return None
+        digits: list[str] = json.loads(value)
+        return digits
+
+    def put_reading(self, key: str, digits: list[str]) -> None:
+        self._put(key, json.dumps(digits).encode())
+
+    def stats(self) -> dict[str, CacheStats]:
+        """Hits and misses counted by every instance using the database
+
+        The counts of other instances are those they have flushed.
+        """
+        self.flush()
+        rows = self._conn.execute("SELECT kind, hits, misses FROM stats")
+        return {kind: CacheStats(hits, misses) for kind, hits, misses in rows}
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
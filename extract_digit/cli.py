@@ -0,0 +1,883 @@
+import argparse
+import asyncio
+import contextlib
+import glob
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence, TextIO
+
+import cv2
+import numpy as np
+
+from .batch import (
+    DIGIT_COLUMNS,
+    ImageResult,
+    digit_columns,
+    frame_label,
+    process_frame_stack,
+    process_paths,
+)
+from .cache import DEFAULT_MAX_BYTES, CacheStats, ResultCache
+from .estimate_digit import classify_digits, split_digits_image
+from .loader import FRAME_STACK_SUFFIXES, open_frame_stack
+from .lookup import LOOKUP_MASK_SIZE, LookupClassifier, read_digit_folder
+from .param_config import (
+    DEFAULT_CONFIG_PATH,
+    Configurations,
+    LocalizeParams,
+)
+from .pipeline import ExtractDigitPipeline
+from .ring import process_paths_shared
+from .service import DigitService, serve
+from .sweep import read_labels, sweep, sweep_columns, sweep_row
+from .timing import StageTimer
+from .writer import (
+    KEY_COLUMNS,
+    FileKey,
+    ResultFormat,
+    ResultWriter,
+    read_done_keys,
+)
+
+# Exit codes
+EXIT_OK = 0
+# Some images could not be processed. The others are still written.
+EXIT_FAILED_IMAGES = 1
+# Wrong arguments, configuration or inputs. Nothing is processed.
+EXIT_USAGE = 2
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def output_columns(digit_cols: Sequence[str]) -> tuple[str, ...]:
+    return ("path", *digit_cols, "error", *KEY_COLUMNS[1:])
+
+
+OUTPUT_COLUMNS = output_columns(DIGIT_COLUMNS)
+
+
+def _is_image(path: Path) -> bool:
+    return path.suffix.lower() in IMAGE_SUFFIXES + FRAME_STACK_SUFFIXES
+
+
+def _is_frame_stack(path: Path) -> bool:
+    return path.suffix.lower() in FRAME_STACK_SUFFIXES
+
+
+def _frame_shape(text: str) -> tuple[int, int]:
+    """Parses "<height>x<width>" of --frame-shape and --size"""
+    try:
+        height, width = map(int, text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected <height>x<width>, but {text!r}"
+        ) from None
+    return height, width
+
+
+def find_images(
+    inputs: Sequence[str],
+    recursive: bool = False,
+    stdin: TextIO | None = None,
+) -> list[Path]:
+    """Finds images from paths, glob patterns and directories
+
+    Frame stacks (`FRAME_STACK_SUFFIXES`) are found like images.
+
+    Args:
+        inputs (Sequence[str]): Paths to images or directories, or glob patterns. "-" reads one path per line from `stdin`.
+        recursive (bool, optional): Whether to search the subdirectories of the directories. "**" in a glob pattern always matches subdirectories. Defaults to False.
+        stdin (TextIO | None, optional): Where the paths of "-" are read from. Defaults to `sys.stdin`.
+
+    Raises:
+        FileNotFoundError: If a path does not exist or a pattern matches nothing.
+
+    Returns:
+        list[Path]: Paths to the images without duplicates. The images of a directory or a pattern are sorted.
+    """  # noqa: E501
+    img_paths: list[Path] = []
+    for item in inputs:
+        if item == "-":
+            lines = (stdin or sys.stdin).read().splitlines()
+            img_paths.extend(Path(line) for line in lines if line.strip())
+            continue
+        path = Path(item)
+        if path.is_dir():
+            files = path.rglob("*") if recursive else path.iterdir()
+            img_paths.extend(
+                sorted(p for p in files if p.is_file() and _is_image(p))
+            )
+        elif path.is_file():
+            img_paths.append(path)
+        elif glob.has_magic(item):
+            matches = sorted(Path(p) for p in glob.glob(item, recursive=True))
+            if not matches:
+                raise FileNotFoundError(f"No file matches {item}")
+            img_paths.extend(p for p in matches if _is_image(p))
+        else:
+            raise FileNotFoundError(f"No such file or directory: {item}")
+    # Remove duplicates keeping the order
+    return list(dict.fromkeys(img_paths))
+
+
+def _to_row(
+    result: ImageResult, digit_cols: Sequence[str] = DIGIT_COLUMNS
+) -> dict[str, Any]:
+    key = FileKey.of(result.path)
+    return {
+        "path": result.label,
+        **dict(zip(digit_cols, result.digits)),
+        "error": result.error or "",
+        "size": None if key is None else key.size,
+        "mtime_ns": None if key is None else key.mtime_ns,
+    }
+
+
+def write_results(
+    results: Iterable[ImageResult],
+    writer: ResultWriter,
+    digit_cols: Sequence[str] = DIGIT_COLUMNS,
+) -> tuple[int, int]:
+    """Writes results as they come
+
+    Returns:
+        tuple[int, int]: Number of images and number of failed images.
+    """
+    num_images = num_failed = 0
+    for result in results:
+        writer.write(_to_row(result, digit_cols))
+        num_images += 1
+        num_failed += result.error is not None
+    writer.flush()
+    return num_images, num_failed
+
+
+def write_parquet(
+    results: Iterable[ImageResult],
+    out_path: str | Path,
+    digit_cols: Sequence[str] = DIGIT_COLUMNS,
+) -> tuple[int, int]:
+    """Writes results as Parquet with polars
+
+    Unlike CSV and JSON Lines, every row is kept in memory until the end.
+
+    Returns:
+        tuple[int, int]: Number of images and number of failed images.
+    """
+    import polars as pl
+
+    rows = [_to_row(result, digit_cols) for result in results]
+    schema = {
+        column: pl.Int64 if column in KEY_COLUMNS[1:] else pl.String
+        for column in output_columns(digit_cols)
+    }
+    pl.DataFrame(rows, schema=schema).write_parquet(out_path)
+    num_failed = sum(row["error"] != "" for row in rows)
+    return len(rows), num_failed
+
+
+def _report_errors(results: Iterable[ImageResult]) -> Iterator[ImageResult]:
+    for result in results:
+        if result.error is not None:
+            print(
+                f"Failed to extract digits from {result.label}: "
+                f"{result.error}",
+                file=sys.stderr,
+            )
+        yield result
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="extract-digit",
+        description="Reads digits of 7 segments displays from images.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser(
+        "run",
+        help="Extracts digits from images and writes a table.",
+        description=(
+            "Extracts digits from images and writes a table. Exits with 0 "
+            f"if every image was read, {EXIT_FAILED_IMAGES} if some images "
+            f"failed and {EXIT_USAGE} if the arguments were wrong."
+        ),
+    )
+    run.add_argument(
+        "inputs",
+        nargs="+",
+        help=(
+            "Images, directories or glob patterns. "
+            "'-' reads one path per line from the standard input."
+        ),
+    )
+    run.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="Searches the subdirectories of the directories.",
+    )
+    run.add_argument(
+        "--config",
+        default=str(DEFAULT_CONFIG_PATH),
+        help="Path to the configuration file.",
+    )
+    run.add_argument(
+        "-o",
+        "--out",
+        default="-",
+        help="Output file. '-' writes to the standard output.",
+    )
+    run.add_argument(
+        "--format",
+        choices=["csv", "jsonl", "parquet"],
+        default=None,
+        help="Output format. Guessed from the suffix of --out, else csv.",
+    )
+    run.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Appends to --out and skips the images already in it, "
+            "identified by path, size and modification time."
+        ),
+    )
+    run.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes.",
+    )
+    run.add_argument(
+        "--shared-memory",
+        action="store_true",
+        help=(
+            "Reads and crops images in --workers processes, and binalizes "
+            "and estimates them in one more process each, handing the "
+            "images over through shared memory."
+        ),
+    )
+    run.add_argument(
+        "--slots",
+        type=int,
+        default=8,
+        help="Number of images in shared memory at once.",
+    )
+    run.add_argument(
+        "--frame-shape",
+        type=_frame_shape,
+        help=(
+            "<height>x<width> of the uint8 frames of raw frame stacks. "
+            f"Inputs with the suffixes {', '.join(FRAME_STACK_SUFFIXES)} "
+            "are read as stacks of grayscale frames."
+        ),
+    )
+    run.add_argument(
+        "--frame-offset",
+        type=int,
+        default=0,
+        help="Bytes of the header of raw frame stacks to skip.",
+    )
+    run.add_argument(
+        "--profile",
+        help="Writes the time spent in each stage to this JSON or CSV file.",
+    )
+    run.add_argument(
+        "--cache",
+        help=(
+            "SQLite file that caches readings, crops and masks by the "
+            "content of the images and the parameters of the stages."
+        ),
+    )
+    run.add_argument(
+        "--cache-size",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 2**20,
+        help="Maximum size of the cache in MiB. Old entries are evicted.",
+    )
+
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Evaluates a grid of parameters against labeled images.",
+        description=(
+            "Reads labeled images with every combination of a grid of "
+            "binalize, filtering_digit and estimation parameters and "
+            "writes the accuracy of each combination, best first."
+        ),
+    )
+    sweep_parser.add_argument(
+        "labels",
+        help=(
+            "CSV file with the columns path, "
+            f"{', '.join(DIGIT_COLUMNS)}, e.g. a corrected output of run. "
+            "Relative paths are relative to the working directory."
+        ),
+    )
+    sweep_parser.add_argument(
+        "grid",
+        help=(
+            "JSON file of the values to try, e.g. "
+            '{"binalize": {"adaptive_thresh_C": [1, 3, 5]}}.'
+        ),
+    )
+    sweep_parser.add_argument(
+        "--config",
+        default=str(DEFAULT_CONFIG_PATH),
+        help="The configuration whose parameters are replaced.",
+    )
+    sweep_parser.add_argument(
+        "-o",
+        "--out",
+        default="-",
+        help="Output CSV file. '-' writes to the standard output.",
+    )
+    sweep_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes.",
+    )
+    sweep_parser.add_argument(
+        "--best-config",
+        help="Writes the configuration of the best combination to this file.",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Reads digits from images sent over HTTP.",
+        description=(
+            "Serves POST /read, which takes the content of an image file "
+            "and returns its digits as JSON, and GET /stats. Stops after "
+            "answering the accepted requests on SIGINT or SIGTERM."
+        ),
+    )
+    serve_parser.add_argument(
+        "--config",
+        default=str(DEFAULT_CONFIG_PATH),
+        help="Path to the configuration file.",
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument(
+        "--unix", help="Listens on this Unix socket instead of a TCP port."
+    )
+    serve_parser.add_argument(
+        "--threads",
+        type=int,
+        default=2,
+        help="Number of threads that run the OpenCV stages.",
+    )
+    serve_parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=16,
+        help="Images waiting beyond this are rejected with 503.",
+    )
+    serve_parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=8,
+        help="Maximum number of images estimated at once.",
+    )
+    serve_parser.add_argument(
+        "--max-batch-delay",
+        type=float,
+        default=5.0,
+        help="Milliseconds to wait for more images to estimate at once.",
+    )
+
+    locate_parser = subparsers.add_parser(
+        "locate",
+        help="Finds the display in an image.",
+        description=(
+            "Finds the display in an image and writes its vertices as the "
+            "crop_area_vertices of a configuration file."
+        ),
+    )
+    locate_parser.add_argument("image", help="Path to an image.")
+    locate_parser.add_argument(
+        "--config",
+        default=str(DEFAULT_CONFIG_PATH),
+        help=(
+            "The configuration whose dst_size and localize parameters are "
+            "used."
+        ),
+    )
+
+    export_parser = subparsers.add_parser(
+        "export-digits",
+        help="Writes the images of labeled digits.",
+        description=(
+            "Writes the image of each labeled digit of labeled images as "
+            "<out_dir>/<digit>/<image>_<column>.png, the training data of "
+            "train-lookup."
+        ),
+    )
+    export_parser.add_argument(
+        "labels",
+        help=(
+            "CSV file with the columns path, "
+            f"{', '.join(DIGIT_COLUMNS)}, e.g. a corrected output of run. "
+            "Relative paths are relative to the working directory."
+        ),
+    )
+    export_parser.add_argument("out_dir", help="Output directory.")
+    export_parser.add_argument(
+        "--config",
+        default=str(DEFAULT_CONFIG_PATH),
+        help="Path to the configuration file.",
+    )
+
+    train_parser = subparsers.add_parser(
+        "train-lookup",
+        help="Builds the index of the lookup engine.",
+        description=(
+            "Builds the index of the lookup engine of estimation from "
+            "folders of digit images written by export-digits. With "
+            "--test, compares its accuracy and speed with the rule-based "
+            "estimation."
+        ),
+    )
+    train_parser.add_argument(
+        "digits_dir", help="Folder with a subfolder of images per digit."
+    )
+    train_parser.add_argument(
+        "-o", "--out", required=True, help="Output .npz file of the index."
+    )
+    train_parser.add_argument(
+        "--size",
+        type=_frame_shape,
+        default=LOOKUP_MASK_SIZE,
+        help=(
+            "<height>x<width> of the masks. Defaults to "
+            f"{LOOKUP_MASK_SIZE[0]}x{LOOKUP_MASK_SIZE[1]}."
+        ),
+    )
+    train_parser.add_argument(
+        "--test",
+        help="Folder of digit images, like digits_dir, to evaluate on.",
+    )
+    train_parser.add_argument(
+        "--config",
+        default=str(DEFAULT_CONFIG_PATH),
+        help=(
+            "The configuration whose filling_area_ratio_thresh the "
+            "rule-based estimation is compared with."
+        ),
+    )
+    return parser
+
+
+def _guess_format(out: str) -> str:
+    suffix = Path(out).suffix.lower().lstrip(".")
+    if suffix in ("jsonl", "parquet"):
+        return suffix
+    return "csv"
+
+
+def _error(message: str) -> int:
+    print(f"extract-digit: error: {message}", file=sys.stderr)
+    return EXIT_USAGE
+
+
+def _cache_stats(path: str) -> dict[str, CacheStats]:
+    with ResultCache(path) as cache:
+        return cache.stats()
+
+
+def _report_cache_stats(
+    before: dict[str, CacheStats], after: dict[str, CacheStats]
+) -> None:
+    for kind, (hits, misses) in after.items():
+        stats = CacheStats(
+            hits - before[kind].hits, misses - before[kind].misses
+        )
+        print(
+            f"Cache of {kind}: {stats.hits} hits, {stats.misses} misses "
+            f"({stats.hit_rate:.0%})",
+            file=sys.stderr,
+        )
+
+
+def _check_args(args: argparse.Namespace, fmt: str) -> str | None:
+    """Returns the error message of wrong arguments, or None"""
+    if fmt == "parquet" and args.out == "-":
+        return "--out is required for parquet"
+    if args.resume and (fmt == "parquet" or args.out == "-"):
+        return "--resume needs a CSV or JSON Lines file as --out"
+    if args.workers < 1:
+        return "--workers must be 1 or more"
+    if args.cache_size <= 0:
+        return "--cache-size must be positive"
+    if args.frame_offset < 0:
+        return "--frame-offset must not be negative"
+    if args.slots < 1:
+        return "--slots must be 1 or more"
+    if args.shared_memory and args.cache is not None:
+        return "--shared-memory does not support --cache"
+    return None
+
+
+def _write(
+    results: Iterable[ImageResult],
+    args: argparse.Namespace,
+    fmt: str,
+    digit_cols: Sequence[str],
+    out: TextIO,
+) -> tuple[int, int]:
+    if fmt == "parquet":
+        return write_parquet(results, args.out, digit_cols)
+    text_fmt: ResultFormat = "jsonl" if fmt == "jsonl" else "csv"
+    columns = output_columns(digit_cols)
+    if args.out == "-":
+        return write_results(
+            results, ResultWriter(out, columns, text_fmt), digit_cols
+        )
+    with ResultWriter.open(
+        args.out, columns, text_fmt, append=args.resume
+    ) as writer:
+        return write_results(results, writer, digit_cols)
+
+
+def _num_frames(stack_path: Path, args: argparse.Namespace) -> int:
+    return len(
+        open_frame_stack(stack_path, args.frame_shape, args.frame_offset)
+    )
+
+
+def _undone_frames(
+    stack_path: Path, frames: Sequence[int], done_keys: set[FileKey]
+) -> list[int]:
+    key = FileKey.of(stack_path)
+    if key is None:
+        return list(frames)
+    return [
+        index
+        for index in frames
+        if key._replace(path=frame_label(key.path, index)) not in done_keys
+    ]
+
+
+def _process_inputs(
+    img_paths: Sequence[Path],
+    stack_frames: dict[Path, Sequence[int]],
+    args: argparse.Namespace,
+    timer: StageTimer | None,
+) -> Iterator[ImageResult]:
+    if img_paths and args.shared_memory:
+        yield from process_paths_shared(
+            img_paths, args.config, args.workers, args.slots, timer
+        )
+    elif img_paths:
+        yield from process_paths(
+            img_paths,
+            args.config,
+            args.workers,
+            timer,
+            cache_path=args.cache,
+            cache_max_bytes=int(args.cache_size * 2**20),
+        )
+    for stack_path, frames in stack_frames.items():
+        if frames:
+            yield from process_frame_stack(
+                stack_path,
+                args.config,
+                args.workers,
+                timer,
+                frame_shape=args.frame_shape,
+                offset=args.frame_offset,
+                indices=frames,
+            )
+
+
+def run(args: argparse.Namespace) -> int:
+    fmt = args.format or _guess_format(args.out)
+    text_fmt: ResultFormat = "jsonl" if fmt == "jsonl" else "csv"
+    message = _check_args(args, fmt)
+    if message is not None:
+        return _error(message)
+    cache_stats: dict[str, CacheStats] = {}
+    try:
+        # Validate the configuration before starting the workers
+        cfg = Configurations.load_json(args.config)
+        if cfg.displays and args.cache is not None:
+            raise ValueError("--cache does not support displays")
+        if cfg.displays and args.shared_memory:
+            raise ValueError("--shared-memory does not support displays")
+        img_paths = find_images(args.inputs, args.recursive)
+        # Frames of each stack, which are processed after the images
+        stack_frames: dict[Path, Sequence[int]] = {
+            path: range(_num_frames(path, args))
+            for path in img_paths
+            if _is_frame_stack(path)
+        }
+        img_paths = [p for p in img_paths if not _is_frame_stack(p)]
+        # The statistics are counted by every run, so the difference is
+        # reported. This also checks that the cache can be opened.
+        if args.cache is not None:
+            cache_stats = _cache_stats(args.cache)
+    # A validation error of pydantic is also a ValueError
+    except (OSError, ValueError, sqlite3.Error) as e:
+        return _error(str(e))
+    if not img_paths and not stack_frames:
+        return _error("no images were found")
+    if args.resume:
+        done_keys = read_done_keys(args.out, text_fmt)
+        img_paths = [p for p in img_paths if FileKey.of(p) not in done_keys]
+        stack_frames = {
+            path: _undone_frames(path, frames, done_keys)
+            for path, frames in stack_frames.items()
+        }
+
+    timer = None if args.profile is None else StageTimer()
+    out = sys.stdout
+    # Messages printed while processing must not be mixed with the results
+    # written to the standard output. Forked workers inherit the redirection.
+    with contextlib.redirect_stdout(sys.stderr):
+        results = _report_errors(
+            _process_inputs(img_paths, stack_frames, args, timer)
+        )
+        num_images, num_failed = _write(
+            results, args, fmt, digit_columns(cfg), out
+        )
+    if timer is not None:
+        timer.export(args.profile)
+    if args.cache is not None:
+        _report_cache_stats(cache_stats, _cache_stats(args.cache))
+
+    print(
+        f"{num_images - num_failed} of {num_images} images were read.",
+        file=sys.stderr,
+    )
+    return EXIT_FAILED_IMAGES if num_failed else EXIT_OK
+
+
+def run_sweep(args: argparse.Namespace) -> int:
+    if args.workers < 1:
+        return _error("--workers must be 1 or more")
+    try:
+        base_cfg = Configurations.load_json(args.config)
+        labels = read_labels(args.labels)
+        with open(args.grid) as f:
+            grids = json.load(f)
+        # Check the grids before reading any image
+        sweep(labels={}, base_cfg=base_cfg, grids=grids)
+    except (OSError, ValueError) as e:
+        return _error(str(e))
+    if not labels:
+        return _error(f"{args.labels} has no images")
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        results = sweep(labels, base_cfg, grids, args.workers)
+    elapsed = time.perf_counter() - start
+    if not results:
+        return _error("no combinations of parameters were evaluated")
+
+    columns = sweep_columns(grids)
+    if args.out == "-":
+        writer = ResultWriter(sys.stdout, columns)
+    else:
+        writer = ResultWriter.open(args.out, columns)
+    with contextlib.ExitStack() as stack:
+        if args.out != "-":
+            stack.enter_context(writer)
+        for result in results:
+            writer.write(sweep_row(result, grids))
+        writer.flush()
+    if args.best_config is not None:
+        best_cfg = results[0].config(base_cfg)
+        Path(args.best_config).write_text(best_cfg.model_dump_json(indent=4))
+
+    print(
+        f"Evaluated {len(results)} combinations on {len(labels)} images "
+        f"in {elapsed:.1f} s. The best accuracy is {results[0].accuracy:.1%}.",
+        file=sys.stderr,
+    )
+    return EXIT_OK
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    if min(args.threads, args.queue_size, args.max_batch_size) < 1:
+        return _error(
+            "--threads, --queue-size and --max-batch-size must be 1 or more"
+        )
+    try:
+        cfg = Configurations.load_json(args.config)
+    except (OSError, ValueError) as e:
+        return _error(str(e))
+    if cfg.displays:
+        return _error("serve does not support configurations with displays")
+    pipeline = ExtractDigitPipeline(cfg)
+    service = DigitService(
+        pipeline,
+        num_threads=args.threads,
+        queue_size=args.queue_size,
+        max_batch_size=args.max_batch_size,
+        max_batch_delay=args.max_batch_delay / 1000,
+    )
+    asyncio.run(serve(service, args.host, args.port, args.unix))
+    return EXIT_OK
+
+
+def run_locate(args: argparse.Namespace) -> int:
+    try:
+        cfg = Configurations.load_json(args.config)
+        crop_cfg = cfg.crop_transform
+        if crop_cfg.localize is None:
+            crop_cfg = crop_cfg.model_copy(
+                update={"localize": LocalizeParams()}
+            )
+        pipeline = ExtractDigitPipeline(
+            cfg.model_copy(update={"crop_transform": crop_cfg})
+        )
+        img = pipeline.imread(args.image)
+    except (OSError, ValueError) as e:
+        return _error(str(e))
+    try:
+        pipeline.localize(img)
+    except ValueError as e:
+        print(f"{args.image}: {e}", file=sys.stderr)
+        return EXIT_FAILED_IMAGES
+    vertices = pipeline.cfg.crop_transform.crop_area_vertices
+    print(vertices.model_dump_json(indent=4))
+    if pipeline.localizer is not None:
+        confidence = pipeline.localizer.confidence
+        print(f"Confidence: {confidence:.3f}", file=sys.stderr)
+    return EXIT_OK
+
+
+def export_digit_crops(
+    labels: dict[Path, list[str]],
+    pipeline: ExtractDigitPipeline,
+    out_dir: str | Path,
+) -> int:
+    """Writes the images of the labeled digits of images
+
+    The 3rd, 2nd and 1st digits split by `split_digits_image` are written
+    as `out_dir/<digit>/<image>_<column>.png`. Digits without a label and
+    images that cannot be processed are skipped.
+
+    Args:
+        labels (dict[Path, list[str]]): Path to an image -> digits, as read by `read_labels`.
+        pipeline (ExtractDigitPipeline): The pipeline that crops the digits.
+        out_dir (str | Path): Output directory.
+
+    Returns:
+        int: Number of images of digits written.
+    """  # noqa: E501
+    out_dir = Path(out_dir)
+    num_written = 0
+    for i, (img_path, digits) in enumerate(labels.items()):
+        try:
+            cropped_img = pipeline.crop_path(img_path)
+            digits_img = pipeline.extract_digits_area(
+                pipeline.binalize(cropped_img), cropped_img
+            )
+            _, digit_imgs = split_digits_image(
+                digits_img, pipeline.cfg.estimation
+            )
+        except Exception as e:
+            print(f"{img_path}: {e!r}", file=sys.stderr)
+            continue
+        for column, digit, digit_img in zip(
+            DIGIT_COLUMNS[1:], digits[1:], digit_imgs
+        ):
+            if not digit:
+                continue
+            digit_dir = out_dir / digit
+            digit_dir.mkdir(parents=True, exist_ok=True)
+            # The index keeps images of the same name apart
+            name = f"{i:05d}_{img_path.stem}_{column}.png"
+            cv2.imwrite(str(digit_dir / name), digit_img)
+            num_written += 1
+    return num_written
+
+
+def run_export_digits(args: argparse.Namespace) -> int:
+    try:
+        pipeline = ExtractDigitPipeline.from_json(args.config)
+        labels = read_labels(args.labels)
+    except (OSError, ValueError) as e:
+        return _error(str(e))
+    num_written = export_digit_crops(labels, pipeline, args.out_dir)
+    print(
+        f"Wrote {num_written} digits of {len(labels)} images to "
+        f"{args.out_dir}",
+        file=sys.stderr,
+    )
+    return EXIT_OK
+
+
+def _evaluate(
+    classify: Callable[[list[np.ndarray]], list[str]],
+    digit_imgs: list[np.ndarray],
+    labels: list[str],
+) -> tuple[float, float]:
+    start = time.perf_counter()
+    digits = classify(digit_imgs)
+    elapsed = time.perf_counter() - start
+    num_correct = sum(d == label for d, label in zip(digits, labels))
+    return num_correct / len(labels), elapsed / len(labels)
+
+
+def run_train_lookup(args: argparse.Namespace) -> int:
+    try:
+        thresh = Configurations.load_json(
+            args.config
+        ).estimation.filling_area_ratio_thresh
+        classifier = LookupClassifier.from_folder(args.digits_dir, args.size)
+        test_imgs, test_labels = (
+            read_digit_folder(args.test) if args.test else ([], [])
+        )
+    except (OSError, ValueError) as e:
+        return _error(str(e))
+    classifier.save(args.out)
+    print(
+        f"Wrote {len(classifier.masks)} masks of the digits "
+        f"{', '.join(classifier.digits)} to {args.out}",
+        file=sys.stderr,
+    )
+    if not test_labels:
+        return EXIT_OK
+
+    print("engine      accuracy  us/digit")
+    engines: dict[str, Callable[[list[np.ndarray]], list[str]]] = {
+        "rule-based": lambda imgs: classify_digits(imgs, thresh),
+        "lookup": classifier.classify,
+    }
+    for name, classify in engines.items():
+        accuracy, seconds = _evaluate(classify, test_imgs, test_labels)
+        print(f"{name:<10}  {accuracy:>8.1%}  {seconds * 1e6:>8.1f}")
+    return EXIT_OK
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Entry point of the `extract-digit` command
+
+    Args:
+        argv (Sequence[str] | None, optional): Arguments without the program name. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: The exit code.
+    """  # noqa: E501
+    args = _build_parser().parse_args(argv)
+    if args.command == "run":
+        return run(args)
+    if args.command == "sweep":
+        return run_sweep(args)
+    if args.command == "serve":
+        return run_serve(args)
+    if args.command == "locate":
+        return run_locate(args)
+    if args.command == "export-digits":
+        return run_export_digits(args)
+    if args.command == "train-lookup":
+        return run_train_lookup(args)
+    return EXIT_USAGE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,11 @@
-from typing import Sequence, TypeAlias
+from typing import NamedTuple, Sequence, TypeAlias
 
 import cv2
 import cv2.typing as cv2t
-import matplotlib.pyplot as plt
 import numpy as np
 
-from .param_config import EstimationParams
+from .lookup import LookupClassifier, load_lookup_classifier
+from .param_config import EstimationParams, SegmentLayout
 from .processing import _calc_aspect
 
 SegmentOnOff: TypeAlias = Sequence[int]
@@ -66,11 +66,108 @@ SEGMENT_LOCATIONS = {
 }
 
 
+# (row, column) of each segment in the 3x5 grid and its bit in a segment code
+SEGMENT_ROWS = np.array([i for i, _ in SEGMENT_LOCATIONS.values()])
+SEGMENT_COLS = np.array([j for _, j in SEGMENT_LOCATIONS.values()])
+SEGMENT_BITS = 1 << np.arange(7)
+
+
+def _build_segment_lut() -> np.ndarray:
+    lut = np.full(2**7, "", dtype="<U1")
+    for states, digit in SEGMENT_DIGITS.items():
+        lut[np.dot(states, SEGMENT_BITS)] = digit
+    return lut
+
+
+# Segment code -> digit. Patterns that are not a digit are ''(empty).
+SEGMENT_LUT = _build_segment_lut()
+
+
+def _build_nearest_luts() -> tuple[np.ndarray, np.ndarray]:
+    codes = np.arange(2**7)
+    valid_codes = np.flatnonzero(SEGMENT_LUT != "")
+    # (128, number of valid codes) Hamming distances
+    diff = codes[:, None] ^ valid_codes[None, :]
+    distances = (diff[..., None] >> np.arange(7) & 1).sum(2)
+    min_distances = distances.min(1)
+    nearest = np.full(2**7, "", dtype="<U1")
+    for code in codes:
+        digits = set(
+            SEGMENT_LUT[valid_codes[distances[code] == min_distances[code]]]
+        )
+        if len(digits) == 1:
+            nearest[code] = digits.pop()
+    return nearest, min_distances
+
+
+# Segment code -> the digit of the nearest valid pattern (''(empty) if
+# several digits are as near) and the Hamming distance to it
+NEAREST_DIGIT_LUT, NEAREST_DISTANCE_LUT = _build_nearest_luts()
+
+
+class DigitEstimate(NamedTuple):
+    digit: str
+    # In [0, 1]. Low if a segment is close to its threshold or the pattern
+    # of segments is not a digit.
+    confidence: float
+    # The smallest distance between the filling ratio of a segment and its
+    # threshold
+    margin: float
+    # Hamming distance from the pattern of segments to the nearest digit
+    distance: int
+    # The digit of the nearest pattern. ''(empty) if several are as near.
+    nearest: str
+
+
+def score_segments(
+    ratios: np.ndarray, threshs: np.ndarray, confident_margin: float
+) -> list[DigitEstimate]:
+    """Estimates digits and their confidence from filling ratios
+
+    The confidence is the margin of the least certain segment, as a ratio
+    of `confident_margin` and capped at 1, divided by one plus the Hamming
+    distance to the nearest valid pattern.
+
+    Args:
+        ratios (np.ndarray): (N, 7) filling ratios of segments, or (N, 8) with the decimal point.
+        threshs (np.ndarray): Thresholds of each column of `ratios`.
+        confident_margin (float): A margin from which a segment is certain.
+
+    Returns:
+        list[DigitEstimate]: The estimate of each row. "." follows the digit if the decimal point is on.
+    """  # noqa: E501
+    ratios = np.atleast_2d(ratios)
+    is_on = ratios >= threshs
+    codes = is_on[:, :7] @ SEGMENT_BITS
+    margins = np.abs(ratios - threshs).min(1)
+    distances = NEAREST_DISTANCE_LUT[codes]
+    confidences = np.minimum(1.0, margins / confident_margin) / (1 + distances)
+    has_point = ratios.shape[1] > 7
+    return [
+        DigitEstimate(
+            str(SEGMENT_LUT[code]) + ("." if has_point and on[7] else ""),
+            float(confidence),
+            float(margin),
+            int(distance),
+            str(NEAREST_DIGIT_LUT[code]),
+        )
+        for code, on, confidence, margin, distance in zip(
+            codes, is_on, confidences, margins, distances
+        )
+    ]
+
+
+# The layout of the cells of the 3x5 grid used by `estimate_digit`
+GRID_LAYOUT = SegmentLayout.grid_layout(SEGMENT_LOCATIONS)
+
+
 def show_grid_img(digit_img: np.ndarray, num_col: int, num_row: int) -> None:
     height, width = digit_img.shape[:2]
     img = digit_img[0 : height - 1, 0 : width - 1]
     grid_splited_imgs = grid_split_array(img, num_col, num_row)
 
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(3, 5))
     seg_locs = set(SEGMENT_LOCATIONS.values())
     print(seg_locs)
@@ -109,38 +206,247 @@ def grid_split_array(
     return col_row_arrays
 
 
-def estimate_digit(
-    digit_img: np.ndarray, filling_area_ratio_thresh: float
-) -> str:
+def segment_fill_ratios_grid(digit_img: np.ndarray) -> np.ndarray:
+    """Filling ratios of the segments in the cells of a 3x5 grid
+
+    Args:
+        digit_img (np.ndarray): A binary image of a digit.
+
+    Returns:
+        np.ndarray: Filling ratios of the 7 segments in the order of SEGMENT_LOCATIONS.
+    """  # noqa: E501
     num_horizontal_split = 3
     num_vertical_split = 5
     grid_splited_imgs = grid_split_array(
         digit_img, num_horizontal_split, num_vertical_split
     )
-    segment_states = SegmentStates()
+    ratios = np.zeros(7)
     for segment_idx, (i, j) in SEGMENT_LOCATIONS.items():
         _img = grid_splited_imgs[i][j]
         if _img.ndim != 2:
             _img = _img[:, :, 0]
-        nonzero_area = np.count_nonzero(_img)
-        img_area = _img.size
-        filling_ratio = nonzero_area / img_area
-        if filling_ratio >= filling_area_ratio_thresh:
-            segment_states.turn_on(segment_idx)
-    return segment_states.cvt_digit()
+        ratios[segment_idx] = np.count_nonzero(_img) / _img.size
+    return ratios
 
 
-def estimate_digits_from_image(
-    digits_image: cv2t.MatLike,
-    estimation_cfg: EstimationParams,
-    is_imshow: bool = False,
+def estimate_digit(
+    digit_img: np.ndarray, filling_area_ratio_thresh: float
+) -> str:
+    ratios = segment_fill_ratios_grid(digit_img)
+    return str(
+        SEGMENT_LUT[(ratios >= filling_area_ratio_thresh) @ SEGMENT_BITS]
+    )
+
+
+def _layout_to_arrays(
+    layout: SegmentLayout, filling_area_ratio_thresh: float
+) -> tuple[np.ndarray, np.ndarray]:
+    regions = list(layout.segments)
+    if layout.decimal_point is not None:
+        regions.append(layout.decimal_point)
+    rects = np.array([(r.left, r.right, r.top, r.bottom) for r in regions])
+    threshs = np.array(
+        [
+            filling_area_ratio_thresh if r.thresh is None else r.thresh
+            for r in regions
+        ]
+    )
+    return rects, threshs
+
+
+def segment_fill_ratios_integral(
+    digit_img: np.ndarray, layout: SegmentLayout = GRID_LAYOUT
+) -> np.ndarray:
+    """Calculates the filling ratio of each region of a layout
+
+    The summed-area table is built once per image, after which the filling
+    ratio of any region, overlapping or not, costs the same.
+
+    Args:
+        digit_img (np.ndarray): A binary image of a digit.
+        layout (SegmentLayout, optional): Regions of segments. Defaults to GRID_LAYOUT.
+
+    Returns:
+        np.ndarray: Filling ratios of the 7 segments, followed by that of the decimal point if the layout has one.
+    """  # noqa: E501
+    if digit_img.ndim != 2:
+        digit_img = digit_img[:, :, 0]
+    height, width = digit_img.shape[:2]
+    rects, _ = _layout_to_arrays(layout, 0)
+    # Every region has at least one pixel
+    left = np.minimum(np.round(rects[:, 0] * width).astype(int), width - 1)
+    top = np.minimum(np.round(rects[:, 2] * height).astype(int), height - 1)
+    right = np.maximum(np.round(rects[:, 1] * width).astype(int), left + 1)
+    bottom = np.maximum(np.round(rects[:, 3] * height).astype(int), top + 1)
+
+    # (height + 1, width + 1) table. sat[y, x] is the sum of img[:y, :x]
+    sat = cv2.integral((digit_img != 0).astype(np.uint8))
+    nonzero_area = (
+        sat[bottom, right]
+        - sat[top, right]
+        - sat[bottom, left]
+        + sat[top, left]
+    )
+    ratios: np.ndarray = nonzero_area / ((bottom - top) * (right - left))
+    return ratios
+
+
+def estimate_digit_integral(
+    digit_img: np.ndarray,
+    filling_area_ratio_thresh: float,
+    layout: SegmentLayout = GRID_LAYOUT,
+) -> str:
+    """Estimates a digit from the regions of a segment layout
+
+    Args:
+        digit_img (np.ndarray): A binary image of a digit.
+        filling_area_ratio_thresh (float): A segment is on if its filling ratio is at least this value. Overridden by the threshold of each region.
+        layout (SegmentLayout, optional): Regions of segments. Defaults to GRID_LAYOUT.
+
+    Returns:
+        str: The estimated digit, followed by "." if the decimal point is on. ''(empty) if the pattern of segments is not a digit.
+    """  # noqa: E501
+    ratios = segment_fill_ratios_integral(digit_img, layout)
+    _, threshs = _layout_to_arrays(layout, filling_area_ratio_thresh)
+    is_on = ratios >= threshs
+    digit = str(SEGMENT_LUT[is_on[:7] @ SEGMENT_BITS])
+    if layout.decimal_point is not None and is_on[7]:
+        digit += "."
+    return digit
+
+
+def _lookup_classifier(estimation_cfg: EstimationParams) -> LookupClassifier:
+    if estimation_cfg.lookup_index is None:
+        raise ValueError("`lookup_index` is required by the lookup engine")
+    return load_lookup_classifier(estimation_cfg.lookup_index)
+
+
+def _estimate_digit_with_cfg(
+    digit_img: np.ndarray, estimation_cfg: EstimationParams
+) -> str:
+    if estimation_cfg.engine == "lookup":
+        return _lookup_classifier(estimation_cfg).classify([digit_img])[0]
+    if estimation_cfg.engine == "integral":
+        return estimate_digit_integral(
+            digit_img,
+            estimation_cfg.filling_area_ratio_thresh,
+            estimation_cfg.segment_layout or GRID_LAYOUT,
+        )
+    return estimate_digit(digit_img, estimation_cfg.filling_area_ratio_thresh)
+
+
+def _score_digit_with_cfg(
+    digit_img: np.ndarray, estimation_cfg: EstimationParams
+) -> DigitEstimate:
+    if estimation_cfg.engine == "lookup":
+        # The margin is the ratio of bits by which the nearest mask is nearer
+        # than the nearest one of another digit
+        classifier = _lookup_classifier(estimation_cfg)
+        match = classifier.match([digit_img])[0]
+        margin = match.margin / classifier.num_bits
+        return DigitEstimate(
+            match.digit,
+            min(1.0, margin / estimation_cfg.confident_margin),
+            margin,
+            0,
+            match.digit,
+        )
+    if estimation_cfg.engine == "integral":
+        layout = estimation_cfg.segment_layout or GRID_LAYOUT
+        ratios = segment_fill_ratios_integral(digit_img, layout)
+        _, threshs = _layout_to_arrays(
+            layout, estimation_cfg.filling_area_ratio_thresh
+        )
+    else:
+        ratios = segment_fill_ratios_grid(digit_img)
+        threshs = np.full(7, estimation_cfg.filling_area_ratio_thresh)
+    return score_segments(ratios, threshs, estimation_cfg.confident_margin)[0]
+
+
+def _split_edges(length: int, num: int) -> np.ndarray:
+    # Edges of the sections of `np.array_split`, whose first sections are
+    # one longer than the others
+    sizes = np.full(num, length // num)
+    sizes[: length % num] += 1
+    return np.concatenate(([0], np.cumsum(sizes)))
+
+
+def segment_fill_ratios_grid_batch(
+    digit_imgs: Sequence[np.ndarray],
+) -> np.ndarray:
+    """Filling ratios of the segments of many digits in a 3x5 grid
+
+    The cells are those of `grid_split_array`, so the ratios are those of
+    `segment_fill_ratios_grid`. The pixels of each cell are summed with a
+    summed-area table instead of being counted in a sliced copy.
+
+    Args:
+        digit_imgs (Sequence[np.ndarray]): Binary images of a digit.
+
+    Returns:
+        np.ndarray: (N, 7) array of filling ratios. The order of segments is that of SEGMENT_LOCATIONS. The ratio of an empty cell is 0.
+    """  # noqa: E501
+    ratios = np.zeros((len(digit_imgs), 7))
+    for k, digit_img in enumerate(digit_imgs):
+        if digit_img.ndim != 2:
+            digit_img = digit_img[:, :, 0]
+        height, width = digit_img.shape[:2]
+        row_edges = _split_edges(height, 5)
+        col_edges = _split_edges(width, 3)
+        sat = cv2.integral((digit_img != 0).astype(np.uint8))
+        corners = sat[np.ix_(row_edges, col_edges)]
+        cells = np.diff(np.diff(corners, axis=0), axis=1)
+        areas = np.outer(np.diff(row_edges), np.diff(col_edges))
+        np.divide(
+            cells[SEGMENT_ROWS, SEGMENT_COLS],
+            areas[SEGMENT_ROWS, SEGMENT_COLS],
+            out=ratios[k],
+            where=areas[SEGMENT_ROWS, SEGMENT_COLS] > 0,
+        )
+    return ratios
+
+
+def classify_digits(
+    digit_imgs: Sequence[np.ndarray], filling_area_ratio_thresh: float
 ) -> list[str]:
-    estimated_digits: list[str] = ["0"]
+    """Estimates many digits at once
+
+    The batched counterpart of `estimate_digit`, which it agrees with on
+    every image.
+
+    Args:
+        digit_imgs (Sequence[np.ndarray]): Binary images of a digit.
+        filling_area_ratio_thresh (float): A segment is on if its filling ratio is at least this value.
+
+    Returns:
+        list[str]: Estimated digits. ''(empty) if the pattern of segments is not a digit.
+    """  # noqa: E501
+    if len(digit_imgs) == 0:
+        return []
+    ratios = segment_fill_ratios_grid_batch(digit_imgs)
+    codes = (ratios >= filling_area_ratio_thresh) @ SEGMENT_BITS
+    digits: list[str] = SEGMENT_LUT[codes].tolist()
+    return digits
+
+
+def split_digits_image(
+    digits_image: cv2t.MatLike, estimation_cfg: EstimationParams
+) -> tuple[str, list[np.ndarray]]:
+    """Splits an image of digits into the images of the last 3 digits
+
+    Args:
+        digits_image (cv2t.MatLike): A padded image that only contains digits.
+        estimation_cfg (EstimationParams): Parameters of estimation.
+
+    Returns:
+        tuple[str, list[np.ndarray]]: The 4th digit estimated from the aspect ratio, and the images of 3rd, 2nd and 1st digits.
+    """  # noqa: E501
+    fourth_digit = "0"
     aspect = _calc_aspect(digits_image.shape[:2])  # type: ignore
     # When the number of digits is 4-digit, the aspect ratio is larger than that of 3-digit.  # noqa: E501
     if aspect > estimation_cfg.aspect_thresh:
         # In case of 4-digits, The 4th digit is one.
-        estimated_digits[0] = "1"
+        fourth_digit = "1"
         height, width_old = digits_image.shape[:2]
         width_new = int(height * estimation_cfg.three_digits_aspect)
         left = width_old - width_new - 1
@@ -150,22 +456,110 @@ def estimate_digits_from_image(
         # Retrieve only the last 3 digit image
         digits_image = digits_image[top:bottom, left:right]
 
-    digit_imgs = np.array_split(digits_image, 3, axis=1)
+    return fourth_digit, np.array_split(digits_image, 3, axis=1)
+
+
+def estimate_digits_from_images(
+    digits_images: Sequence[cv2t.MatLike],
+    estimation_cfg: EstimationParams,
+) -> list[list[str]]:
+    """Estimates digits of many images
+
+    With the "grid" engine, all digits are estimated by one call of
+    `classify_digits`, and with the "lookup" engine by one call of
+    `LookupClassifier.classify`.
+
+    Args:
+        digits_images (Sequence[cv2t.MatLike]): Padded images that only contain digits.
+        estimation_cfg (EstimationParams): Parameters of estimation.
+
+    Returns:
+        list[list[str]]: Digits of each image. The order is (4th, 3rd, 2nd, 1st).
+    """  # noqa: E501
+    fourth_digits: list[str] = []
+    digit_imgs: list[np.ndarray] = []
+    for digits_image in digits_images:
+        fourth_digit, imgs = split_digits_image(digits_image, estimation_cfg)
+        fourth_digits.append(fourth_digit)
+        digit_imgs.extend(imgs)
+    if estimation_cfg.engine == "grid":
+        digits = classify_digits(
+            digit_imgs, estimation_cfg.filling_area_ratio_thresh
+        )
+    elif estimation_cfg.engine == "lookup":
+        digits = _lookup_classifier(estimation_cfg).classify(digit_imgs)
+    else:
+        digits = [
+            _estimate_digit_with_cfg(digit_img, estimation_cfg)
+            for digit_img in digit_imgs
+        ]
+    return [
+        [fourth_digit] + digits[3 * i : 3 * i + 3]
+        for i, fourth_digit in enumerate(fourth_digits)
+    ]
+
+
+def estimate_digits_from_image(
+    digits_image: cv2t.MatLike,
+    estimation_cfg: EstimationParams,
+    is_imshow: bool = False,
+) -> list[str]:
+    fourth_digit, digit_imgs = split_digits_image(digits_image, estimation_cfg)
+    estimated_digits: list[str] = [fourth_digit]
     if is_imshow:
+        import matplotlib.pyplot as plt
+
         fig = plt.figure()
     for i, digit_img in enumerate(digit_imgs, 1):
         if is_imshow:
             ax = fig.add_subplot(1, 3, i)
             ax.imshow(digit_img, "gray")
         estimated_digits.append(
-            estimate_digit(digit_img, estimation_cfg.filling_area_ratio_thresh)
+            _estimate_digit_with_cfg(digit_img, estimation_cfg)
         )
     if is_imshow:
         fig.tight_layout()
     return estimated_digits
 
 
+def estimate_digits_with_confidence(
+    digits_image: cv2t.MatLike, estimation_cfg: EstimationParams
+) -> list[DigitEstimate]:
+    """Estimates digits of an image with the confidence of each digit
+
+    The digits are the same as those of `estimate_digits_from_image`. The
+    confidence of the 4th digit is the margin of the aspect ratio of the
+    image from `aspect_thresh`, relative to `aspect_thresh`.
+
+    Args:
+        digits_image (cv2t.MatLike): A padded image that only contains digits.
+        estimation_cfg (EstimationParams): Parameters of estimation.
+
+    Returns:
+        list[DigitEstimate]: Estimates. The order is (4th, 3rd, 2nd, 1st).
+    """  # noqa: E501
+    fourth_digit, digit_imgs = split_digits_image(digits_image, estimation_cfg)
+    aspect = _calc_aspect(digits_image.shape[:2])
+    margin = abs(aspect / estimation_cfg.aspect_thresh - 1)
+    estimates = [
+        DigitEstimate(
+            fourth_digit,
+            min(1.0, margin / estimation_cfg.confident_margin),
+            margin,
+            0,
+            fourth_digit,
+        )
+    ]
+    estimates.extend(
+        _score_digit_with_cfg(digit_img, estimation_cfg)
+        for digit_img in digit_imgs
+    )
+    return estimates
+
+
 def main() -> None:
+    import matplotlib.pyplot as plt
+
     img = cv2.imread("./data/processed_images/processed_sample_pad.png")
     h_img, w_img = img.shape[:2]
     print(h_img, w_img)
@@ -0,0 +1,193 @@
+import math
+from pathlib import Path
+from typing import NamedTuple
+
+import cv2
+import cv2.typing as cv2t
+import numpy as np
+
+from .param_config import BoundingBox, QuadrilateralVertices
+
+# Reduction ratio -> flag that lets the decoder shrink the image while it
+# decodes (JPEG is scaled in the DCT domain, so it is cheaper than a full
+# decode and uses a fraction of the memory).
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+class RoiDecodePlan(NamedTuple):
+    reduction: int
+    area: BoundingBox
+    src_vertices: np.ndarray
+
+    @property
+    def imread_flag(self) -> int:
+        return REDUCED_GRAYSCALE_FLAGS[self.reduction]
+
+
+def _edge_length(p0: tuple[int, int], p1: tuple[int, int]) -> float:
+    return math.hypot(p1[0] - p0[0], p1[1] - p0[1])
+
+
+def plan_roi_decode(
+    crop_area_vertices: QuadrilateralVertices,
+    dst_size: tuple[int, int],
+    margin: int = 16,
+    allow_reduction: bool = True,
+    max_reduction: int = 8,
+) -> RoiDecodePlan:
+    """Plans how to decode only what `crop_transform_show_digits` reads
+
+    The largest reduction ratio is chosen so that every edge of the crop area
+    is still at least as long as the corresponding edge of the rectified
+    image, that is, the reduced decoding does not lose any resolution.
+
+    Args:
+        crop_area_vertices (QuadrilateralVertices): Each vertex of the area to be cropped.
+        dst_size (tuple[int, int]): Image size after rectangle correction. (height, width)
+        margin (int, optional): Margin around the crop area in pixels of the decoded image. Defaults to 16.
+        allow_reduction (bool, optional): Whether to use reduced resolution decoding. Defaults to True.
+        max_reduction (int, optional): The largest reduction ratio to choose, so that several plans can share one decoded image. Defaults to 8.
+
+    Returns:
+        RoiDecodePlan: The reduction ratio, the area to keep in the decoded image and the vertices of the crop area relative to that area.
+    """  # noqa: E501
+    upper_left, upper_right, lower_right, lower_left = (
+        crop_area_vertices.align_vertices()
+    )
+    min_width = min(
+        _edge_length(upper_left, upper_right),
+        _edge_length(lower_left, lower_right),
+    )
+    min_height = min(
+        _edge_length(upper_left, lower_left),
+        _edge_length(upper_right, lower_right),
+    )
+    height, width = dst_size
+    reduction = 1
+    if allow_reduction:
+        for r in (8, 4, 2):
+            if r > max_reduction:
+                continue
+            if min_width / r >= width and min_height / r >= height:
+                reduction = r
+                break
+
+    # A pixel i of the reduced image covers the pixels from r*i to r*i+r-1
+    # of the full image, so its center is r*i + (r-1)/2.
+    src_vertices = np.array(crop_area_vertices.align_vertices(), np.float64)
+    src_vertices = (src_vertices - (reduction - 1) / 2) / reduction
+    left = max(0, math.floor(src_vertices[:, 0].min()) - margin)
+    top = max(0, math.floor(src_vertices[:, 1].min()) - margin)
+    right = math.ceil(src_vertices[:, 0].max()) + margin + 1
+    bottom = math.ceil(src_vertices[:, 1].max()) + margin + 1
+    src_vertices -= (left, top)
+
+    return RoiDecodePlan(
+        reduction=reduction,
+        area=BoundingBox(left=left, right=right, top=top, bottom=bottom),
+        src_vertices=src_vertices.astype(np.float32),
+    )
+
+
+def imread_roi(img_path: str | Path, plan: RoiDecodePlan) -> cv2t.MatLike:
+    """Reads only the area of an image planned by `plan_roi_decode`
+
+    Args:
+        img_path (str | Path): Path to the image.
+        plan (RoiDecodePlan): A plan made by `plan_roi_decode`.
+
+    Raises:
+        FileNotFoundError: If the image cannot be read.
+
+    Returns:
+        cv2t.MatLike: The grayscale area. Its pixels are addressed by `plan.src_vertices`.
+    """  # noqa: E501
+    img = cv2.imread(str(img_path), plan.imread_flag)
+    if img is None:
+        raise FileNotFoundError(f"Could not read an image from {img_path}")
+    return _slice_area(img, plan)
+
+
+def imdecode_roi(buffer: bytes, plan: RoiDecodePlan) -> cv2t.MatLike:
+    """Decodes only the area of an encoded image planned by `plan_roi_decode`
+
+    Args:
+        buffer (bytes): Content of an image file.
+        plan (RoiDecodePlan): A plan made by `plan_roi_decode`.
+
+    Raises:
+        ValueError: If the image cannot be decoded.
+
+    Returns:
+        cv2t.MatLike: The grayscale area. Its pixels are addressed by `plan.src_vertices`.
+    """  # noqa: E501
+    img = cv2.imdecode(np.frombuffer(buffer, np.uint8), plan.imread_flag)
+    if img is None:
+        raise ValueError("Could not decode an image")
+    return _slice_area(img, plan)
+
+
+def _slice_area(img: cv2t.MatLike, plan: RoiDecodePlan) -> cv2t.MatLike:
+    left, right, top, bottom = plan.area.unpack()
+    # Copy the area so that the decoded frame can be freed right away.
+    return img[top:bottom, left:right].copy()
+
+
+# Files of grayscale frames that are read without decoding
+FRAME_STACK_SUFFIXES = (".npy", ".raw")
+
+
+def open_frame_stack(
+    path: str | Path,
+    frame_shape: tuple[int, int] | None = None,
+    offset: int = 0,
+) -> np.ndarray:
+    """Maps a stack of grayscale frames into memory without reading it
+
+    A `.npy` file is opened with `np.load(mmap_mode="r")` and any other file
+    is read as raw uint8 pixels with `np.memmap`. Frames are views of the
+    mapping, so only the pages that the crop touches are read, and processes
+    mapping the same file share them in the page cache.
+
+    Args:
+        path (str | Path): Path to a `.npy` file of shape (frames, height, width) or (height, width), or to a raw file.
+        frame_shape (tuple[int, int] | None, optional): (height, width) of the frames of a raw file. Required for raw files. Defaults to None.
+        offset (int, optional): Bytes of the header of a raw file to skip. Defaults to 0.
+
+    Raises:
+        ValueError: If the frames are not uint8 grayscale or the size of a raw file is not a multiple of a frame.
+
+    Returns:
+        np.ndarray: A read-only array of shape (frames, height, width).
+    """  # noqa: E501
+    path = Path(path)
+    if path.suffix.lower() == ".npy":
+        stack: np.ndarray = np.load(path, mmap_mode="r")
+        if stack.ndim == 2:
+            stack = stack[np.newaxis]
+        if stack.ndim != 3 or stack.dtype != np.uint8:
+            raise ValueError(
+                f"{path} must hold uint8 grayscale frames, "
+                f"but its shape is {stack.shape} and dtype is {stack.dtype}"
+            )
+        return stack
+    if frame_shape is None:
+        raise ValueError(f"The frame shape of the raw file {path} is needed")
+    height, width = frame_shape
+    num_bytes = path.stat().st_size - offset
+    if height <= 0 or width <= 0 or num_bytes % (height * width) != 0:
+        raise ValueError(
+            f"{num_bytes} bytes of {path} are not frames of {height}x{width}"
+        )
+    return np.memmap(
+        path,
+        np.uint8,
+        mode="r",
+        offset=offset,
+        shape=(num_bytes // (height * width), height, width),
+    )
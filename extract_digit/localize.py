@@ -0,0 +1,292 @@
+from typing import NamedTuple
+
+import cv2
+import cv2.typing as cv2t
+import numpy as np
+
+from .param_config import LocalizeParams, Point, QuadrilateralVertices
+
+
+class Localization(NamedTuple):
+    # (upper left, upper right, lower right, lower left) as float32 (x, y)
+    vertices: np.ndarray
+    # How close the contour is to a quadrilateral, in [0, 1]
+    confidence: float
+
+
+def vertices_to_quadrilateral(vertices: np.ndarray) -> QuadrilateralVertices:
+    """Rounds (upper left, upper right, lower right, lower left) vertices"""
+    ul, ur, lr, ll = (Point(*map(int, np.rint(v))) for v in vertices)
+    return QuadrilateralVertices(
+        upper_left=ul, upper_right=ur, lower_right=lr, lower_left=ll
+    )
+
+
+def order_vertices(points: np.ndarray) -> np.ndarray:
+    """Orders 4 points clockwise from the upper left one
+
+    Args:
+        points (np.ndarray): Points of shape (4, 2) in (x, y).
+
+    Returns:
+        np.ndarray: (upper left, upper right, lower right, lower left) as float32.
+    """  # noqa: E501
+    points = np.asarray(points, np.float32).reshape(4, 2)
+    center = points.mean(0)
+    # The y axis points down, so increasing angles are clockwise
+    angles = np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0])
+    points = points[np.argsort(angles)]
+    start = int(np.argmin(points.sum(1)))
+    return np.roll(points, -start, axis=0)
+
+
+def _intersect(line0: np.ndarray, line1: np.ndarray) -> np.ndarray | None:
+    """Intersection of two lines given as (vx, vy, x0, y0)"""
+    vx0, vy0, x0, y0 = line0
+    vx1, vy1, x1, y1 = line1
+    det = vx1 * vy0 - vx0 * vy1
+    if abs(det) < 1e-6:
+        return None
+    t = (vx1 * (y1 - y0) - vy1 * (x1 - x0)) / det
+    return np.array([x0 + t * vx0, y0 + t * vy0], np.float32)
+
+
+def refine_vertices(contour: np.ndarray, vertices: np.ndarray) -> np.ndarray:
+    """Refines vertices by fitting a line to each side of a contour
+
+    Points of the contour are assigned to their nearest side, leaving out
+    the ends of each side where the corners of the display may be rounded,
+    and adjacent lines are intersected, so the vertices get subpixel
+    precision.
+
+    Args:
+        contour (np.ndarray): A contour found with `cv2.CHAIN_APPROX_NONE`.
+        vertices (np.ndarray): Rough vertices ordered by `order_vertices`.
+
+    Returns:
+        np.ndarray: Refined vertices, or `vertices` if a side has too few points.
+    """  # noqa: E501
+    points = contour.reshape(-1, 2).astype(np.float32)
+    starts = vertices
+    sides = np.roll(vertices, -1, axis=0) - starts
+    lengths = np.linalg.norm(sides, axis=1)
+    if np.any(lengths < 1):
+        return vertices
+    # Position along each side (in [0, 1]) and distance to it, shape (N, 4)
+    rel = points[:, None, :] - starts[None, :, :]
+    along = (rel * sides).sum(2) / lengths**2
+    dists = np.abs(rel[..., 0] * sides[:, 1] - rel[..., 1] * sides[:, 0])
+    dists /= lengths
+    nearest = np.argmin(dists, axis=1)
+
+    lines = []
+    for i in range(4):
+        on_side = points[
+            (nearest == i) & (along[:, i] > 0.1) & (along[:, i] < 0.9)
+        ]
+        if len(on_side) < 2:
+            return vertices
+        lines.append(
+            cv2.fitLine(on_side, cv2.DIST_HUBER, 0, 0.01, 0.01).ravel()
+        )
+    refined = []
+    for i in range(4):
+        # Vertex i is between side i - 1 and side i
+        vertex = _intersect(lines[i - 1], lines[i])
+        if vertex is None:
+            return vertices
+        refined.append(vertex)
+    return np.array(refined, np.float32)
+
+
+def find_quadrilaterals(
+    gray: cv2t.MatLike,
+    params: LocalizeParams,
+    area_range: tuple[float, float],
+    aspect: float,
+) -> list[Localization]:
+    """Finds bright quadrilaterals in an image
+
+    Args:
+        gray (cv2t.MatLike): A grayscale image.
+        params (LocalizeParams): Parameters of the localization.
+        area_range (tuple[float, float]): Minimum and maximum areas in pixels.
+        aspect (float): Expected width / height. Candidates far from it get a lower confidence.
+
+    Returns:
+        list[Localization]: Candidates in descending order of confidence. Contours touching the border of `gray` are left out.
+    """  # noqa: E501
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    thresh_type = cv2.THRESH_BINARY_INV if params.invert else cv2.THRESH_BINARY
+    _, binary = cv2.threshold(blurred, 0, 255, thresh_type + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(
+        binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE
+    )
+    height, width = binary.shape
+    min_aspect, max_aspect = params.aspect_range
+    candidates = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if not area_range[0] <= area <= area_range[1]:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if x == 0 or y == 0 or x + w == width or y + h == height:
+            continue
+        hull = cv2.convexHull(contour)
+        approx = cv2.approxPolyDP(hull, 0.03 * cv2.arcLength(hull, True), True)
+        if len(approx) != 4:
+            continue
+        vertices = refine_vertices(contour, order_vertices(approx))
+        ul, ur, lr, ll = vertices
+        quad_width = (np.linalg.norm(ur - ul) + np.linalg.norm(lr - ll)) / 2
+        quad_height = (np.linalg.norm(ll - ul) + np.linalg.norm(lr - ur)) / 2
+        if quad_height == 0:
+            continue
+        if not min_aspect <= quad_width / quad_height <= max_aspect:
+            continue
+        quad_area = cv2.contourArea(vertices)
+        if quad_area == 0:
+            continue
+        ratio = area / quad_area
+        # Penalize the aspect only when it is far from the expected one
+        aspect_error = abs(np.log(quad_width / quad_height / aspect))
+        confidence = min(ratio, 1 / ratio) * min(1.0, 1.5 - aspect_error)
+        candidates.append(Localization(vertices, max(0.0, confidence)))
+    return sorted(candidates, key=lambda c: c.confidence, reverse=True)
+
+
+def _downscale(img: cv2t.MatLike, width: int) -> tuple[cv2t.MatLike, float]:
+    scale = min(1.0, width / img.shape[1])
+    if scale == 1.0:
+        return img, scale
+    return (
+        cv2.resize(
+            img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        ),
+        scale,
+    )
+
+
+def _upscale(vertices: np.ndarray, scale: float) -> np.ndarray:
+    # Centers of pixels of a resized image are not at integer multiples
+    return ((vertices + 0.5) / scale - 0.5).astype(np.float32)
+
+
+class DisplayLocalizer:
+    """Finds the display in frames and keeps track of it
+
+    The first frame is searched entirely on a copy downscaled to
+    `search_width`. Later frames are only searched in a window around the
+    last vertices, expanded by `track_margin`, and the whole frame is
+    searched again only when the confidence of the tracked quadrilateral
+    drops below `min_confidence`. The vertices, and so the homography of
+    the crop, are only replaced when a vertex moves more than `tolerance`
+    pixels, so a steady display is cropped with a cached transformation.
+    """
+
+    def __init__(self, params: LocalizeParams, aspect: float) -> None:
+        self.params = params
+        self.aspect = aspect
+        self.vertices: np.ndarray | None = None
+        self.confidence = 0.0
+        self.num_full_searches = 0
+        self.num_tracked = 0
+        self.num_updates = 0
+
+    def full_search(self, img: cv2t.MatLike) -> Localization | None:
+        """Searches the whole frame for the display"""
+        self.num_full_searches += 1
+        small, scale = _downscale(img, self.params.search_width)
+        area = small.shape[0] * small.shape[1]
+        candidates = find_quadrilaterals(
+            small,
+            self.params,
+            (
+                self.params.min_area_ratio * area,
+                self.params.max_area_ratio * area,
+            ),
+            self.aspect,
+        )
+        if not candidates:
+            return None
+        best = candidates[0]
+        return best._replace(vertices=_upscale(best.vertices, scale))
+
+    def track(
+        self, img: cv2t.MatLike, vertices: np.ndarray
+    ) -> Localization | None:
+        """Searches a window around `vertices` for the display"""
+        height, width = img.shape[:2]
+        left, top = vertices.min(0)
+        right, bottom = vertices.max(0)
+        margin = self.params.track_margin * max(right - left, bottom - top)
+        left = max(0, int(left - margin))
+        top = max(0, int(top - margin))
+        right = min(width, int(np.ceil(right + margin)) + 1)
+        bottom = min(height, int(np.ceil(bottom + margin)) + 1)
+        if right - left < 8 or bottom - top < 8:
+            return None
+        small, scale = _downscale(
+            img[top:bottom, left:right], self.params.track_width
+        )
+        # The display does not change its size much between frames
+        area = cv2.contourArea(vertices) * scale**2
+        candidates = find_quadrilaterals(
+            small, self.params, (area / 2, area * 2), self.aspect
+        )
+        if not candidates:
+            return None
+        best = candidates[0]
+        offset = np.array([left, top], np.float32)
+        return best._replace(vertices=_upscale(best.vertices, scale) + offset)
+
+    def update(self, img: cv2t.MatLike) -> bool:
+        """Localizes the display in a frame
+
+        Args:
+            img (cv2t.MatLike): A grayscale frame.
+
+        Raises:
+            ValueError: If the display has never been found.
+
+        Returns:
+            bool: Whether `vertices` changed. They are kept if the display is not found.
+        """  # noqa: E501
+        min_confidence = self.params.min_confidence
+        found = None
+        if self.vertices is not None:
+            found = self.track(img, self.vertices)
+        if found is not None and found.confidence >= min_confidence:
+            self.num_tracked += 1
+        else:
+            found = self.full_search(img)
+            if found is not None and found.confidence >= min_confidence:
+                # Refine on the window, which has a higher resolution
+                tracked = self.track(img, found.vertices)
+                if tracked is not None and tracked.confidence >= (
+                    min_confidence
+                ):
+                    found = tracked
+        if found is None or found.confidence < min_confidence:
+            self.confidence = 0.0 if found is None else found.confidence
+            if self.vertices is None:
+                raise ValueError("The display was not found")
+            return False
+
+        self.confidence = found.confidence
+        if self.vertices is not None:
+            shift = np.linalg.norm(found.vertices - self.vertices, axis=1)
+            if shift.max() <= self.params.tolerance:
+                return False
+        self.vertices = found.vertices
+        self.num_updates += 1
+        return True
+
+    def crop_area_vertices(self) -> QuadrilateralVertices:
+        if self.vertices is None:
+            raise ValueError("The display has not been found yet")
+        return vertices_to_quadrilateral(self.vertices)
+
+    def reset(self) -> None:
+        self.vertices = None
+        self.confidence = 0.0
@@ -0,0 +1,262 @@
+import functools
+import hashlib
+import os
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+import cv2
+import numpy as np
+
+# Size of the masks of the index. (height, width) 240 bits, 30 bytes.
+LOOKUP_MASK_SIZE = (20, 12)
+
+DIGIT_IMAGE_SUFFIXES = (".png", ".bmp", ".jpg", ".jpeg", ".tif", ".tiff")
+
+# Bytes of XORed masks compared at once by `LookupClassifier.match`
+_CHUNK_BYTES = 1 << 24
+
+
+class LookupMatch(NamedTuple):
+    digit: str
+    # Number of differing bits from the nearest mask
+    distance: int
+    # How many more bits differ from the nearest mask of another digit.
+    # The number of bits of a mask if the index has only one digit.
+    margin: int
+
+
+def digit_masks(
+    digit_imgs: Sequence[np.ndarray], size: tuple[int, int] = LOOKUP_MASK_SIZE
+) -> np.ndarray:
+    """Downsamples digit images to bit-packed masks
+
+    Args:
+        digit_imgs (Sequence[np.ndarray]): Binary images of a digit.
+        size (tuple[int, int], optional): Size of the masks. (height, width) Defaults to LOOKUP_MASK_SIZE.
+
+    Returns:
+        np.ndarray: (N, ceil(height * width / 8)) uint8 array. A bit is on if at least half of the area it was resized from is nonzero.
+    """  # noqa: E501
+    height, width = size
+    masks = np.zeros((len(digit_imgs), height, width), bool)
+    for i, digit_img in enumerate(digit_imgs):
+        if digit_img.ndim != 2:
+            digit_img = digit_img[:, :, 0]
+        if digit_img.size == 0:
+            continue
+        small = cv2.resize(
+            (digit_img != 0).astype(np.float32),
+            (width, height),
+            interpolation=cv2.INTER_AREA,
+        )
+        masks[i] = small >= 0.5
+    return np.packbits(masks.reshape(len(digit_imgs), -1), axis=1)
+
+
+def hamming_distances(queries: np.ndarray, index: np.ndarray) -> np.ndarray:
+    """Hamming distances between bit-packed masks
+
+    Args:
+        queries (np.ndarray): (Q, B) uint8 masks.
+        index (np.ndarray): (N, B) uint8 masks.
+
+    Returns:
+        np.ndarray: (Q, N) int32 numbers of differing bits.
+    """
+    diff = queries[:, None, :] ^ index[None, :, :]
+    distances: np.ndarray = np.bitwise_count(diff).sum(2, dtype=np.int32)
+    return distances
+
+
+class LookupClassifier:
+    """Classifies digits by the nearest labeled mask
+
+    Digit images are downsampled to small binary masks packed into bits,
+    and a digit gets the label of the mask of the index with the fewest
+    differing bits, counted by XOR and popcount. Unlike the segments of
+    `estimate_digit`, nothing is assumed about the shape of digits, so
+    italic or thin segments only have to be in the labeled examples.
+    """
+
+    def __init__(
+        self,
+        masks: np.ndarray,
+        labels: np.ndarray | Sequence[str],
+        size: tuple[int, int] = LOOKUP_MASK_SIZE,
+    ) -> None:
+        if len(masks) == 0 or len(masks) != len(labels):
+            raise ValueError(
+                "The index needs as many labels as masks, and at least one, "
+                f"but {len(masks)} masks and {len(labels)} labels"
+            )
+        label_array = np.asarray(labels, str)
+        # Masks of the same digit are kept together, so the nearest mask of
+        # each digit is found by one reduction
+        order = np.argsort(label_array, kind="stable")
+        self.masks = np.ascontiguousarray(masks[order], np.uint8)
+        self.labels = label_array[order]
+        self.size = (int(size[0]), int(size[1]))
+        self.num_bits = self.size[0] * self.size[1]
+        self.digits, self._starts = np.unique(self.labels, return_index=True)
+
+    @staticmethod
+    def fit(
+        digit_imgs: Sequence[np.ndarray],
+        labels: Sequence[str],
+        size: tuple[int, int] = LOOKUP_MASK_SIZE,
+    ) -> "LookupClassifier":
+        """Builds the index from labeled digit images
+
+        Examples with the same mask and label are stored once.
+
+        Args:
+            digit_imgs (Sequence[np.ndarray]): Binary images of a digit.
+            labels (Sequence[str]): The digit of each image.
+            size (tuple[int, int], optional): Size of the masks. (height, width) Defaults to LOOKUP_MASK_SIZE.
+
+        Returns:
+            LookupClassifier: The classifier.
+        """  # noqa: E501
+        masks = digit_masks(digit_imgs, size)
+        label_array = np.asarray(labels, str)
+        _, label_ids = np.unique(label_array, return_inverse=True)
+        keys = np.column_stack(
+            [masks, label_ids.astype(np.int32).view(np.uint8).reshape(-1, 4)]
+        )
+        _, unique = np.unique(keys, axis=0, return_index=True)
+        unique.sort()
+        return LookupClassifier(masks[unique], label_array[unique], size)
+
+    @staticmethod
+    def from_folder(
+        folder: str | Path, size: tuple[int, int] = LOOKUP_MASK_SIZE
+    ) -> "LookupClassifier":
+        """Builds the index from a folder of labeled digit images
+
+        Args:
+            folder (str | Path): A folder with a subfolder of images per digit, named after the digit.
+            size (tuple[int, int], optional): Size of the masks. (height, width) Defaults to LOOKUP_MASK_SIZE.
+
+        Raises:
+            ValueError: If the folder has no images.
+
+        Returns:
+            LookupClassifier: The classifier.
+        """  # noqa: E501
+        digit_imgs, labels = read_digit_folder(folder)
+        if not digit_imgs:
+            raise ValueError(f"{folder} has no images of digits")
+        return LookupClassifier.fit(digit_imgs, labels, size)
+
+    def save(self, path: str | Path) -> None:
+        """Writes the index to a `.npz` file"""
+        np.savez(
+            path,
+            masks=self.masks,
+            labels=self.labels,
+            size=np.array(self.size),
+        )
+
+    @staticmethod
+    def load(path: str | Path) -> "LookupClassifier":
+        """Reads an index written by `save`"""
+        with np.load(path) as data:
+            return LookupClassifier(
+                data["masks"], data["labels"], tuple(data["size"])
+            )
+
+    def match(self, digit_imgs: Sequence[np.ndarray]) -> list[LookupMatch]:
+        """Finds the nearest mask of each digit image
+
+        Args:
+            digit_imgs (Sequence[np.ndarray]): Binary images of a digit.
+
+        Returns:
+            list[LookupMatch]: The nearest digit of each image, with its distance and margin.
+        """  # noqa: E501
+        queries = digit_masks(digit_imgs, self.size)
+        num_digits = len(self.digits)
+        matches: list[LookupMatch] = []
+        chunk = max(1, _CHUNK_BYTES // self.masks.size)
+        for start in range(0, len(queries), chunk):
+            distances = hamming_distances(
+                queries[start : start + chunk], self.masks
+            )
+            # The nearest distance to each digit, (Q, number of digits)
+            per_digit = np.minimum.reduceat(distances, self._starts, axis=1)
+            order = np.argsort(per_digit, axis=1, kind="stable")
+            rows = np.arange(len(per_digit))
+            nearest = per_digit[rows, order[:, 0]]
+            second = (
+                per_digit[rows, order[:, 1]]
+                if num_digits > 1
+                else nearest + self.num_bits
+            )
+            matches.extend(
+                LookupMatch(str(self.digits[i]), int(d), int(s - d))
+                for i, d, s in zip(order[:, 0], nearest, second)
+            )
+        return matches
+
+    def classify(self, digit_imgs: Sequence[np.ndarray]) -> list[str]:
+        """Classifies digit images
+
+        Args:
+            digit_imgs (Sequence[np.ndarray]): Binary images of a digit.
+
+        Returns:
+            list[str]: The label of the nearest mask of each image.
+        """
+        return [match.digit for match in self.match(digit_imgs)]
+
+
+def read_digit_folder(
+    folder: str | Path,
+) -> tuple[list[np.ndarray], list[str]]:
+    """Reads a folder of labeled digit images
+
+    Args:
+        folder (str | Path): A folder with a subfolder of images per digit, named after the digit.
+
+    Returns:
+        tuple[list[np.ndarray], list[str]]: Grayscale images and their digits, sorted by digit and file name.
+    """  # noqa: E501
+    digit_imgs: list[np.ndarray] = []
+    labels: list[str] = []
+    for label_dir in sorted(p for p in Path(folder).iterdir() if p.is_dir()):
+        for img_path in sorted(label_dir.iterdir()):
+            if img_path.suffix.lower() not in DIGIT_IMAGE_SUFFIXES:
+                continue
+            img = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise ValueError(f"Could not read an image from {img_path}")
+            digit_imgs.append(img)
+            labels.append(label_dir.name)
+    return digit_imgs, labels
+
+
+def _stamp(path: str | Path) -> tuple[str, int, int]:
+    # A rewritten index file is told apart by its size and mtime
+    stat = os.stat(path)
+    return str(path), stat.st_size, stat.st_mtime_ns
+
+
+@functools.lru_cache(maxsize=8)
+def _load_stamped(stamp: tuple[str, int, int]) -> LookupClassifier:
+    return LookupClassifier.load(stamp[0])
+
+
+@functools.lru_cache(maxsize=8)
+def _hash_stamped(stamp: tuple[str, int, int]) -> str:
+    content = Path(stamp[0]).read_bytes()
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def load_lookup_classifier(path: str | Path) -> LookupClassifier:
+    """`LookupClassifier.load`, reading each version of an index file once"""
+    return _load_stamped(_stamp(path))
+
+
+def lookup_index_hash(path: str | Path) -> str:
+    """Hash of the content of an index file, read once per version"""
+    return _hash_stamped(_stamp(path))
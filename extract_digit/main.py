@@ -1,77 +1,68 @@
+import argparse
 import re
+from contextlib import ExitStack
 from pathlib import Path
 
-import cv2
-import matplotlib.pyplot as plt
-
-from extract_digit.estimate_digit import estimate_digits_from_image
-from extract_digit.param_config import Configurations
-from extract_digit.processing import (
-    binalize_image,
-    crop_transform_show_digits,
-    fill_contours,
-    filtering_digit_contours,
-    find_contours,
-    pad_image,
-    remove_image_margins,
+from extract_digit.batch import digit_columns, process_paths
+from extract_digit.param_config import DEFAULT_CONFIG_PATH, Configurations
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.stream import (
+    ChangeDetector,
+    TemporalFilter,
+    stream_readings,
 )
-from extract_digit.utils import (
-    select_directory_with_window,
-    select_img_with_window,
+from extract_digit.timing import StageTimer, profile_cpu, trace_memory
+from extract_digit.writer import (
+    KEY_COLUMNS,
+    FileKey,
+    ResultWriter,
+    read_done_keys,
 )
 
 
-def run_one_file(img_path: str | Path, is_imshow: bool = False) -> list[str]:
-    config_path = "extract_digit/configs/config.json"
-    cfg = Configurations.load_json(config_path)
-    img = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
-
-    cropped_img = crop_transform_show_digits(
-        src=img,
-        crop_area_vertices=cfg.crop_transform.crop_area_vertices,
-        dst_size=cfg.crop_transform.dst_size,
-        imshow=cfg.crop_transform.imshow,
-        close_up_area=cfg.crop_transform.close_up_area,
-    )
-
-    binalized_img = binalize_image(
-        img=cropped_img,
-        gb_ksize=cfg.binalize.gb_ksize,
-        gb_sigmaX=cfg.binalize.gb_sigmaX,
-        epf_sigma_s=cfg.binalize.epf_sigma_s,
-        epf_sigma_r=cfg.binalize.epf_sigma_r,
-        adaptive_thresh_blocksize=cfg.binalize.adaptive_thresh_blocksize,
-        adaptive_thresh_C=cfg.binalize.adaptive_thresh_C,
-    )
-
-    contours = find_contours(binalized_img)
-
-    contours = filtering_digit_contours(
-        contours,
-        cropped_img,
-        bb_filling_ratio=cfg.filtering_digit.bb_filling_ratio,
-        bb_image_ratio=cfg.filtering_digit.bb_image_ratio,
-        inner_aspect_range=cfg.filtering_digit.inner_aspect_range,
-    )
-    digits_area = fill_contours(cropped_img, contours)
-
-    removed_margins = remove_image_margins(digits_area)
-    added_pad_img = pad_image(removed_margins)
-    digits = estimate_digits_from_image(
-        added_pad_img, cfg.estimation, is_imshow
-    )
+def run_one_file(
+    img_path: str | Path,
+    is_imshow: bool = False,
+    pipeline: ExtractDigitPipeline | None = None,
+) -> list[str]:
+    if pipeline is None:
+        pipeline = ExtractDigitPipeline.from_json(DEFAULT_CONFIG_PATH)
+    digits = pipeline.process_path(img_path, is_imshow)
     print(digits)
 
     if is_imshow:
-        fig = plt.figure()
-        ax = fig.add_subplot()
-        ax.imshow(removed_margins)
+        import matplotlib.pyplot as plt
+
         plt.show()
 
     return digits
 
 
-def run_on_directory(src_dir: str | Path, dst_dir: str | Path) -> None:
+def run_on_directory(
+    src_dir: str | Path,
+    dst_dir: str | Path,
+    workers: int = 1,
+    config_path: str | Path = DEFAULT_CONFIG_PATH,
+    timer: StageTimer | None = None,
+    resume: bool = True,
+) -> None:
+    """Extracts digits from every image in a directory and writes a CSV
+
+    Each row is written to "recognized_digits.csv" as soon as its image is
+    processed, so memory use does not grow with the number of images. The
+    path, size and modification time of each image are written as well, so
+    that a run stopped halfway can be resumed. Images that failed have an
+    "error" and are processed again when resumed, which appends another
+    row for them. The last row of an image is its current result.
+
+    Args:
+        src_dir (str | Path): A directory containing the images.
+        dst_dir (str | Path): A directory where "recognized_digits.csv" is written.
+        workers (int, optional): Number of worker processes. Images are processed serially if 1. Defaults to 1.
+        config_path (str | Path, optional): Path to the configuration file. Defaults to DEFAULT_CONFIG_PATH.
+        timer (StageTimer | None, optional): The stages of every image, including those processed in the worker processes, are recorded in it. Defaults to None.
+        resume (bool, optional): Whether to skip the images already in the CSV and append to it. If False, the CSV is overwritten. Defaults to True.
+    """  # noqa: E501
     src_dir = Path(src_dir)
     # Select image file paths and sort
     img_paths = sorted(
@@ -81,27 +72,110 @@ def run_on_directory(src_dir: str | Path, dst_dir: str | Path) -> None:
             if re.search(r"^.*\.(jpg|png|JPEG)$", p.name)
         ]
     )
+    csv_path = Path(dst_dir) / "recognized_digits.csv"
+    if resume:
+        done_keys = read_done_keys(csv_path, "csv")
+        img_paths = [p for p in img_paths if FileKey.of(p) not in done_keys]
+
     # Extract digits from each image
-    digits_eash_image = [[p.stem] + run_one_file(p) for p in img_paths]
+    digit_cols = digit_columns(Configurations.load_json(config_path))
+    columns = ("img_name",) + digit_cols + ("error",) + KEY_COLUMNS
+    with ResultWriter.open(csv_path, columns, append=resume) as writer:
+        for result in process_paths(img_paths, config_path, workers, timer):
+            if result.error is None:
+                print(result.digits)
+            else:
+                print(
+                    f"Failed to extract digits from {result.path}: "
+                    f"{result.error}"
+                )
+            key = FileKey.of(result.path)
+            writer.write(
+                {
+                    "img_name": result.path.stem,
+                    **dict(zip(digit_cols, result.digits)),
+                    "error": result.error or "",
+                    **({} if key is None else key._asdict()),
+                }
+            )
+
+
+def _run_stream(args: argparse.Namespace, timer: StageTimer | None) -> None:
+    change_detector = (
+        None
+        if args.change_thresh is None
+        else ChangeDetector(args.change_thresh)
+    )
+    pipeline = ExtractDigitPipeline.from_json(args.config, timer)
+    temporal_filter = None
+    fallback = None
+    if args.min_confidence is not None:
+        temporal_filter = TemporalFilter(args.min_confidence)
+        fallback = pipeline.full_quality()
+    num_reprocessed = 0
+    for reading in stream_readings(
+        args.stream,
+        pipeline,
+        frame_step=args.frame_step,
+        sample_rate=args.sample_rate,
+        change_detector=change_detector,
+        temporal_filter=temporal_filter,
+        fallback=fallback,
+        min_confidence=args.min_confidence or 0.0,
+    ):
+        num_reprocessed += reading.reprocessed
+        if reading.confidence is None:
+            print(f"{reading.timestamp:.3f}", "".join(reading.digits))
+        else:
+            print(
+                f"{reading.timestamp:.3f}",
+                "".join(reading.digits),
+                f"{reading.confidence:.2f}",
+                *(["corrected"] if reading.corrected else []),
+            )
+    if change_detector is not None:
+        print(
+            f"{change_detector.num_unchanged} of "
+            f"{change_detector.num_frames} frames were unchanged."
+        )
+    if temporal_filter is not None:
+        print(
+            f"{temporal_filter.num_corrected} of "
+            f"{temporal_filter.num_frames} frames were corrected and "
+            f"{num_reprocessed} were processed again."
+        )
 
-    dst_dir = Path(dst_dir)
-    with open(dst_dir / "recognized_digits.csv", "x") as f:
-        f.write("img_name,4th-digit,3rd-digit,2nd-digit,1st-digit\n")
-        f.writelines([",".join(digits) + "\n" for digits in digits_eash_image])
 
+def _run_interactive(
+    args: argparse.Namespace, timer: StageTimer | None
+) -> None:
+    # tkinter is only needed to select files, not to analyze them
+    from extract_digit.utils import (
+        select_directory_with_window,
+        select_img_with_window,
+    )
 
-if __name__ == "__main__":
     while True:
         all_or_one = input(
             "For a single file? [0], for a directory? [1] or exit? [-1]: "
         )
         if all_or_one == "0":
             src_path = select_img_with_window()
-            run_one_file(src_path, is_imshow=True)
+            run_one_file(
+                src_path,
+                is_imshow=True,
+                pipeline=ExtractDigitPipeline.from_json(args.config, timer),
+            )
         elif all_or_one == "1":
             src_dir = select_directory_with_window()
             dst_dir = select_directory_with_window()
-            run_on_directory(src_dir, dst_dir)
+            run_on_directory(
+                src_dir,
+                dst_dir,
+                workers=args.workers,
+                config_path=args.config,
+                timer=timer,
+            )
         elif all_or_one == "-1":
             print("Exit")
             break
@@ -111,3 +185,92 @@ if __name__ == "__main__":
                 "Please enter again.",
             )
             continue
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used when analyzing a directory.",
+    )
+    parser.add_argument(
+        "--config",
+        default=str(DEFAULT_CONFIG_PATH),
+        help="Path to the configuration file.",
+    )
+    parser.add_argument(
+        "--stream",
+        help=(
+            "Reads the display from a video file, a capture device index "
+            "or a stream URL instead of asking for images."
+        ),
+    )
+    parser.add_argument(
+        "--frame-step",
+        type=int,
+        default=1,
+        help="Only every N-th frame of the stream is analyzed.",
+    )
+    parser.add_argument(
+        "--sample-rate",
+        type=float,
+        default=None,
+        help="Maximum number of frames per second analyzed in the stream.",
+    )
+    parser.add_argument(
+        "--change-thresh",
+        type=float,
+        default=None,
+        help=(
+            "Reuses the last digits while the mean absolute difference of "
+            "the display from the last analyzed frame is at most this value."
+        ),
+    )
+    parser.add_argument(
+        "--min-confidence",
+        type=float,
+        default=None,
+        help=(
+            "Estimates the confidence of each digit of the stream. Frames "
+            "with a digit below this value are processed again with the "
+            "full binalization, and outlying digits are corrected by the "
+            "digits of consecutive frames."
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        help=(
+            "Writes the count, median, 95th percentile and maximum time of "
+            "each stage to this file. CSV if the suffix is .csv, else JSON."
+        ),
+    )
+    parser.add_argument(
+        "--cprofile",
+        help=(
+            "Profiles the main process with cProfile and dumps the stats to "
+            "this file. Use it with --workers 1."
+        ),
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help=(
+            "Traces memory allocations and prints the lines that allocated "
+            "most. The peak memory of each stage is added to --profile."
+        ),
+    )
+    args = parser.parse_args()
+    timer = None if args.profile is None else StageTimer()
+    with ExitStack() as stack:
+        if args.cprofile is not None:
+            stack.enter_context(profile_cpu(args.cprofile))
+        if args.tracemalloc:
+            stack.enter_context(trace_memory())
+        if args.stream is not None:
+            _run_stream(args, timer)
+        else:
+            _run_interactive(args, timer)
+    if timer is not None:
+        timer.export(args.profile)
@@ -1,9 +1,11 @@
 from pathlib import Path
-from typing import Literal, NamedTuple
+from typing import Any, Literal, NamedTuple
 
 import cv2.typing as cv2t
 import numpy as np
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent / "configs" / "config.json"
 
 
 class BoundingBox(BaseModel):
@@ -83,6 +85,31 @@ class RangeTuple(NamedTuple):
         return self.minimum, self.maximum
 
 
+class LocalizeParams(BaseModel):
+    """Parameters of the automatic localization of the display
+
+    The display is assumed to be a quadrilateral brighter than its
+    surroundings, or darker if `invert` is true.
+    """
+
+    # Width of the downscaled frame that the whole frame is searched on
+    search_width: int = Field(default=640, gt=0)
+    # Width of the downscaled window that the display is tracked in
+    track_width: int = Field(default=480, gt=0)
+    # Margin of the tracking window as a ratio of the size of the display
+    track_margin: float = Field(default=0.25, gt=0)
+    # Area of the display as ratios of the area of the frame
+    min_area_ratio: float = Field(default=0.001, gt=0)
+    max_area_ratio: float = Field(default=0.5, le=1)
+    # Width / height of the display
+    aspect_range: RangeTuple = RangeTuple(1.0, 3.0)
+    # The whole frame is searched again below this confidence
+    min_confidence: float = Field(default=0.9, ge=0, le=1)
+    # The homography is kept while no vertex moves more pixels than this
+    tolerance: float = Field(default=1.5, ge=0)
+    invert: bool = False
+
+
 class CropTransformParams(BaseModel):
     crop_area_vertices: QuadrilateralVertices
     dst_size: tuple[int, int]
@@ -90,6 +117,32 @@ class CropTransformParams(BaseModel):
     close_up_area: BoundingBox = BoundingBox(
         left=1900, right=2450, top=1600, bottom=1950
     )
+    roi_decode: bool = True
+    roi_margin: int = Field(default=16, ge=0)
+    # Finds `crop_area_vertices` in each image instead of using the given
+    # ones, which are only a fallback until the display is found.
+    localize: LocalizeParams | None = None
+    # Crops to `dst_size` times this and processes the smaller image with
+    # the pixel sizes of `binalize` scaled alike. See
+    # `Configurations.rescaled`.
+    scale: float = Field(default=1.0, gt=0, le=1)
+
+    def scaled_dst_size(self) -> tuple[int, int]:
+        """`dst_size` times `scale`, at least 1 pixel"""
+        height, width = self.dst_size
+        return (
+            max(1, round(height * self.scale)),
+            max(1, round(width * self.scale)),
+        )
+
+
+def odd_size(size: float, minimum: int = 1) -> int:
+    """The nearest odd integer of a positive size, the larger one at a tie
+
+    Both kernel sizes scaled in `BinalizeParams.scaled` and those scaled by
+    the "fast" binalize mode are made odd by this.
+    """
+    return max(minimum, int(size) // 2 * 2 + 1)
 
 
 class BinalizeParams(BaseModel):
@@ -100,18 +153,134 @@ class BinalizeParams(BaseModel):
     adaptive_thresh_blocksize: int
     adaptive_thresh_C: int
     closing_ksize: tuple[int, int]
+    # "full": Gaussian blur, edge preserving filter and adaptive threshold.
+    # "fast": mean adaptive threshold on a copy downscaled by `fast_scale`.
+    # "otsu": Gaussian blur and Otsu's threshold.
+    # "auto": "fast", falling back to "full" if the number of digit contours
+    #         is not in `auto_num_digits`.
+    mode: Literal["full", "fast", "otsu", "auto"] = "full"
+    fast_scale: float = Field(default=0.5, gt=0, le=1)
+    auto_num_digits: tuple[int, ...] = (3, 4)
+
+    def scaled(self, scale: float) -> "BinalizeParams":
+        """The parameters for an image scaled by `scale`
+
+        The kernel sizes, the block size and the spatial sigmas are in
+        pixels, so they are scaled and kept odd where OpenCV needs it. The
+        other parameters do not depend on the size of the image.
+
+        Args:
+            scale (float): Scale of the image.
+
+        Returns:
+            BinalizeParams: The scaled parameters.
+        """
+        if scale == 1.0:
+            return self
+        return self.model_copy(
+            update={
+                "gb_ksize": tuple(odd_size(k * scale) for k in self.gb_ksize),
+                "gb_sigmaX": self.gb_sigmaX * scale,
+                "epf_sigma_s": self.epf_sigma_s * scale,
+                "adaptive_thresh_blocksize": odd_size(
+                    self.adaptive_thresh_blocksize * scale, minimum=3
+                ),
+                "closing_ksize": tuple(
+                    max(1, round(k * scale)) for k in self.closing_ksize
+                ),
+            }
+        )
 
 
 class FilteringDigitParams(BaseModel):
     bb_filling_ratio: float
     bb_image_ratio: float
     inner_aspect_range: RangeTuple
+    # "contours": find, filter and fill contours, then crop their margins.
+    # "components": filter connected components by their statistics and
+    #               crop the selected labels straight into the padded image.
+    engine: Literal["contours", "components"] = "contours"
+
+
+class SegmentRegion(BaseModel):
+    """Region of a segment as ratios of the width and height of a digit"""
+
+    left: float = Field(ge=0, le=1)
+    right: float = Field(ge=0, le=1)
+    top: float = Field(ge=0, le=1)
+    bottom: float = Field(ge=0, le=1)
+    # Overrides `filling_area_ratio_thresh` of this segment
+    thresh: float | None = None
+
+
+class SegmentLayout(BaseModel):
+    # The order is that of SEGMENT_LOCATIONS
+    segments: list[SegmentRegion] = Field(min_length=7, max_length=7)
+    decimal_point: SegmentRegion | None = None
+
+    @staticmethod
+    def grid_layout(
+        segment_locations: dict[int, tuple[int, int]],
+        num_col: int = 3,
+        num_row: int = 5,
+    ) -> "SegmentLayout":
+        """Makes the layout of the cells of a grid
+
+        Args:
+            segment_locations (dict[int, tuple[int, int]]): Segment index -> (row, column) of the grid.
+            num_col (int, optional): Number of horizontal divisions. Defaults to 3.
+            num_row (int, optional): Number of vertical divisions. Defaults to 5.
+
+        Returns:
+            SegmentLayout: The layout.
+        """  # noqa: E501
+        return SegmentLayout(
+            segments=[
+                SegmentRegion(
+                    left=j / num_col,
+                    right=(j + 1) / num_col,
+                    top=i / num_row,
+                    bottom=(i + 1) / num_row,
+                )
+                for _, (i, j) in sorted(segment_locations.items())
+            ]
+        )
 
 
 class EstimationParams(BaseModel):
     aspect_thresh: float
     three_digits_aspect: float
     filling_area_ratio_thresh: float
+    # "grid": count pixels in the cells of a 3x5 grid.
+    # "integral": sum pixels in `segment_layout` with a summed-area table.
+    # "lookup": the nearest labeled mask of the index at `lookup_index`.
+    engine: Literal["grid", "integral", "lookup"] = "grid"
+    segment_layout: SegmentLayout | None = None
+    # A margin of the filling ratio from the threshold at which a segment
+    # is certain. Smaller margins lower the confidence of the digit.
+    confident_margin: float = Field(default=0.15, gt=0)
+    # Index written by `LookupClassifier.save`
+    lookup_index: Path | None = None
+
+    @model_validator(mode="after")
+    def _lookup_index_given(self) -> "EstimationParams":
+        if self.engine == "lookup" and self.lookup_index is None:
+            raise ValueError("`lookup_index` is required by the lookup engine")
+        return self
+
+
+class DisplayParams(BaseModel):
+    """One of the displays photographed in the same frame
+
+    The parameters of the stages that are not given are those of the top
+    level of `Configurations`.
+    """
+
+    name: str = Field(min_length=1)
+    crop_transform: CropTransformParams
+    binalize: BinalizeParams | None = None
+    filtering_digit: FilteringDigitParams | None = None
+    estimation: EstimationParams | None = None
 
 
 class Configurations(BaseModel):
@@ -119,6 +288,80 @@ class Configurations(BaseModel):
     binalize: BinalizeParams
     filtering_digit: FilteringDigitParams
     estimation: EstimationParams
+    # Several displays of one frame. If given, they are read instead of the
+    # top level `crop_transform`, which may then be omitted.
+    displays: list[DisplayParams] = []
+
+    @model_validator(mode="before")
+    @classmethod
+    def _default_crop_transform(cls, data: Any) -> Any:
+        if (
+            isinstance(data, dict)
+            and "crop_transform" not in data
+            and data.get("displays")
+        ):
+            first = data["displays"][0]
+            crop_transform = (
+                first.get("crop_transform")
+                if isinstance(first, dict)
+                else getattr(first, "crop_transform", None)
+            )
+            if crop_transform is not None:
+                data = {**data, "crop_transform": crop_transform}
+        return data
+
+    @field_validator("displays")
+    @classmethod
+    def _unique_display_names(
+        cls, displays: list[DisplayParams]
+    ) -> list[DisplayParams]:
+        names = [display.name for display in displays]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Names of displays must be unique: {names}")
+        return displays
+
+    def display_configs(self) -> dict[str, "Configurations"]:
+        """The configuration of each display of `displays`
+
+        Returns:
+            dict[str, Configurations]: Name of a display -> its configuration, in the order of `displays`.
+        """  # noqa: E501
+        return {
+            display.name: Configurations(
+                crop_transform=display.crop_transform,
+                binalize=display.binalize or self.binalize,
+                filtering_digit=display.filtering_digit
+                or self.filtering_digit,
+                estimation=display.estimation or self.estimation,
+            )
+            for display in self.displays
+        }
+
+    def rescaled(self) -> "Configurations":
+        """The configuration that `crop_transform.scale` stands for
+
+        `dst_size` and the pixel sizes of `binalize` are scaled, and the
+        scale is reset to 1. The parameters of `filtering_digit` and
+        `estimation` are ratios of the size of the image or of digits, so
+        they are kept as they are.
+
+        Returns:
+            Configurations: The rescaled configuration, or this one if the scale is 1.
+        """  # noqa: E501
+        crop_cfg = self.crop_transform
+        if crop_cfg.scale == 1.0:
+            return self
+        return self.model_copy(
+            update={
+                "crop_transform": crop_cfg.model_copy(
+                    update={
+                        "dst_size": crop_cfg.scaled_dst_size(),
+                        "scale": 1.0,
+                    }
+                ),
+                "binalize": self.binalize.scaled(crop_cfg.scale),
+            }
+        )
 
     @staticmethod
     def load_json(path: str | Path) -> "Configurations":
@@ -0,0 +1,737 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Sequence, TypeVar
+
+import cv2
+import cv2.typing as cv2t
+import numpy as np
+
+from .cache import ResultCache, cache_keys
+from .estimate_digit import (
+    DigitEstimate,
+    estimate_digits_from_image,
+    estimate_digits_with_confidence,
+)
+from .loader import (
+    REDUCED_GRAYSCALE_FLAGS,
+    imdecode_roi,
+    imread_roi,
+    plan_roi_decode,
+)
+from .localize import DisplayLocalizer
+from .param_config import Configurations, QuadrilateralVertices
+from .processing import (
+    AllocationCounter,
+    binalize_image,
+    binalize_image_fast,
+    binalize_image_otsu,
+    component_features,
+    count_digit_features,
+    crop_transform_show_digits,
+    digits_area_from_components,
+    fill_contours,
+    filtering_digit_contour_features,
+    find_contours,
+    get_dst_vertices,
+    get_perspective_transform,
+    pad_image,
+    remove_image_margins,
+    select_digit_features,
+)
+from .timing import StageTimer
+
+T = TypeVar("T")
+
+
+class ExtractDigitPipeline:
+    """Extracts digits from images with one validated configuration.
+
+    Constants that only depend on the configuration (the perspective
+    transformation matrix, the destination vertices and the closing kernel)
+    are calculated once when the pipeline is built, so that a pipeline can be
+    reused for every image of a batch.
+
+    If `roi_decode` is enabled, `process_path` only decodes the bounding box
+    of the crop area, at a reduced resolution when the crop area is large
+    enough compared with `dst_size`.
+
+    If a `timer` is given, the wall time, CPU time and input/output sizes of
+    each stage are recorded in it. If an `allocations` counter is given, the
+    arrays allocated to extract the area of digits of the last image are
+    counted in it. Counting costs a pass over the image, so only benchmarks
+    do it.
+
+    If a `cache` is given, `process_path` reuses the readings, crops and
+    masks of images whose content was already processed with the same
+    parameters of the stages.
+
+    If `localize` is set, the display is found in each image by a
+    `DisplayLocalizer` before it is cropped, so whole images are decoded
+    and the cache is not used.
+
+    If `crop_transform.scale` is less than 1, `cfg` is replaced by
+    `cfg.rescaled()`, so the display is cropped to a smaller image that
+    every later stage processes with scaled pixel sizes.
+    """
+
+    def __init__(
+        self,
+        cfg: Configurations,
+        timer: StageTimer | None = None,
+        cache: ResultCache | None = None,
+        max_reduction: int = 8,
+        allocations: AllocationCounter | None = None,
+    ) -> None:
+        cfg = cfg.rescaled()
+        self.cfg = cfg
+        self.timer = timer
+        self.cache = cache
+        self.max_reduction = max_reduction
+        self.dst_vertices = get_dst_vertices(cfg.crop_transform.dst_size)
+        self.closing_kernel = np.ones(cfg.binalize.closing_ksize, np.uint8)
+        # Arrays allocated to extract the area of digits of the last image
+        self.allocations = allocations
+        self.set_crop_area(cfg.crop_transform.crop_area_vertices)
+        self.localizer = None
+        if cfg.crop_transform.localize is not None:
+            height, width = cfg.crop_transform.dst_size
+            self.localizer = DisplayLocalizer(
+                cfg.crop_transform.localize, width / height
+            )
+
+    @staticmethod
+    def from_json(
+        path: str | Path,
+        timer: StageTimer | None = None,
+        cache: ResultCache | None = None,
+    ) -> "ExtractDigitPipeline":
+        return ExtractDigitPipeline(
+            Configurations.load_json(path), timer, cache
+        )
+
+    def _timed(
+        self, name: str, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        if self.timer is None:
+            return func(*args, **kwargs)
+        return self.timer.call(name, func, *args, **kwargs)
+
+    @property
+    def uses_roi(self) -> bool:
+        """Whether only the crop area of images is decoded"""
+        return (
+            self.cfg.crop_transform.roi_decode
+            and self.cfg.crop_transform.localize is None
+        )
+
+    def set_crop_area(
+        self,
+        vertices: QuadrilateralVertices,
+        subpixel_vertices: np.ndarray | None = None,
+    ) -> None:
+        """Replaces the crop area and the constants calculated from it
+
+        Args:
+            vertices (QuadrilateralVertices): The new crop area.
+            subpixel_vertices (np.ndarray | None, optional): (upper left, upper right, lower right, lower left) (x, y) of the crop area before it was rounded to `vertices`. The perspective transformation is calculated from them if given. Defaults to None.
+        """  # noqa: E501
+        crop_cfg = self.cfg.crop_transform.model_copy(
+            update={"crop_area_vertices": vertices}
+        )
+        self.cfg = self.cfg.model_copy(update={"crop_transform": crop_cfg})
+        if subpixel_vertices is None:
+            self.trans_mat = get_perspective_transform(
+                vertices, crop_cfg.dst_size
+            )
+        else:
+            self.trans_mat = cv2.getPerspectiveTransform(
+                np.asarray(subpixel_vertices, np.float32), self.dst_vertices
+            )
+        self.roi_plan = plan_roi_decode(
+            vertices,
+            crop_cfg.dst_size,
+            margin=crop_cfg.roi_margin,
+            max_reduction=self.max_reduction,
+        )
+        self.roi_trans_mat = cv2.getPerspectiveTransform(
+            self.roi_plan.src_vertices, self.dst_vertices
+        )
+
+    def localize(self, img: cv2t.MatLike) -> bool:
+        """Moves the crop area to the display found in a whole image
+
+        Args:
+            img (cv2t.MatLike): A grayscale image.
+
+        Raises:
+            ValueError: If the display has never been found.
+
+        Returns:
+            bool: Whether the crop area changed. False if `localize` is not set.
+        """  # noqa: E501
+        if self.localizer is None:
+            return False
+        is_changed = self._timed("localize", self.localizer.update, img)
+        if is_changed:
+            # The rounded vertices are only kept in the configuration
+            self.set_crop_area(
+                self.localizer.crop_area_vertices(), self.localizer.vertices
+            )
+        return is_changed
+
+    def imread(self, img_path: str | Path) -> cv2t.MatLike:
+        img = self._timed(
+            "imread", cv2.imread, str(img_path), cv2.IMREAD_GRAYSCALE
+        )
+        if img is None:
+            raise FileNotFoundError(f"Could not read an image from {img_path}")
+        return img
+
+    def imread_roi(self, img_path: str | Path) -> cv2t.MatLike:
+        return self._timed("imread", imread_roi, img_path, self.roi_plan)
+
+    def crop(self, img: cv2t.MatLike, from_roi: bool = False) -> cv2t.MatLike:
+        """Crops and rectifies the display
+
+        The display is localized first if `localize` is set and `img` is a
+        whole image.
+
+        Args:
+            img (cv2t.MatLike): A grayscale image.
+            from_roi (bool, optional): Whether `img` was read by `imread_roi`. Defaults to False.
+
+        Returns:
+            cv2t.MatLike: Cropped and corrected image.
+        """  # noqa: E501
+        if not from_roi:
+            self.localize(img)
+        cfg = self.cfg.crop_transform
+        if from_roi:
+            return self._timed(
+                "crop",
+                crop_transform_show_digits,
+                img,
+                crop_area_vertices=cfg.crop_area_vertices,
+                dst_size=cfg.dst_size,
+                trans_mat=self.roi_trans_mat,
+            )
+        return self._timed(
+            "crop",
+            crop_transform_show_digits,
+            img,
+            crop_area_vertices=cfg.crop_area_vertices,
+            dst_size=cfg.dst_size,
+            imshow=cfg.imshow,
+            close_up_area=cfg.close_up_area,
+            trans_mat=self.trans_mat,
+        )
+
+    def crop_path(self, img_path: str | Path) -> cv2t.MatLike:
+        """Reads an image and crops the display
+
+        Only the crop area is decoded if `uses_roi` is true.
+        """
+        if self.uses_roi:
+            return self.crop(self.imread_roi(img_path), from_roi=True)
+        return self.crop(self.imread(img_path))
+
+    def binalize(self, cropped_img: cv2t.MatLike) -> cv2t.MatLike:
+        """Binalizes a cropped image with the mode of the configuration
+
+        Args:
+            cropped_img (cv2t.MatLike): Cropped and corrected image.
+
+        Returns:
+            cv2t.MatLike: A binary image. Digits are white.
+        """
+        mode = self.cfg.binalize.mode
+        if mode == "full":
+            return self._timed(
+                "binalize.full", self._binalize_full, cropped_img
+            )
+        elif mode == "otsu":
+            return self._timed(
+                "binalize.otsu", self._binalize_otsu, cropped_img
+            )
+        binalized_img = self._timed(
+            "binalize.fast", self._binalize_fast, cropped_img
+        )
+        if mode == "auto":
+            num_digits = self._timed(
+                "binalize.auto_check",
+                self._count_digits,
+                binalized_img,
+                cropped_img,
+            )
+            if num_digits not in self.cfg.binalize.auto_num_digits:
+                binalized_img = self._timed(
+                    "binalize.full", self._binalize_full, cropped_img
+                )
+        return binalized_img
+
+    def _binalize_full(self, cropped_img: cv2t.MatLike) -> cv2t.MatLike:
+        cfg = self.cfg.binalize
+        return binalize_image(
+            img=cropped_img,
+            gb_ksize=cfg.gb_ksize,
+            gb_sigmaX=cfg.gb_sigmaX,
+            epf_sigma_s=cfg.epf_sigma_s,
+            epf_sigma_r=cfg.epf_sigma_r,
+            adaptive_thresh_blocksize=cfg.adaptive_thresh_blocksize,
+            adaptive_thresh_C=cfg.adaptive_thresh_C,
+            closing_kernel=self.closing_kernel,
+        )
+
+    def _binalize_fast(self, cropped_img: cv2t.MatLike) -> cv2t.MatLike:
+        cfg = self.cfg.binalize
+        return binalize_image_fast(
+            img=cropped_img,
+            scale=cfg.fast_scale,
+            gb_ksize=cfg.gb_ksize,
+            gb_sigmaX=cfg.gb_sigmaX,
+            adaptive_thresh_blocksize=cfg.adaptive_thresh_blocksize,
+            adaptive_thresh_C=cfg.adaptive_thresh_C,
+            closing_kernel=self.closing_kernel,
+        )
+
+    def _binalize_otsu(self, cropped_img: cv2t.MatLike) -> cv2t.MatLike:
+        cfg = self.cfg.binalize
+        return binalize_image_otsu(
+            img=cropped_img,
+            gb_ksize=cfg.gb_ksize,
+            gb_sigmaX=cfg.gb_sigmaX,
+            closing_kernel=self.closing_kernel,
+        )
+
+    def _count_digits(
+        self, binalized_img: cv2t.MatLike, cropped_img: cv2t.MatLike
+    ) -> int:
+        cfg = self.cfg.filtering_digit
+        if cfg.engine == "components":
+            stats = cv2.connectedComponentsWithStats(
+                binalized_img, connectivity=8, ltype=cv2.CV_32S
+            )[2]
+            features = component_features(stats[1:])
+            selected = select_digit_features(
+                features,
+                binalized_img.shape,
+                bb_filling_ratio=cfg.bb_filling_ratio,
+                bb_image_ratio=cfg.bb_image_ratio,
+                inner_aspect_range=cfg.inner_aspect_range,
+            )
+            return count_digit_features(features[selected])
+        _, features = self._filter_contour_features(
+            find_contours(binalized_img), cropped_img
+        )
+        # The bounding boxes are reused instead of those of the contours
+        return count_digit_features(features)
+
+    def _filter_contour_features(
+        self, contours: Sequence[cv2t.MatLike], cropped_img: cv2t.MatLike
+    ) -> tuple[np.ndarray, np.ndarray]:
+        cfg = self.cfg.filtering_digit
+        return filtering_digit_contour_features(
+            contours,
+            cropped_img,
+            bb_filling_ratio=cfg.bb_filling_ratio,
+            bb_image_ratio=cfg.bb_image_ratio,
+            inner_aspect_range=cfg.inner_aspect_range,
+        )
+
+    def _filter_contours(
+        self, contours: Sequence[cv2t.MatLike], cropped_img: cv2t.MatLike
+    ) -> Sequence[cv2t.MatLike]:
+        indices, _ = self._filter_contour_features(contours, cropped_img)
+        return [contours[i] for i in indices]
+
+    def extract_digits_area(
+        self,
+        binalized_img: cv2t.MatLike,
+        cropped_img: cv2t.MatLike,
+        is_imshow: bool = False,
+    ) -> cv2t.MatLike:
+        """Extracts the area of digits from a binalized image
+
+        Args:
+            binalized_img (cv2t.MatLike): An image binalized by `binalize`.
+            cropped_img (cv2t.MatLike): An image cropped by `crop`.
+            is_imshow (bool, optional): Whether to show the area of digits. Defaults to False.
+
+        Returns:
+            cv2t.MatLike: The padded image that only contains digits.
+        """  # noqa: E501
+        if self.allocations is not None:
+            self.allocations.reset()
+        if self.cfg.filtering_digit.engine == "components":
+            padded_img = self._timed(
+                "digits_area_from_components",
+                self._digits_area_from_components,
+                binalized_img,
+            )
+            if is_imshow:
+                import matplotlib.pyplot as plt
+
+                fig = plt.figure()
+                ax = fig.add_subplot()
+                ax.imshow(padded_img)
+            return padded_img
+        contours = self._timed("find_contours", find_contours, binalized_img)
+        if self.allocations is not None:
+            self.allocations.add(*contours)
+        return self.digits_area_from_contours(contours, cropped_img, is_imshow)
+
+    def _digits_area_from_components(
+        self, binalized_img: cv2t.MatLike
+    ) -> cv2t.MatLike:
+        cfg = self.cfg.filtering_digit
+        return digits_area_from_components(
+            binalized_img,
+            bb_filling_ratio=cfg.bb_filling_ratio,
+            bb_image_ratio=cfg.bb_image_ratio,
+            inner_aspect_range=cfg.inner_aspect_range,
+            counter=self.allocations,
+        )
+
+    def digits_area_from_contours(
+        self,
+        contours: Sequence[cv2t.MatLike],
+        cropped_img: cv2t.MatLike,
+        is_imshow: bool = False,
+    ) -> cv2t.MatLike:
+        """Extracts the area of digits from the contours of a binalized image
+
+        Args:
+            contours (Sequence[cv2t.MatLike]): Contours found by `find_contours`.
+            cropped_img (cv2t.MatLike): An image cropped by `crop`.
+            is_imshow (bool, optional): Whether to show the area of digits. Defaults to False.
+
+        Returns:
+            cv2t.MatLike: The padded image that only contains digits.
+        """  # noqa: E501
+        contours = self._timed(
+            "filtering_digit_contours",
+            self._filter_contours,
+            contours,
+            cropped_img,
+        )
+        digits_area = self._timed(
+            "fill_contours",
+            fill_contours,
+            cropped_img,
+            contours,
+            counter=self.allocations,
+        )
+        removed_margins = self._timed(
+            "remove_image_margins",
+            remove_image_margins,
+            digits_area,
+            counter=self.allocations,
+        )
+        padded_img = self._timed(
+            "pad_image", pad_image, removed_margins, counter=self.allocations
+        )
+
+        if is_imshow:
+            import matplotlib.pyplot as plt
+
+            fig = plt.figure()
+            ax = fig.add_subplot()
+            ax.imshow(removed_margins)
+
+        return padded_img
+
+    def estimate(
+        self, digits_img: cv2t.MatLike, is_imshow: bool = False
+    ) -> list[str]:
+        return self._timed(
+            "estimate",
+            estimate_digits_from_image,
+            digits_img,
+            self.cfg.estimation,
+            is_imshow,
+        )
+
+    def estimate_with_confidence(
+        self, digits_img: cv2t.MatLike
+    ) -> list[DigitEstimate]:
+        return self._timed(
+            "estimate",
+            estimate_digits_with_confidence,
+            digits_img,
+            self.cfg.estimation,
+        )
+
+    def process(
+        self,
+        img: cv2t.MatLike,
+        is_imshow: bool = False,
+        from_roi: bool = False,
+    ) -> list[str]:
+        """Extracts digits from a grayscale image
+
+        Args:
+            img (cv2t.MatLike): A grayscale image of the display.
+            is_imshow (bool, optional): Whether to show the intermediate images. Defaults to False.
+            from_roi (bool, optional): Whether `img` was read by `imread_roi`. Defaults to False.
+
+        Returns:
+            list[str]: Digits. The order is (4th, 3rd, 2nd, 1st).
+        """  # noqa: E501
+        cropped_img = self.crop(img, from_roi)
+        return self.process_cropped(cropped_img, is_imshow)
+
+    def process_cropped(
+        self, cropped_img: cv2t.MatLike, is_imshow: bool = False
+    ) -> list[str]:
+        """Extracts digits from an image cropped by `crop`
+
+        Args:
+            cropped_img (cv2t.MatLike): Cropped and corrected image.
+            is_imshow (bool, optional): Whether to show the intermediate images. Defaults to False.
+
+        Returns:
+            list[str]: Digits. The order is (4th, 3rd, 2nd, 1st).
+        """  # noqa: E501
+        binalized_img = self.binalize(cropped_img)
+        digits_img = self.extract_digits_area(
+            binalized_img, cropped_img, is_imshow
+        )
+        return self.estimate(digits_img, is_imshow)
+
+    def process_cropped_with_confidence(
+        self, cropped_img: cv2t.MatLike
+    ) -> list[DigitEstimate]:
+        """Extracts digits and their confidence from a cropped image
+
+        Args:
+            cropped_img (cv2t.MatLike): Cropped and corrected image.
+
+        Returns:
+            list[DigitEstimate]: Estimates. The order is (4th, 3rd, 2nd, 1st).
+        """  # noqa: E501
+        binalized_img = self.binalize(cropped_img)
+        digits_img = self.extract_digits_area(binalized_img, cropped_img)
+        return self.estimate_with_confidence(digits_img)
+
+    def full_quality(self) -> "ExtractDigitPipeline":
+        """A pipeline of the same configuration with the "full" binalization
+
+        It only processes images cropped by this pipeline, so it does not
+        localize the display. This pipeline itself is returned if it already
+        binalizes with "full".
+        """
+        if self.cfg.binalize.mode == "full":
+            return self
+        binalize = self.cfg.binalize.model_copy(update={"mode": "full"})
+        crop_transform = self.cfg.crop_transform.model_copy(
+            update={"localize": None}
+        )
+        return ExtractDigitPipeline(
+            self.cfg.model_copy(
+                update={"binalize": binalize, "crop_transform": crop_transform}
+            ),
+            self.timer,
+        )
+
+    def process_path(
+        self, img_path: str | Path, is_imshow: bool = False
+    ) -> list[str]:
+        cfg = self.cfg.crop_transform
+        # The whole image is needed to show the crop area
+        is_shown = is_imshow or cfg.imshow
+        if self.cache is not None and self.localizer is None and not is_shown:
+            return self._process_path_cached(img_path, self.cache)
+        if self.uses_roi and not is_shown:
+            return self.process(
+                self.imread_roi(img_path), is_imshow, from_roi=True
+            )
+        return self.process(self.imread(img_path), is_imshow)
+
+    def imdecode(
+        self, content: bytes, source: str | Path = "bytes"
+    ) -> cv2t.MatLike:
+        """Decodes the content of an image file for `crop_bytes`
+
+        Only the crop area is decoded if `uses_roi` is true.
+
+        Args:
+            content (bytes): Content of an image file.
+            source (str | Path, optional): Where `content` comes from, for the error message. Defaults to "bytes".
+
+        Raises:
+            ValueError: If the image cannot be decoded.
+
+        Returns:
+            cv2t.MatLike: A grayscale image.
+        """  # noqa: E501
+        if self.uses_roi:
+            return self._timed("imread", imdecode_roi, content, self.roi_plan)
+        img = self._timed(
+            "imread",
+            cv2.imdecode,
+            np.frombuffer(content, np.uint8),
+            cv2.IMREAD_GRAYSCALE,
+        )
+        if img is None:
+            raise ValueError(f"Could not decode an image from {source}")
+        return img
+
+    def crop_bytes(
+        self, content: bytes, source: str | Path = "bytes"
+    ) -> cv2t.MatLike:
+        """Decodes the content of an image file and crops the display"""
+        return self.crop(
+            self.imdecode(content, source), from_roi=self.uses_roi
+        )
+
+    def _process_path_cached(
+        self, img_path: str | Path, cache: ResultCache
+    ) -> list[str]:
+        content = self._timed("read_file", Path(img_path).read_bytes)
+        keys = self._timed("cache_keys", cache_keys, content, self.cfg)
+        digits = cache.get_reading(keys.reading)
+        if digits is not None:
+            return digits
+
+        # The crop is only needed to filter the contours if the mask is hit
+        cropped_img = cache.get_array(keys.crop)
+        if cropped_img is None:
+            cropped_img = self.crop_bytes(content, img_path)
+            cache.put_array(keys.crop, cropped_img)
+        binalized_img = cache.get_array(keys.mask)
+        if binalized_img is None:
+            binalized_img = self.binalize(cropped_img)
+            cache.put_array(keys.mask, binalized_img)
+
+        digits = self.estimate(
+            self.extract_digits_area(binalized_img, cropped_img)
+        )
+        cache.put_reading(keys.reading, digits)
+        return digits
+
+
+class DisplayReading(NamedTuple):
+    name: str
+    digits: list[str]
+    # `repr` of the exception if the digits could not be extracted
+    error: str | None = None
+
+
+class MultiDisplayPipeline:
+    """Extracts digits from every display of `Configurations.displays`
+
+    The image is decoded once, at the largest reduction ratio that every
+    display allows, and the displays are processed in parallel threads
+    over read-only views of the decoded image. OpenCV releases the GIL, so
+    the threads run on several cores. Intermediate images are never shown.
+    """
+
+    def __init__(
+        self,
+        cfg: Configurations,
+        timer: StageTimer | None = None,
+        num_threads: int | None = None,
+    ) -> None:
+        if not cfg.displays:
+            raise ValueError("The configuration has no displays")
+        self.cfg = cfg
+        self.timer = timer
+        display_cfgs = cfg.display_configs()
+        if any(c.crop_transform.localize for c in display_cfgs.values()):
+            raise ValueError("Displays cannot be localized")
+        self.reduction = 1
+        if all(c.crop_transform.roi_decode for c in display_cfgs.values()):
+            self.reduction = min(
+                plan_roi_decode(
+                    c.crop_transform.crop_area_vertices,
+                    c.crop_transform.scaled_dst_size(),
+                ).reduction
+                for c in display_cfgs.values()
+            )
+        self.pipelines = {
+            name: ExtractDigitPipeline(c, timer, max_reduction=self.reduction)
+            for name, c in display_cfgs.items()
+        }
+        num_threads = num_threads or len(self.pipelines)
+        self._executor = (
+            ThreadPoolExecutor(num_threads, thread_name_prefix="display")
+            if num_threads > 1
+            else None
+        )
+
+    @staticmethod
+    def from_json(
+        path: str | Path,
+        timer: StageTimer | None = None,
+        num_threads: int | None = None,
+    ) -> "MultiDisplayPipeline":
+        return MultiDisplayPipeline(
+            Configurations.load_json(path), timer, num_threads
+        )
+
+    def _timed(
+        self, name: str, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        if self.timer is None:
+            return func(*args, **kwargs)
+        return self.timer.call(name, func, *args, **kwargs)
+
+    def imread(self, img_path: str | Path) -> cv2t.MatLike:
+        flag = REDUCED_GRAYSCALE_FLAGS[self.reduction]
+        img = self._timed("imread", cv2.imread, str(img_path), flag)
+        if img is None:
+            raise FileNotFoundError(f"Could not read an image from {img_path}")
+        return img
+
+    def _read_display(
+        self, name: str, img: np.ndarray, is_reduced: bool = True
+    ) -> DisplayReading:
+        pipeline = self.pipelines[name]
+        try:
+            if is_reduced and pipeline.cfg.crop_transform.roi_decode:
+                left, right, top, bottom = pipeline.roi_plan.area.unpack()
+                # A view, not a copy
+                cropped_img = pipeline.crop(
+                    img[top:bottom, left:right], from_roi=True
+                )
+            else:
+                cropped_img = pipeline.crop(img)
+            return DisplayReading(name, pipeline.process_cropped(cropped_img))
+        except Exception as e:
+            return DisplayReading(name, [""] * 4, repr(e))
+
+    def process(
+        self, img: cv2t.MatLike, is_reduced: bool = True
+    ) -> list[DisplayReading]:
+        """Extracts digits of every display from an image read by `imread`
+
+        Args:
+            img (cv2t.MatLike): A grayscale image decoded at `reduction`.
+            is_reduced (bool, optional): Whether `img` was decoded at `reduction`. If False, `img` is a whole image at full resolution, e.g. a frame of a stack, and each display is cropped from it with its full resolution transform. Defaults to True.
+
+        Returns:
+            list[DisplayReading]: The reading of each display in the order of `displays`. A display that fails does not stop the others.
+        """  # noqa: E501
+        shared = np.asarray(img).view()
+        # The displays only read the image
+        shared.flags.writeable = False
+        names = list(self.pipelines)
+        if self._executor is None:
+            return [
+                self._read_display(name, shared, is_reduced) for name in names
+            ]
+        return list(
+            self._executor.map(
+                self._read_display,
+                names,
+                [shared] * len(names),
+                [is_reduced] * len(names),
+            )
+        )
+
+    def process_path(self, img_path: str | Path) -> list[DisplayReading]:
+        return self.process(self.imread(img_path))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
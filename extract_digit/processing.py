@@ -1,13 +1,52 @@
-from typing import Sequence, overload
+from typing import TYPE_CHECKING, Sequence, overload
 
 import cv2
 import cv2.typing as cv2t
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.figure import Figure
-from matplotlib.patches import Polygon
 
-from .param_config import BoundingBox, QuadrilateralVertices, RangeTuple
+from .param_config import (
+    BoundingBox,
+    QuadrilateralVertices,
+    RangeTuple,
+    odd_size,
+)
+
+# matplotlib is only imported when something is shown, so that the pipeline
+# starts quickly and runs without a display
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+def get_dst_vertices(dst_size: tuple[int, int]) -> np.ndarray:
+    """Gets the vertices of the rectified image
+
+    Args:
+        dst_size (tuple[int, int]): Image size after rectangle correction. (height, width)
+
+    Returns:
+        np.ndarray: Vertices in the order (upper left, upper right, lower right, lower left).
+    """  # noqa: E501
+    height, width = dst_size
+    return np.array(
+        [[0, 0], [width, 0], [width, height], [0, height]], np.float32
+    )
+
+
+def get_perspective_transform(
+    crop_area_vertices: QuadrilateralVertices,
+    dst_size: tuple[int, int],
+) -> cv2t.MatLike:
+    """Calculates the matrix that rectifies the crop area
+
+    Args:
+        crop_area_vertices (QuadrilateralVertices): Each vertex of the area to be cropped.
+        dst_size (tuple[int, int]): Image size after rectangle correction. (height, width)
+
+    Returns:
+        cv2t.MatLike: 3x3 perspective transformation matrix.
+    """  # noqa: E501
+    src_pts = np.array(crop_area_vertices.align_vertices(), np.float32)
+    return cv2.getPerspectiveTransform(src_pts, get_dst_vertices(dst_size))
 
 
 def crop_transform_show_digits(
@@ -18,6 +57,7 @@ def crop_transform_show_digits(
     *,
     imshow: bool = False,
     close_up_area: BoundingBox | None = None,
+    trans_mat: cv2t.MatLike | None = None,
 ) -> cv2t.MatLike:
     """Crops and rectifies a target area of an image to a rectangle
 
@@ -27,20 +67,20 @@ def crop_transform_show_digits(
         dst_size (tuple[int, int]): Image size after rectangle correction.
         imshow (bool, optional): Whether to compare images before and after conversion.  Defaults to False.
         close_up_area (BoundingBox | None, optional): _description_. Defaults to None.
+        trans_mat (cv2t.MatLike | None, optional): A precomputed perspective transformation matrix. Calculated from `crop_area_vertices` if None. Defaults to None.
 
     Returns:
         cv2t.MatLike: Cropped and corrected image.
     """  # noqa: E501
-    src_pts1 = np.array(crop_area_vertices.align_vertices(), np.float32)
     height, width = dst_size
-    dst_pts2 = np.array(
-        [[0, 0], [width, 0], [width, height], [0, height]], np.float32
-    )
-
-    trans_mat = cv2.getPerspectiveTransform(src_pts1, dst_pts2)
+    if trans_mat is None:
+        trans_mat = get_perspective_transform(crop_area_vertices, dst_size)
     dst = cv2.warpPerspective(src, trans_mat, (width, height))
 
     if imshow:
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Polygon
+
         if close_up_area is None:
             xmin, ymin = 0, 0
             ymax, xmax = src.shape
@@ -89,6 +129,7 @@ def binalize_image(
     adaptive_thresh_blocksize: int = 301,
     adaptive_thresh_C: int = 1,
     closing_ksize: cv2t.Size = (3, 3),
+    closing_kernel: cv2t.MatLike | None = None,
 ) -> cv2t.MatLike:
     blured = cv2.GaussianBlur(img, ksize=gb_ksize, sigmaX=gb_sigmaX)
     blured = cv2.edgePreservingFilter(
@@ -102,11 +143,94 @@ def binalize_image(
         adaptive_thresh_blocksize,
         adaptive_thresh_C,
     )
-    kernel = np.ones(closing_ksize, np.uint8)
-    close = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    if closing_kernel is None:
+        closing_kernel = np.ones(closing_ksize, np.uint8)
+    close = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, closing_kernel)
     return close
 
 
+def binalize_image_fast(
+    img: cv2t.MatLike,
+    scale: float = 0.5,
+    gb_ksize: cv2t.Size = (15, 15),
+    gb_sigmaX: float = 2,
+    adaptive_thresh_blocksize: int = 301,
+    adaptive_thresh_C: int = 1,
+    closing_ksize: cv2t.Size = (3, 3),
+    closing_kernel: cv2t.MatLike | None = None,
+) -> cv2t.MatLike:
+    """Binalizes an image with a mean threshold on a downscaled copy
+
+    The edge preserving filter is skipped and the Gaussian adaptive threshold
+    is replaced by a box-filter mean, both of which dominate the time of
+    `binalize_image`. The kernel sizes are scaled with the image.
+
+    Args:
+        img (cv2t.MatLike): A grayscale image.
+        scale (float, optional): Scale of the downscaled copy. Defaults to 0.5.
+        gb_ksize (cv2t.Size, optional): Kernel size of Gaussian blur at the original scale. Defaults to (15, 15).
+        gb_sigmaX (float, optional): Sigma of Gaussian blur at the original scale. Defaults to 2.
+        adaptive_thresh_blocksize (int, optional): Block size of the threshold at the original scale. Defaults to 301.
+        adaptive_thresh_C (int, optional): Constant subtracted from the mean. Defaults to 1.
+        closing_ksize (cv2t.Size, optional): Kernel size of closing. Defaults to (3, 3).
+        closing_kernel (cv2t.MatLike | None, optional): A precomputed kernel of closing. Defaults to None.
+
+    Returns:
+        cv2t.MatLike: A binary image of the same size as `img`. Digits are white.
+    """  # noqa: E501
+    height, width = img.shape[:2]
+    small = cv2.resize(
+        img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+    )
+    small = cv2.GaussianBlur(
+        small,
+        ksize=(odd_size(gb_ksize[0] * scale), odd_size(gb_ksize[1] * scale)),
+        sigmaX=gb_sigmaX * scale,
+    )
+    binary = cv2.adaptiveThreshold(
+        small,
+        255,
+        cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY_INV,
+        odd_size(adaptive_thresh_blocksize * scale, minimum=3),
+        adaptive_thresh_C,
+    )
+    binary = cv2.resize(
+        binary, (width, height), interpolation=cv2.INTER_NEAREST
+    )
+    if closing_kernel is None:
+        closing_kernel = np.ones(closing_ksize, np.uint8)
+    return cv2.morphologyEx(binary, cv2.MORPH_CLOSE, closing_kernel)
+
+
+def binalize_image_otsu(
+    img: cv2t.MatLike,
+    gb_ksize: cv2t.Size = (15, 15),
+    gb_sigmaX: float = 2,
+    closing_ksize: cv2t.Size = (3, 3),
+    closing_kernel: cv2t.MatLike | None = None,
+) -> cv2t.MatLike:
+    """Binalizes an image with Otsu's global threshold
+
+    Args:
+        img (cv2t.MatLike): A grayscale image.
+        gb_ksize (cv2t.Size, optional): Kernel size of Gaussian blur. Defaults to (15, 15).
+        gb_sigmaX (float, optional): Sigma of Gaussian blur. Defaults to 2.
+        closing_ksize (cv2t.Size, optional): Kernel size of closing. Defaults to (3, 3).
+        closing_kernel (cv2t.MatLike | None, optional): A precomputed kernel of closing. Defaults to None.
+
+    Returns:
+        cv2t.MatLike: A binary image. Digits are white.
+    """  # noqa: E501
+    blured = cv2.GaussianBlur(img, ksize=gb_ksize, sigmaX=gb_sigmaX)
+    _, binary = cv2.threshold(
+        blured, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+    )
+    if closing_kernel is None:
+        closing_kernel = np.ones(closing_ksize, np.uint8)
+    return cv2.morphologyEx(binary, cv2.MORPH_CLOSE, closing_kernel)
+
+
 @overload
 def find_contours(
     src_img: cv2t.MatLike,
@@ -115,17 +239,20 @@ def find_contours(
 def find_contours(
     src_img: cv2t.MatLike,
     base_img: cv2t.MatLike,
-) -> tuple[Sequence[cv2.typing.MatLike], Figure]: ...
+) -> tuple[Sequence[cv2.typing.MatLike], "Figure"]: ...
 def find_contours(
     src_img: cv2t.MatLike,
     base_img: cv2t.MatLike | None = None,
 ) -> (
-    Sequence[cv2.typing.MatLike] | tuple[Sequence[cv2.typing.MatLike], Figure]
+    Sequence[cv2.typing.MatLike]
+    | tuple[Sequence[cv2.typing.MatLike], "Figure"]
 ):
     contours = cv2.findContours(
         src_img, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE
     )[0]
     if base_img is not None:
+        import matplotlib.pyplot as plt
+
         fig = plt.figure()
         ax = fig.add_subplot()
         drawing = cv2.cvtColor(base_img, cv2.COLOR_GRAY2RGB)
@@ -160,27 +287,125 @@ def _calc_aspect(aspect_range: tuple[float, float] | RangeTuple) -> float:
     return max(aspect_range) / min(aspect_range)
 
 
-def _is_inner_aspect(contour: cv2t.MatLike, aspect_range: RangeTuple) -> bool:
-    _, _, w, h = cv2.boundingRect(contour)
-    aspect = _calc_aspect((w, h))
-    return aspect < aspect_range.maximum and aspect > aspect_range.minimum
+# Features of a contour. The bounding box is that of `cv2.boundingRect`,
+# `area` that of `cv2.contourArea`, `aspect` is the longer side of the
+# bounding box over the shorter one and `fill` is `area` over the area of
+# the bounding box.
+CONTOUR_FEATURES_DTYPE = np.dtype(
+    [
+        ("x", np.int32),
+        ("y", np.int32),
+        ("width", np.int32),
+        ("height", np.int32),
+        ("area", np.float64),
+        ("aspect", np.float64),
+        ("fill", np.float64),
+    ]
+)
 
 
-def _calc_bb_fill_ratio(contour: cv2t.MatLike) -> float:
-    _, _, w, h = cv2.boundingRect(contour)
-    contour_area = abs(cv2.contourArea(contour, True))
-    return contour_area / (w * h)
+def contour_features(contours: Sequence[cv2t.MatLike]) -> np.ndarray:
+    """Computes the features of every contour at once
 
+    The points of all contours are concatenated, and the bounding boxes
+    and the areas (by the shoelace formula) are reduced per contour, so no
+    OpenCV function is called per contour.
 
-def _calc_bb_img_ratio(contour: cv2t.MatLike, img: cv2t.MatLike) -> float:
-    h, w = img.shape[:2]
-    contour_area = abs(cv2.contourArea(contour, True))
-    return contour_area / (h * w)
+    Args:
+        contours (Sequence[cv2t.MatLike]): Contours found by `find_contours`.
 
+    Returns:
+        np.ndarray: A structured array of `CONTOUR_FEATURES_DTYPE` in the order of `contours`.
+    """  # noqa: E501
+    features = np.zeros(len(contours), CONTOUR_FEATURES_DTYPE)
+    if len(contours) == 0:
+        return features
+    lengths = np.fromiter(
+        (len(contour) for contour in contours), np.intp, len(contours)
+    )
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    starts = np.zeros(len(contours), np.intp)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    xs, ys = points[:, 0], points[:, 1]
+
+    min_x = np.minimum.reduceat(xs, starts)
+    min_y = np.minimum.reduceat(ys, starts)
+    width = np.maximum.reduceat(xs, starts) - min_x + 1
+    height = np.maximum.reduceat(ys, starts) - min_y + 1
+    # The next point of each point, wrapping around within each contour
+    next_points = np.arange(1, len(points) + 1)
+    next_points[starts + lengths - 1] = starts
+    cross = xs * ys[next_points] - xs[next_points] * ys
+    area = np.abs(np.add.reduceat(cross, starts)) / 2
+
+    features["x"] = min_x
+    features["y"] = min_y
+    features["width"] = width
+    features["height"] = height
+    features["area"] = area
+    features["aspect"] = np.maximum(width, height) / np.minimum(width, height)
+    features["fill"] = area / (width * height)
+    return features
+
+
+def select_digit_features(
+    features: np.ndarray,
+    img_shape: tuple[int, ...],
+    bb_filling_ratio: float = 0.3,
+    bb_image_ratio: float = 3e-3,
+    inner_aspect_range: RangeTuple = RangeTuple(1.3, 6),
+) -> np.ndarray:
+    """Selects the contours of digits by their features
 
-def _is_longer_than_width(contour: cv2t.MatLike) -> bool:
-    _, _, w, h = cv2.boundingRect(contour)
-    return h > w
+    Args:
+        features (np.ndarray): Features computed by `contour_features`.
+        img_shape (tuple[int, ...]): Shape of the image of the contours.
+        bb_filling_ratio (float, optional): Minimum `fill`. Defaults to 0.3.
+        bb_image_ratio (float, optional): Minimum area as a ratio of the area of the image. Defaults to 3e-3.
+        inner_aspect_range (RangeTuple, optional): Range of `aspect`, exclusive. Defaults to RangeTuple(1.3, 6).
+
+    Returns:
+        np.ndarray: Indices of the selected contours in ascending order.
+    """  # noqa: E501
+    h, w = img_shape[:2]
+    mask = (
+        (features["height"] > features["width"])
+        & (features["fill"] > bb_filling_ratio)
+        & (features["area"] / (h * w) > bb_image_ratio)
+        & (features["aspect"] > inner_aspect_range.minimum)
+        & (features["aspect"] < inner_aspect_range.maximum)
+    )
+    return np.flatnonzero(mask)
+
+
+def filtering_digit_contour_features(
+    contours: Sequence[cv2t.MatLike],
+    src_img: cv2t.MatLike,
+    bb_filling_ratio: float = 0.3,
+    bb_image_ratio: float = 3e-3,
+    inner_aspect_range: RangeTuple = RangeTuple(1.3, 6),
+) -> tuple[np.ndarray, np.ndarray]:
+    """Filters contours of digits and keeps their features
+
+    Args:
+        contours (Sequence[cv2t.MatLike]): Contours found by `find_contours`.
+        src_img (cv2t.MatLike): The image of the contours.
+        bb_filling_ratio (float, optional): Minimum `fill`. Defaults to 0.3.
+        bb_image_ratio (float, optional): Minimum area as a ratio of the area of the image. Defaults to 3e-3.
+        inner_aspect_range (RangeTuple, optional): Range of `aspect`, exclusive. Defaults to RangeTuple(1.3, 6).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Indices of the contours of digits in `contours` and their features.
+    """  # noqa: E501
+    features = contour_features(contours)
+    indices = select_digit_features(
+        features,
+        src_img.shape,
+        bb_filling_ratio,
+        bb_image_ratio,
+        inner_aspect_range,
+    )
+    return indices, features[indices]
 
 
 def filtering_digit_contours(
@@ -190,21 +415,82 @@ def filtering_digit_contours(
     bb_image_ratio: float = 3e-3,
     inner_aspect_range: RangeTuple = RangeTuple(1.3, 6),
 ) -> Sequence[cv2t.MatLike]:
-    extracted_contours = list(
-        filter(
-            lambda x: _is_longer_than_width(x)
-            and _calc_bb_fill_ratio(x) > bb_filling_ratio
-            and _calc_bb_img_ratio(x, src_img) > bb_image_ratio
-            and _is_inner_aspect(x, inner_aspect_range),
-            contours,
-        )
+    indices, _ = filtering_digit_contour_features(
+        contours,
+        src_img,
+        bb_filling_ratio,
+        bb_image_ratio,
+        inner_aspect_range,
+    )
+    return [contours[i] for i in indices]
+
+
+def component_features(stats: np.ndarray) -> np.ndarray:
+    """Features of connected components from their statistics
+
+    Args:
+        stats (np.ndarray): Statistics of `cv2.connectedComponentsWithStats` without the background.
+
+    Returns:
+        np.ndarray: A structured array of `CONTOUR_FEATURES_DTYPE`. `area` is the number of pixels, so holes are not counted.
+    """  # noqa: E501
+    features = np.zeros(len(stats), CONTOUR_FEATURES_DTYPE)
+    width = stats[:, cv2.CC_STAT_WIDTH]
+    height = stats[:, cv2.CC_STAT_HEIGHT]
+    area = stats[:, cv2.CC_STAT_AREA]
+    features["x"] = stats[:, cv2.CC_STAT_LEFT]
+    features["y"] = stats[:, cv2.CC_STAT_TOP]
+    features["width"] = width
+    features["height"] = height
+    features["area"] = area
+    features["aspect"] = np.maximum(width, height) / np.minimum(width, height)
+    features["fill"] = area / (width * height)
+    return features
+
+
+def count_digit_features(features: np.ndarray) -> int:
+    """Counts contours whose bounding box is not inside a larger one
+
+    Args:
+        features (np.ndarray): Features computed by `contour_features`.
+
+    Returns:
+        int: Number of digits.
+    """
+    x, y = features["x"], features["y"]
+    right = x + features["width"]
+    bottom = y + features["height"]
+    area = features["width"].astype(np.int64) * features["height"]
+    # is_inner[i, j]: whether the box i is inside the larger box j
+    is_inner = (
+        (x[:, None] >= x)
+        & (y[:, None] >= y)
+        & (right[:, None] <= right)
+        & (bottom[:, None] <= bottom)
+        & (area[:, None] < area)
     )
-    return extracted_contours
+    return int(np.count_nonzero(~is_inner.any(1)))
+
+
+def count_digit_contours(contours: Sequence[cv2t.MatLike]) -> int:
+    """Counts contours that are not inside another contour
+
+    Holes of digits such as 0 and 8 are not counted.
+
+    Args:
+        contours (Sequence[cv2t.MatLike]): Contours of digits.
+
+    Returns:
+        int: Number of digits.
+    """
+    return count_digit_features(contour_features(contours))
 
 
 def draw_contours(
     src_img: cv2t.MatLike, contours: Sequence[cv2t.MatLike]
-) -> tuple[cv2t.MatLike, Figure]:
+) -> tuple[cv2t.MatLike, "Figure"]:
+    import matplotlib.pyplot as plt
+
     fig = plt.figure()
     ax = fig.add_subplot()
     drawing_canvas = cv2.cvtColor(src_img, cv2.COLOR_GRAY2RGB)
@@ -217,35 +503,84 @@ def draw_contours(
 
 
 def sort_digit_contours(
-    contours: Sequence[cv2t.MatLike],
+    contours: Sequence[cv2t.MatLike], features: np.ndarray | None = None
 ) -> Sequence[cv2t.MatLike]:
-    return sorted(contours, key=lambda x: np.squeeze(x)[:, 0].min())
+    """Sorts contours from left to right
+
+    Args:
+        contours (Sequence[cv2t.MatLike]): Contours of digits.
+        features (np.ndarray | None, optional): Features of `contours` computed by `contour_features`. Computed if None. Defaults to None.
+
+    Returns:
+        Sequence[cv2t.MatLike]: Sorted contours.
+    """  # noqa: E501
+    if features is None:
+        features = contour_features(contours)
+    return [contours[i] for i in np.argsort(features["x"], kind="stable")]
+
+
+class AllocationCounter:
+    """Counts the arrays allocated while extracting the area of digits"""
+
+    def __init__(self) -> None:
+        self.num_arrays = 0
+        self.num_bytes = 0
 
+    def add(self, *arrays: np.ndarray) -> None:
+        for array in arrays:
+            self.count(array.nbytes)
 
-def remove_image_margins(img: cv2t.MatLike) -> cv2t.MatLike:
+    def count(self, num_bytes: int) -> None:
+        """Counts an array that is not returned, by its size"""
+        self.num_arrays += 1
+        self.num_bytes += num_bytes
+
+    def reset(self) -> None:
+        self.num_arrays = 0
+        self.num_bytes = 0
+
+
+def remove_image_margins(
+    img: cv2t.MatLike, counter: AllocationCounter | None = None
+) -> cv2t.MatLike:
     bb = BoundingBox.get_bounding_box(img)
-    return img.copy()[bb.top : bb.bottom, bb.left : bb.right]
+    copied = img.copy()
+    if counter is not None:
+        # `get_bounding_box` allocates the indices of all nonzero pixels
+        num_nonzero = int(np.count_nonzero(img))
+        counter.count(num_nonzero * img.ndim * np.dtype(np.intp).itemsize)
+        counter.add(copied)
+    return copied[bb.top : bb.bottom, bb.left : bb.right]
 
 
 def fill_contours(
-    base_img: cv2t.MatLike, contours: Sequence[cv2t.MatLike]
+    base_img: cv2t.MatLike,
+    contours: Sequence[cv2t.MatLike],
+    counter: AllocationCounter | None = None,
 ) -> cv2t.MatLike:
     drawing = np.zeros_like(base_img, np.uint8)
+    if counter is not None:
+        counter.add(drawing)
     contour_area_img = cv2.fillPoly(drawing, contours, (255,))
     # _, masked = cv2.threshold(base_img * mask, 1, 255, cv2.THRESH_BINARY)
     return contour_area_img
 
 
+def _pad_size(
+    img_shape: tuple[int, ...], pad_size: Sequence[int] | None
+) -> tuple[int, int]:
+    if pad_size is None:
+        h, w = img_shape[:2]
+        return h // 20, w // 20
+    return pad_size[0], pad_size[1]
+
+
 def pad_image(
-    img: cv2t.MatLike, pad_size: Sequence[int] | None = None
+    img: cv2t.MatLike,
+    pad_size: Sequence[int] | None = None,
+    counter: AllocationCounter | None = None,
 ) -> cv2t.MatLike:
-    if pad_size is None:
-        h, w = img.shape[:2]
-        pad_size_h = h // 20
-        pad_size_w = w // 20
-    else:
-        pad_size_h = pad_size[0]
-        pad_size_w = pad_size[1]
+    pad_size_h, pad_size_w = _pad_size(img.shape, pad_size)
 
     padding = cv2.copyMakeBorder(
         img,
@@ -256,4 +591,78 @@ def pad_image(
         cv2.BORDER_CONSTANT,
         value=(0, 0, 0),
     )
+    if counter is not None:
+        counter.add(padding)
     return padding
+
+
+def digits_area_from_components(
+    binalized_img: cv2t.MatLike,
+    bb_filling_ratio: float = 0.3,
+    bb_image_ratio: float = 3e-3,
+    inner_aspect_range: RangeTuple = RangeTuple(1.3, 6),
+    pad_size: Sequence[int] | None = None,
+    counter: AllocationCounter | None = None,
+) -> cv2t.MatLike:
+    """Extracts the padded area of digits with connected components
+
+    The bounding boxes and areas of all components are computed in one
+    pass, digits are selected like `filtering_digit_contours` does, and
+    their labels are written through a lookup table straight into the
+    padded output, cropped like `remove_image_margins` and `pad_image`. No
+    other image sized array is allocated. Unlike `fill_contours`, holes of
+    digits such as 0 and 8 are never filled.
+
+    Args:
+        binalized_img (cv2t.MatLike): A binary image. Digits are white.
+        bb_filling_ratio (float, optional): Minimum ratio of the pixels of a component to its bounding box. Defaults to 0.3.
+        bb_image_ratio (float, optional): Minimum number of pixels of a component as a ratio of the area of the image. Defaults to 3e-3.
+        inner_aspect_range (RangeTuple, optional): Range of the aspect of the bounding box, exclusive. Defaults to RangeTuple(1.3, 6).
+        pad_size (Sequence[int] | None, optional): (height, width) of the padding. 1/20 of the area of digits if None. Defaults to None.
+        counter (AllocationCounter | None, optional): Counts the allocated arrays. Defaults to None.
+
+    Raises:
+        ValueError: If no digit is found.
+
+    Returns:
+        cv2t.MatLike: The padded image that only contains digits.
+    """  # noqa: E501
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        binalized_img, connectivity=8, ltype=cv2.CV_32S
+    )
+    features = component_features(stats[1:])
+    # Label 0 is the background
+    selected = select_digit_features(
+        features,
+        binalized_img.shape,
+        bb_filling_ratio,
+        bb_image_ratio,
+        inner_aspect_range,
+    )
+    if len(selected) == 0:
+        raise ValueError("No digits were found")
+    selected_features = features[selected]
+    top = int(selected_features["y"].min())
+    left = int(selected_features["x"].min())
+    # Like `remove_image_margins`, the last row and column are left out
+    bottom = int((selected_features["y"] + selected_features["height"]).max())
+    right = int((selected_features["x"] + selected_features["width"]).max())
+    height, width = bottom - 1 - top, right - 1 - left
+    pad_h, pad_w = _pad_size((height, width), pad_size)
+
+    lut = np.zeros(num_labels, np.uint8)
+    lut[selected + 1] = 255
+    padded = np.zeros((height + 2 * pad_h, width + 2 * pad_w), np.uint8)
+    # The labels are already int32, so this is a view, not a copy
+    digit_labels = np.asarray(labels, np.int32)[
+        top : top + height, left : left + width
+    ]
+    np.take(
+        lut,
+        digit_labels,
+        out=padded[pad_h : pad_h + height, pad_w : pad_w + width],
+        mode="clip",
+    )
+    if counter is not None:
+        counter.add(labels, stats, centroids, features, lut, padded)
+    return padded
@@ -0,0 +1,297 @@
+import math
+import multiprocessing as mp
+import queue
+from multiprocessing import shared_memory
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple, Sequence
+
+import numpy as np
+
+from .batch import DIGIT_COLUMNS, ImageResult
+from .param_config import DEFAULT_CONFIG_PATH, Configurations
+from .pipeline import ExtractDigitPipeline
+from .timing import StageRecord, StageTimer
+
+# The planes of a slot
+CROPPED, BINALIZED = 0, 1
+
+
+class FrameRing:
+    """Fixed-size slots of images in one block of shared memory
+
+    Each slot holds the cropped image and the binalized image of a frame,
+    so processes hand a frame over by the index of its slot. The process
+    that creates the ring owns the block and must `close` and `unlink` it.
+    """
+
+    def __init__(
+        self,
+        num_slots: int,
+        slot_shape: tuple[int, ...],
+        name: str | None = None,
+    ) -> None:
+        if num_slots < 1:
+            raise ValueError(f"`num_slots` must be 1 or more, but {num_slots}")
+        self.num_slots = num_slots
+        self.slot_shape = tuple(slot_shape)
+        size = num_slots * math.prod(self.slot_shape)
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=name is None, size=size
+        )
+        self._array: np.ndarray | None = np.ndarray(
+            (num_slots, *self.slot_shape), np.uint8, self.shm.buf
+        )
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Attach to the block by its name instead of pickling the images
+        return (FrameRing, (self.num_slots, self.slot_shape, self.shm.name))
+
+    def slot(self, index: int) -> np.ndarray:
+        if self._array is None:
+            raise ValueError("The ring is closed")
+        slot: np.ndarray = self._array[index]
+        return slot
+
+    def close(self) -> None:
+        # Views of the buffer must be released before it is closed
+        self._array = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+
+
+class _Handoff(NamedTuple):
+    # Position of the image in the inputs
+    position: int
+    # -1 if the image failed and holds no slot
+    slot: int
+    error: str | None = None
+    records: tuple[StageRecord, ...] = ()
+
+
+class _Reading(NamedTuple):
+    position: int
+    digits: list[str]
+    error: str | None
+    records: tuple[StageRecord, ...]
+
+
+class _Queues(NamedTuple):
+    tasks: "Queue[tuple[int, Path] | None]"
+    free_slots: "Queue[int]"
+    cropped: "Queue[_Handoff | None]"
+    binalized: "Queue[_Handoff | None]"
+    readings: "Queue[_Reading]"
+
+
+def _new_pipeline(
+    config_path: str | Path, is_timed: bool
+) -> ExtractDigitPipeline:
+    timer = StageTimer() if is_timed else None
+    return ExtractDigitPipeline.from_json(config_path, timer)
+
+
+def _take_records(pipeline: ExtractDigitPipeline) -> tuple[StageRecord, ...]:
+    timer = pipeline.timer
+    if timer is None:
+        return ()
+    records = tuple(timer.records)
+    timer.reset()
+    return records
+
+
+def _crop_stage(
+    config_path: str | Path, is_timed: bool, ring: FrameRing, queues: _Queues
+) -> None:
+    pipeline = _new_pipeline(config_path, is_timed)
+    while (task := queues.tasks.get()) is not None:
+        position, img_path = task
+        try:
+            cropped_img = pipeline.crop_path(img_path)
+        except Exception as e:
+            queues.cropped.put(
+                _Handoff(position, -1, repr(e), _take_records(pipeline))
+            )
+            continue
+        # Blocks while every slot is in use, which holds back the reading
+        slot = queues.free_slots.get()
+        ring.slot(slot)[CROPPED] = cropped_img
+        queues.cropped.put(
+            _Handoff(position, slot, None, _take_records(pipeline))
+        )
+    queues.cropped.put(None)
+
+
+def _binalize_stage(
+    config_path: str | Path,
+    is_timed: bool,
+    ring: FrameRing,
+    queues: _Queues,
+    num_croppers: int,
+) -> None:
+    pipeline = _new_pipeline(config_path, is_timed)
+    num_finished = 0
+    while num_finished < num_croppers:
+        handoff = queues.cropped.get()
+        if handoff is None:
+            num_finished += 1
+            continue
+        if handoff.slot >= 0:
+            images = ring.slot(handoff.slot)
+            try:
+                images[BINALIZED] = pipeline.binalize(images[CROPPED])
+            except Exception as e:
+                queues.free_slots.put(handoff.slot)
+                handoff = handoff._replace(slot=-1, error=repr(e))
+        records = handoff.records + _take_records(pipeline)
+        queues.binalized.put(handoff._replace(records=records))
+    queues.binalized.put(None)
+
+
+def _estimate_stage(
+    config_path: str | Path, is_timed: bool, ring: FrameRing, queues: _Queues
+) -> None:
+    pipeline = _new_pipeline(config_path, is_timed)
+    while (handoff := queues.binalized.get()) is not None:
+        digits = [""] * len(DIGIT_COLUMNS)
+        error = handoff.error
+        if handoff.slot >= 0:
+            images = ring.slot(handoff.slot)
+            try:
+                digits = pipeline.estimate(
+                    pipeline.extract_digits_area(
+                        images[BINALIZED], images[CROPPED]
+                    )
+                )
+            except Exception as e:
+                error = repr(e)
+            finally:
+                queues.free_slots.put(handoff.slot)
+        records = handoff.records + _take_records(pipeline)
+        queues.readings.put(_Reading(handoff.position, digits, error, records))
+
+
+def _stage_processes(
+    config_path: str | Path,
+    is_timed: bool,
+    ring: FrameRing,
+    queues: _Queues,
+    num_croppers: int,
+) -> list[BaseProcess]:
+    args = (config_path, is_timed, ring, queues)
+    processes: list[BaseProcess] = [
+        mp.Process(target=_crop_stage, args=args, name=f"crop-{i}")
+        for i in range(num_croppers)
+    ]
+    processes.append(
+        mp.Process(
+            target=_binalize_stage,
+            args=(*args, num_croppers),
+            name="binalize",
+        )
+    )
+    processes.append(
+        mp.Process(target=_estimate_stage, args=args, name="estimate")
+    )
+    return processes
+
+
+def _stop(processes: Sequence[BaseProcess], queues: _Queues) -> None:
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        if process.pid is not None:
+            process.join()
+    for q in queues:
+        # Items left in a queue must not block the exit of this process
+        q.cancel_join_thread()
+        q.close()
+
+
+def _get_reading(
+    readings: "Queue[_Reading]", processes: Sequence[BaseProcess]
+) -> _Reading:
+    while True:
+        try:
+            return readings.get(timeout=0.5)
+        except queue.Empty:
+            for process in processes:
+                if process.exitcode not in (None, 0):
+                    raise RuntimeError(
+                        f"{process.name} exited with {process.exitcode}"
+                    ) from None
+
+
+def process_paths_shared(
+    img_paths: Sequence[Path],
+    config_path: str | Path = DEFAULT_CONFIG_PATH,
+    num_croppers: int = 1,
+    num_slots: int = 8,
+    timer: StageTimer | None = None,
+) -> Iterator[ImageResult]:
+    """Extracts digits with a process for each stage
+
+    Images are read and cropped by `num_croppers` processes, binalized by
+    another process and their digits are estimated by a third one, so the
+    stages run at the same time. The images are handed over through a
+    `FrameRing` of `num_slots` slots of the scaled `dst_size`, and the
+    queues only carry slot indices. When every slot is in use, reading
+    waits for the estimation to free one, so at most `num_slots` images are
+    in flight.
+    The processes are stopped and the shared memory is released when the
+    iterator ends or is closed.
+
+    Args:
+        img_paths (Sequence[Path]): Paths to the images.
+        config_path (str | Path, optional): Path to the configuration file. Defaults to DEFAULT_CONFIG_PATH.
+        num_croppers (int, optional): Number of processes that read and crop images. Defaults to 1.
+        num_slots (int, optional): Number of slots of the ring. Defaults to 8.
+        timer (StageTimer | None, optional): The stages of every image are recorded in it. Defaults to None.
+
+    Raises:
+        ValueError: If the configuration has `displays`, which are not supported.
+        RuntimeError: If a process of a stage dies.
+
+    Yields:
+        Iterator[ImageResult]: The result of each image in the order of `img_paths`.
+    """  # noqa: E501
+    if num_croppers < 1:
+        raise ValueError(
+            f"`num_croppers` must be 1 or more, but {num_croppers}"
+        )
+    cfg = Configurations.load_json(config_path)
+    if cfg.displays:
+        raise ValueError("Displays are not supported by the shared memory")
+    ring = FrameRing(num_slots, (2, *cfg.crop_transform.scaled_dst_size()))
+    queues = _Queues(*(mp.Queue() for _ in _Queues._fields))
+    for slot in range(num_slots):
+        queues.free_slots.put(slot)
+    for task in enumerate(img_paths):
+        queues.tasks.put(task)
+    for _ in range(num_croppers):
+        queues.tasks.put(None)
+    processes = _stage_processes(
+        config_path, timer is not None, ring, queues, num_croppers
+    )
+    try:
+        for process in processes:
+            process.start()
+        # Croppers may finish out of order
+        pending: dict[int, _Reading] = {}
+        for position, img_path in enumerate(img_paths):
+            while position not in pending:
+                reading = _get_reading(queues.readings, processes)
+                pending[reading.position] = reading
+            reading = pending.pop(position)
+            if timer is not None:
+                timer.extend(reading.records)
+            yield ImageResult(
+                img_path, reading.digits, reading.error, reading.records
+            )
+    finally:
+        _stop(processes, queues)
+        ring.close()
+        ring.unlink()
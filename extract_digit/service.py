@@ -0,0 +1,527 @@
+import asyncio
+import http.client
+import json
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Any, NamedTuple, Sequence
+
+import cv2.typing as cv2t
+import numpy as np
+
+from .estimate_digit import (
+    estimate_digits_from_image,
+    estimate_digits_from_images,
+)
+from .pipeline import ExtractDigitPipeline
+
+# Larger request bodies are rejected with 413
+MAX_BODY_SIZE = 64 << 20
+# Number of recent requests and batches that statistics are computed from
+STATS_WINDOW = 1000
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    503: "Service Unavailable",
+}
+
+
+class ServiceError(Exception):
+    """An error that is sent back to a client with an HTTP status"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"{status} {_REASONS.get(status, '')}: {message}")
+        self.status = status
+        self.message = message
+
+
+class _Job(NamedTuple):
+    content: bytes
+    future: "asyncio.Future[list[str]]"
+
+
+class _Request(NamedTuple):
+    method: str
+    target: str
+    headers: dict[str, str]
+    body: bytes
+
+
+class DigitService:
+    """Reads digits from images sent to a local HTTP endpoint
+
+    `POST /read` takes the content of an image file and returns
+    `{"digits": [...]}`. `GET /stats` returns the depths of the queues,
+    latencies and batch sizes.
+
+    Images go through two bounded queues. Workers take images from the
+    first queue and run the OpenCV stages (decode, crop, binalize and
+    extraction of the area of digits) in a thread pool, since OpenCV
+    releases the GIL. A batcher takes the areas of digits from the second
+    queue, up to `max_batch_size` of them or whatever arrived within
+    `max_batch_delay` seconds, and estimates them with one call of
+    `estimate_digits_from_images`.
+
+    When the first queue is full, requests are rejected with 503 instead of
+    piling up images in memory, so that clients can retry later. A full
+    second queue blocks the workers.
+
+    Each thread of the pool prepares images with its own copy of
+    `pipeline`, since a pipeline keeps the state of the last image, e.g.
+    the crop area found by its `DisplayLocalizer`.
+    """
+
+    def __init__(
+        self,
+        pipeline: ExtractDigitPipeline,
+        num_threads: int = 2,
+        queue_size: int = 16,
+        max_batch_size: int = 8,
+        max_batch_delay: float = 0.005,
+    ) -> None:
+        self.pipeline = pipeline
+        self.num_threads = num_threads
+        self.queue_size = queue_size
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.num_requests = 0
+        self.num_failed = 0
+        self.num_rejected = 0
+        self.num_in_flight = 0
+        self._latencies: deque[float] = deque(maxlen=STATS_WINDOW)
+        self._batch_sizes: deque[int] = deque(maxlen=STATS_WINDOW)
+        self._prepare_queue: asyncio.Queue[_Job] = asyncio.Queue(queue_size)
+        self._estimate_queue: asyncio.Queue[tuple[_Job, cv2t.MatLike]] = (
+            asyncio.Queue(queue_size)
+        )
+        self._executor: ThreadPoolExecutor | None = None
+        self._local = threading.local()
+        self._server: asyncio.Server | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._is_stopping = False
+        # Set while no connection is between reading a request and writing
+        # its response
+        self._num_active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        unix_path: str | Path | None = None,
+    ) -> None:
+        """Starts the workers and listens on a TCP port or a Unix socket
+
+        Args:
+            host (str, optional): Host to listen on. Defaults to "127.0.0.1".
+            port (int, optional): Port to listen on. 0 picks a free port. Defaults to 8080.
+            unix_path (str | Path | None, optional): Listens on this Unix socket instead of `host` and `port`. Defaults to None.
+        """  # noqa: E501
+        self._executor = ThreadPoolExecutor(
+            self.num_threads,
+            thread_name_prefix="extract-digit",
+            initializer=self._init_thread,
+        )
+        self._tasks = [
+            asyncio.create_task(self._prepare_worker())
+            for _ in range(self.num_threads)
+        ]
+        self._tasks.append(asyncio.create_task(self._batcher()))
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle, str(unix_path)
+            )
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+
+    @property
+    def address(self) -> Any:
+        """The address the service listens on, e.g. (host, port)"""
+        if self._server is None:
+            raise RuntimeError("The service is not started")
+        return self._server.sockets[0].getsockname()
+
+    async def stop(self) -> None:
+        """Stops listening and answers the accepted requests before exiting"""
+        self._is_stopping = True
+        if self._server is not None:
+            self._server.close()
+        await self._prepare_queue.join()
+        await self._estimate_queue.join()
+        await self._idle.wait()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Close idle keep-alive connections
+        for writer in list(self._writers):
+            writer.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    async def read(self, content: bytes) -> list[str]:
+        """Reads digits from the content of an image file
+
+        Raises:
+            ServiceError: 503 if the queue is full or the service is stopping, 422 if digits cannot be extracted.
+
+        Returns:
+            list[str]: Digits. The order is (4th, 3rd, 2nd, 1st).
+        """  # noqa: E501
+        if self._is_stopping:
+            raise ServiceError(503, "The service is stopping")
+        start = time.perf_counter()
+        job = _Job(content, asyncio.get_running_loop().create_future())
+        try:
+            self._prepare_queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.num_rejected += 1
+            raise ServiceError(503, "The queue is full") from None
+        self.num_requests += 1
+        self.num_in_flight += 1
+        try:
+            return await job.future
+        except Exception as e:
+            self.num_failed += 1
+            raise ServiceError(422, repr(e)) from e
+        finally:
+            self.num_in_flight -= 1
+            self._latencies.append(time.perf_counter() - start)
+
+    def _init_thread(self) -> None:
+        self._local.pipeline = ExtractDigitPipeline(
+            self.pipeline.cfg, self.pipeline.timer
+        )
+
+    def _prepare(self, content: bytes) -> cv2t.MatLike:
+        pipeline: ExtractDigitPipeline = self._local.pipeline
+        cropped_img = pipeline.crop_bytes(content)
+        binalized_img = pipeline.binalize(cropped_img)
+        return pipeline.extract_digits_area(binalized_img, cropped_img)
+
+    async def _prepare_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._prepare_queue.get()
+            try:
+                digits_img = await loop.run_in_executor(
+                    self._executor, self._prepare, job.content
+                )
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                await self._estimate_queue.put((job, digits_img))
+            finally:
+                self._prepare_queue.task_done()
+
+    def _estimate_batch(
+        self, digits_imgs: Sequence[cv2t.MatLike]
+    ) -> list[list[str] | Exception]:
+        cfg = self.pipeline.cfg.estimation
+        try:
+            return list(estimate_digits_from_images(digits_imgs, cfg))
+        except Exception:
+            # Estimate one by one so that a broken image does not fail the
+            # others of the batch
+            results: list[list[str] | Exception] = []
+            for digits_img in digits_imgs:
+                try:
+                    results.append(estimate_digits_from_image(digits_img, cfg))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+    async def _next_batch(self) -> list[tuple[_Job, cv2t.MatLike]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._estimate_queue.get()]
+        deadline = loop.time() + self.max_batch_delay
+        while len(batch) < self.max_batch_size:
+            if not self._estimate_queue.empty():
+                batch.append(self._estimate_queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._estimate_queue.get(), timeout)
+                )
+            # Not the builtin TimeoutError before Python 3.11
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor,
+                    self._estimate_batch,
+                    [digits_img for _, digits_img in batch],
+                )
+                self._batch_sizes.append(len(batch))
+                for (job, _), result in zip(batch, results):
+                    if job.future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        job.future.set_exception(result)
+                    else:
+                        job.future.set_result(result)
+            finally:
+                for _ in batch:
+                    self._estimate_queue.task_done()
+
+    def stats(self) -> dict[str, Any]:
+        """Depths of the queues, counts of requests, latencies and batch sizes
+
+        Latencies (seconds, from the arrival of an image to its digits) and
+        batch sizes are those of the last `STATS_WINDOW` requests and batches.
+        """
+        latency = None
+        if self._latencies:
+            latencies = np.array(self._latencies)
+            latency = {
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max()),
+            }
+        return {
+            "prepare_queue_depth": self._prepare_queue.qsize(),
+            "estimate_queue_depth": self._estimate_queue.qsize(),
+            "queue_size": self.queue_size,
+            "num_requests": self.num_requests,
+            "num_failed": self.num_failed,
+            "num_rejected": self.num_rejected,
+            "num_in_flight": self.num_in_flight,
+            "latency": latency,
+            "batch_size_mean": (
+                float(np.mean(self._batch_sizes))
+                if self._batch_sizes
+                else None
+            ),
+        }
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> _Request | None:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split()
+        except ValueError:
+            raise ServiceError(400, "Malformed request line") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "transfer-encoding" in headers:
+            raise ServiceError(411, "Chunked bodies are not supported")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise ServiceError(400, "Invalid Content-Length") from None
+        if length > MAX_BODY_SIZE:
+            raise ServiceError(413, f"The body exceeds {MAX_BODY_SIZE} bytes")
+        body = await reader.readexactly(length)
+        return _Request(method, target, headers, body)
+
+    async def _respond(self, request: _Request) -> dict[str, Any]:
+        if request.target == "/read":
+            if request.method != "POST":
+                raise ServiceError(405, "Use POST")
+            if "content-length" not in request.headers:
+                raise ServiceError(411, "Content-Length is required")
+            return {"digits": await self.read(request.body)}
+        if request.target == "/stats":
+            if request.method != "GET":
+                raise ServiceError(405, "Use GET")
+            return self.stats()
+        raise ServiceError(404, f"No such endpoint: {request.target}")
+
+    @staticmethod
+    def _write_response(
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: dict[str, Any],
+        keep_alive: bool,
+    ) -> None:
+        body = json.dumps(payload).encode()
+        headers = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + body)
+
+    def _set_active(self, delta: int) -> None:
+        self._num_active += delta
+        if self._num_active:
+            self._idle.clear()
+        else:
+            self._idle.set()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ServiceError as e:
+                    # The rest of the stream cannot be parsed
+                    self._write_response(
+                        writer, e.status, {"error": e.message}, False
+                    )
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                self._set_active(1)
+                try:
+                    try:
+                        status, payload = 200, await self._respond(request)
+                    except ServiceError as e:
+                        status, payload = e.status, {"error": e.message}
+                    keep_alive = (
+                        request.headers.get("connection", "").lower()
+                        != "close"
+                        and not self._is_stopping
+                    )
+                    self._write_response(writer, status, payload, keep_alive)
+                    await writer.drain()
+                finally:
+                    self._set_active(-1)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def serve(
+    service: DigitService,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    unix_path: str | Path | None = None,
+) -> None:
+    """Runs a service until SIGINT or SIGTERM, then stops it gracefully"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    await service.start(host, port, unix_path)
+    print(f"Listening on {service.address}", file=sys.stderr)
+    try:
+        await stop_event.wait()
+    finally:
+        print("Stopping after the accepted requests", file=sys.stderr)
+        await service.stop()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, unix_path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = unix_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.unix_path)
+        self.sock = sock
+
+
+class ServiceClient:
+    """A blocking client of `DigitService`
+
+    The connection is kept alive between requests. A client must not be
+    shared by threads; use one client per thread.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        unix_path: str | Path | None = None,
+        timeout: float = 30.0,
+    ) -> None:
+        self.conn: http.client.HTTPConnection
+        if unix_path is not None:
+            self.conn = _UnixHTTPConnection(str(unix_path), timeout)
+        else:
+            self.conn = http.client.HTTPConnection(host, port, timeout)
+
+    def _request(
+        self, method: str, target: str, body: bytes | None = None
+    ) -> dict[str, Any]:
+        try:
+            self.conn.request(method, target, body=body)
+            response = self.conn.getresponse()
+            payload: dict[str, Any] = json.loads(response.read())
+        except (OSError, http.client.HTTPException):
+            # Reconnect at the next request
+            self.conn.close()
+            raise
+        if response.status != 200:
+            raise ServiceError(response.status, payload.get("error", ""))
+        return payload
+
+    def read(self, content: bytes) -> list[str]:
+        """Reads digits from the content of an image file
+
+        Raises:
+            ServiceError: If the service rejected the image or failed to read it.
+
+        Returns:
+            list[str]: Digits. The order is (4th, 3rd, 2nd, 1st).
+        """  # noqa: E501
+        digits: list[str] = self._request("POST", "/read", content)["digits"]
+        return digits
+
+    def read_path(self, img_path: str | Path) -> list[str]:
+        return self.read(Path(img_path).read_bytes())
+
+    def stats(self) -> dict[str, Any]:
+        return self._request("GET", "/stats")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ServiceClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
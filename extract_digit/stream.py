@@ -0,0 +1,367 @@
+import time
+from typing import Iterator, NamedTuple, Sequence
+
+import cv2
+import cv2.typing as cv2t
+import numpy as np
+
+from .estimate_digit import DigitEstimate
+from .pipeline import ExtractDigitPipeline
+
+
+class Reading(NamedTuple):
+    timestamp: float
+    frame_index: int
+    digits: list[str]
+    reused: bool = False
+    # Confidence of the least confident digit, if it was estimated
+    confidence: float | None = None
+    # Whether the temporal filter replaced a digit that was read
+    corrected: bool = False
+    # Whether the frame was processed again by the full quality pipeline
+    reprocessed: bool = False
+
+
+class Frame(NamedTuple):
+    timestamp: float
+    frame_index: int
+    img: cv2t.MatLike
+
+
+class ChangeDetector:
+    """Detects whether the display changed since the last processed frame
+
+    Rectified crops are shrunk to `hash_size` and compared by the mean
+    absolute difference of their pixel values. The crop is only replaced
+    when a change is detected, so that a slow drift still counts as a change
+    once it adds up.
+    """
+
+    def __init__(
+        self, thresh: float = 2.0, hash_size: tuple[int, int] = (16, 16)
+    ) -> None:
+        self.thresh = thresh
+        self.hash_size = hash_size
+        self.num_frames = 0
+        self.num_unchanged = 0
+        self._last: np.ndarray | None = None
+
+    def is_changed(self, cropped_img: cv2t.MatLike) -> bool:
+        small = cv2.resize(
+            cropped_img, self.hash_size, interpolation=cv2.INTER_AREA
+        )
+        self.num_frames += 1
+        if self._last is not None:
+            diff = cv2.norm(small, self._last, cv2.NORM_L1) / small.size
+            if diff <= self.thresh:
+                self.num_unchanged += 1
+                return False
+        self._last = small
+        return True
+
+    def reset(self) -> None:
+        self._last = None
+
+
+class TemporalFilter:
+    """Corrects outlying digits of consecutive frames
+
+    Each position of the digits keeps its accepted digit. A digit that
+    differs from it is only accepted once it has been read with at least
+    `min_confidence` in `confirm_frames` consecutive frames, and a digit
+    below `min_confidence` is replaced by the accepted one. Only a few
+    values are kept per position, so each frame costs O(1).
+    """
+
+    def __init__(
+        self, min_confidence: float = 0.5, confirm_frames: int = 2
+    ) -> None:
+        if confirm_frames < 1:
+            raise ValueError(
+                f"`confirm_frames` must be 1 or more, but {confirm_frames}"
+            )
+        self.min_confidence = min_confidence
+        self.confirm_frames = confirm_frames
+        self.num_frames = 0
+        self.num_corrected = 0
+        self._accepted: list[str | None] = []
+        self._candidates: list[str | None] = []
+        self._counts: list[int] = []
+
+    def update(
+        self, estimates: Sequence[DigitEstimate]
+    ) -> tuple[list[str], bool]:
+        """Filters the digits of the next frame
+
+        Args:
+            estimates (Sequence[DigitEstimate]): Estimates of the digits of the frame.
+
+        Returns:
+            tuple[list[str], bool]: The filtered digits and whether any digit was replaced.
+        """  # noqa: E501
+        if len(self._accepted) != len(estimates):
+            self.reset()
+            self._accepted = [None] * len(estimates)
+            self._candidates = [None] * len(estimates)
+            self._counts = [0] * len(estimates)
+        digits = []
+        for i, estimate in enumerate(estimates):
+            accepted = self._accepted[i]
+            is_confident = (
+                estimate.digit != ""
+                and estimate.confidence >= self.min_confidence
+            )
+            if is_confident and estimate.digit != accepted:
+                if estimate.digit == self._candidates[i]:
+                    self._counts[i] += 1
+                else:
+                    self._candidates[i] = estimate.digit
+                    self._counts[i] = 1
+                if accepted is None or self._counts[i] >= self.confirm_frames:
+                    accepted = self._accepted[i] = estimate.digit
+            else:
+                # Consecutive reads of a candidate are broken by the
+                # accepted digit and by an unconfident read alike
+                self._candidates[i] = None
+                self._counts[i] = 0
+            digits.append(estimate.digit if accepted is None else accepted)
+        is_corrected = digits != [e.digit for e in estimates]
+        self.num_frames += 1
+        self.num_corrected += is_corrected
+        return digits, is_corrected
+
+    def reset(self) -> None:
+        self._accepted = []
+        self._candidates = []
+        self._counts = []
+
+
+def _min_confidence(estimates: Sequence[DigitEstimate]) -> float:
+    return min(e.confidence for e in estimates)
+
+
+def estimate_frame(
+    cropped_img: cv2t.MatLike,
+    pipeline: ExtractDigitPipeline,
+    fallback: ExtractDigitPipeline | None = None,
+    min_confidence: float = 0.5,
+) -> tuple[list[DigitEstimate], bool]:
+    """Estimates digits, processing the frame again if they are uncertain
+
+    Args:
+        cropped_img (cv2t.MatLike): A frame cropped by `pipeline`.
+        pipeline (ExtractDigitPipeline): The pipeline applied first.
+        fallback (ExtractDigitPipeline | None, optional): A slower pipeline, e.g. from `full_quality`, applied if a digit is below `min_confidence` or `pipeline` fails. Defaults to None.
+        min_confidence (float, optional): Confidence below which the frame is processed again. Defaults to 0.5.
+
+    Raises:
+        Exception: The error of `pipeline` if both pipelines fail.
+
+    Returns:
+        tuple[list[DigitEstimate], bool]: The more confident estimates and whether `fallback` was applied.
+    """  # noqa: E501
+    try:
+        estimates = pipeline.process_cropped_with_confidence(cropped_img)
+    except Exception:
+        if fallback is None or fallback is pipeline:
+            raise
+        return fallback.process_cropped_with_confidence(cropped_img), True
+    if (
+        fallback is None
+        or fallback is pipeline
+        or _min_confidence(estimates) >= min_confidence
+    ):
+        return estimates, False
+    try:
+        reprocessed = fallback.process_cropped_with_confidence(cropped_img)
+    except Exception:
+        return estimates, True
+    if _min_confidence(reprocessed) > _min_confidence(estimates):
+        return reprocessed, True
+    return estimates, True
+
+
+def _read_with_confidence(
+    frame: Frame,
+    cropped_img: cv2t.MatLike,
+    pipeline: ExtractDigitPipeline,
+    temporal_filter: TemporalFilter | None,
+    fallback: ExtractDigitPipeline | None,
+    min_confidence: float,
+) -> Reading:
+    estimates, reprocessed = estimate_frame(
+        cropped_img, pipeline, fallback, min_confidence
+    )
+    digits = [e.digit for e in estimates]
+    corrected = False
+    if temporal_filter is not None:
+        digits, corrected = temporal_filter.update(estimates)
+    return Reading(
+        frame.timestamp,
+        frame.frame_index,
+        digits,
+        confidence=_min_confidence(estimates),
+        corrected=corrected,
+        reprocessed=reprocessed,
+    )
+
+
+def is_live_source(source: str | int) -> bool:
+    """Whether a source is a capture device or a network stream"""
+    if isinstance(source, int):
+        return True
+    return source.isdigit() or "://" in source
+
+
+def open_capture(source: str | int) -> cv2.VideoCapture:
+    """Opens a video file, a capture device or a stream such as RTSP
+
+    Args:
+        source (str | int): Path to a video, URL of a stream or index of a capture device.
+
+    Raises:
+        FileNotFoundError: If the source cannot be opened.
+
+    Returns:
+        cv2.VideoCapture: The opened capture.
+    """  # noqa: E501
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Could not open a video source {source}")
+    if is_live_source(source):
+        # Keep only the latest frames so that readings don't lag behind
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return capture
+
+
+def read_frames(
+    capture: cv2.VideoCapture,
+    frame_step: int = 1,
+    sample_rate: float | None = None,
+    live: bool = False,
+) -> Iterator[Frame]:
+    """Reads grayscale frames lazily
+
+    Frames that are skipped are only grabbed, never decoded into an image.
+
+    Args:
+        capture (cv2.VideoCapture): An opened capture.
+        frame_step (int, optional): Only every `frame_step`-th frame is read. Defaults to 1.
+        sample_rate (float | None, optional): Maximum number of frames per second to read. Defaults to None.
+        live (bool, optional): Whether timestamps are taken from the wall clock instead of the position in the video. Defaults to False.
+
+    Yields:
+        Iterator[Frame]: Timestamp in seconds, index and grayscale image of each frame.
+    """  # noqa: E501
+    if frame_step < 1:
+        raise ValueError(f"`frame_step` must be 1 or more, but {frame_step}")
+    interval = 0.0 if sample_rate is None else 1 / sample_rate
+    # Allows for the rounding of the timestamps reported by the backend
+    tolerance = 1e-6
+    next_timestamp = 0.0
+    start = time.monotonic()
+    frame_index = -1
+    while capture.grab():
+        frame_index += 1
+        if live:
+            timestamp = time.monotonic() - start
+        else:
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        if (
+            frame_index % frame_step != 0
+            or timestamp + tolerance < next_timestamp
+        ):
+            continue
+        ok, img = capture.retrieve()
+        if not ok:
+            continue
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        next_timestamp = timestamp + interval
+        yield Frame(timestamp, frame_index, img)
+
+
+def stream_readings(
+    source: str | int,
+    pipeline: ExtractDigitPipeline,
+    frame_step: int = 1,
+    sample_rate: float | None = None,
+    change_detector: ChangeDetector | None = None,
+    temporal_filter: TemporalFilter | None = None,
+    fallback: ExtractDigitPipeline | None = None,
+    min_confidence: float = 0.5,
+) -> Iterator[Reading]:
+    """Extracts digits from a video, a capture device or a stream
+
+    Only one frame is held at a time, so memory use does not grow with the
+    length of the stream. If `change_detector` is given, the digits of the
+    last processed frame are reused while the rectified crop doesn't change,
+    and the number of reused frames is counted by the detector.
+
+    If `temporal_filter` or `fallback` is given, the confidence of each
+    digit is estimated as well. Frames with a digit below `min_confidence`
+    are processed again by `fallback`, and the digits are corrected by
+    `temporal_filter`.
+
+    Args:
+        source (str | int): Path to a video, URL of a stream or index of a capture device.
+        pipeline (ExtractDigitPipeline): The pipeline applied to each frame.
+        frame_step (int, optional): Only every `frame_step`-th frame is processed. Defaults to 1.
+        sample_rate (float | None, optional): Maximum number of frames per second to process. Defaults to None.
+        change_detector (ChangeDetector | None, optional): Detector used to skip unchanged frames. Defaults to None.
+        temporal_filter (TemporalFilter | None, optional): Filter that corrects outlying digits. Defaults to None.
+        fallback (ExtractDigitPipeline | None, optional): The pipeline that processes uncertain frames again. Defaults to None.
+        min_confidence (float, optional): Confidence below which a frame is processed by `fallback`. Defaults to 0.5.
+
+    Yields:
+        Iterator[Reading]: Timestamp in seconds, index and digits of each processed frame. Digits are empty if the frame could not be processed.
+    """  # noqa: E501
+    capture = open_capture(source)
+    last_digits: list[str] | None = None
+    try:
+        for frame in read_frames(
+            capture, frame_step, sample_rate, live=is_live_source(source)
+        ):
+            try:
+                cropped_img = pipeline.crop(frame.img)
+                is_changed = (
+                    change_detector is None
+                    or change_detector.is_changed(cropped_img)
+                )
+                if not is_changed and last_digits is not None:
+                    yield Reading(
+                        frame.timestamp,
+                        frame.frame_index,
+                        last_digits,
+                        reused=True,
+                    )
+                    continue
+                if temporal_filter is None and fallback is None:
+                    reading = Reading(
+                        frame.timestamp,
+                        frame.frame_index,
+                        pipeline.process_cropped(cropped_img),
+                    )
+                else:
+                    reading = _read_with_confidence(
+                        frame,
+                        cropped_img,
+                        pipeline,
+                        temporal_filter,
+                        fallback,
+                        min_confidence,
+                    )
+            except Exception as e:
+                print(
+                    "Failed to extract digits from frame "
+                    f"{frame.frame_index}: {e!r}"
+                )
+                reading = Reading(frame.timestamp, frame.frame_index, [""] * 4)
+                if change_detector is not None:
+                    change_detector.reset()
+            last_digits = reading.digits
+            yield reading
+    finally:
+        capture.release()
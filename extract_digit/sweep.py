@@ -0,0 +1,329 @@
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Sequence,
+    TypeVar,
+)
+
+import cv2.typing as cv2t
+from pydantic import BaseModel
+
+from .batch import DIGIT_COLUMNS
+from .estimate_digit import estimate_digits_from_image
+from .param_config import (
+    BinalizeParams,
+    Configurations,
+    EstimationParams,
+    FilteringDigitParams,
+)
+from .pipeline import ExtractDigitPipeline
+from .processing import find_contours
+
+M = TypeVar("M", bound=BaseModel)
+T = TypeVar("T")
+
+# Sections of the configuration that can be swept, in the order of stages
+SWEEP_SECTIONS = ("binalize", "filtering_digit", "estimation")
+
+# Field name -> values to try
+ParamGrid = Mapping[str, Sequence[Any]]
+
+
+class SweepResult(NamedTuple):
+    binalize: BinalizeParams
+    filtering_digit: FilteringDigitParams
+    estimation: EstimationParams
+    num_correct: int
+    # Number of images whose digits could not be extracted
+    num_failed: int
+    num_images: int
+
+    @property
+    def accuracy(self) -> float:
+        return self.num_correct / self.num_images if self.num_images else 0.0
+
+    def config(self, base: Configurations) -> Configurations:
+        """`base` with the parameters of this result"""
+        return base.model_copy(
+            update={
+                "binalize": self.binalize,
+                "filtering_digit": self.filtering_digit,
+                "estimation": self.estimation,
+            }
+        )
+
+
+def expand_grid(base: M, grid: ParamGrid) -> list[M]:
+    """Makes a copy of `base` for every combination of the values of `grid`
+
+    Args:
+        base (M): Parameters whose fields are replaced.
+        grid (ParamGrid): Field name -> values to try.
+
+    Raises:
+        ValueError: If a field does not exist, has no values or a value is invalid.
+
+    Returns:
+        list[M]: Validated parameters. Only `base` if `grid` is empty.
+    """  # noqa: E501
+    model = type(base)
+    unknown = set(grid) - set(model.model_fields)
+    if unknown:
+        raise ValueError(f"{model.__name__} has no fields {sorted(unknown)}")
+    for name, values in grid.items():
+        if len(values) == 0:
+            raise ValueError(f"{model.__name__}.{name} has no values to try")
+    names = list(grid)
+    base_values = base.model_dump()
+    return [
+        model.model_validate({**base_values, **dict(zip(names, values))})
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def read_labels(path: str | Path) -> dict[Path, list[str]]:
+    """Reads the expected digits of images from a CSV file
+
+    The file has a "path" column and the columns of `DIGIT_COLUMNS`, like
+    the output of `extract-digit run`, so that a corrected output can be
+    used as labels. A resumed output has a row per attempt of a failed
+    image, so the last row of a path is used.
+
+    Args:
+        path (str | Path): Path to the CSV file. Relative paths of images are relative to the working directory, like the paths that `extract-digit run` was given and wrote.
+
+    Raises:
+        ValueError: If a column is missing.
+
+    Returns:
+        dict[Path, list[str]]: Path to an image -> digits. The order is (4th, 3rd, 2nd, 1st).
+    """  # noqa: E501
+    path = Path(path)
+    labels: dict[Path, list[str]] = {}
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = {"path", *DIGIT_COLUMNS} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"{path} has no columns {sorted(missing)}")
+        for row in reader:
+            labels[Path(row["path"])] = [
+                row[column] or "" for column in DIGIT_COLUMNS
+            ]
+    return labels
+
+
+def _try(func: Callable[..., T], *args: Any) -> T | None:
+    try:
+        return func(*args)
+    except Exception:
+        return None
+
+
+class _SweepPlan(NamedTuple):
+    cfg: Configurations
+    binalize: list[BinalizeParams]
+    filtering_digit: list[FilteringDigitParams]
+    estimation: list[EstimationParams]
+
+
+class _SweepWorker:
+    """Reads an image with every combination of a plan
+
+    The crop is computed once per image, the mask and its contours once per
+    binalize setting, and the area of digits once per filtering setting.
+    Contours are not found for filtering settings of the "components"
+    engine.
+    """
+
+    def __init__(self, plan: _SweepPlan) -> None:
+        self.plan = plan
+        self.pipelines = [
+            [
+                ExtractDigitPipeline(
+                    plan.cfg.model_copy(
+                        update={"binalize": b, "filtering_digit": f}
+                    )
+                )
+                for f in plan.filtering_digit
+            ]
+            for b in plan.binalize
+        ]
+
+    def _crop(self, img_path: Path) -> cv2t.MatLike:
+        pipeline = self.pipelines[0][0]
+        if pipeline.uses_roi:
+            return pipeline.crop(pipeline.imread_roi(img_path), from_roi=True)
+        return pipeline.crop(pipeline.imread(img_path))
+
+    def read_all(self, img_path: Path) -> list[list[str] | None]:
+        """Digits of every combination, or None if they were not extracted
+
+        The order is that of `itertools.product` of the binalize, filtering
+        and estimation parameters.
+        """
+        num_estimations = len(self.plan.estimation)
+        cropped_img = _try(self._crop, img_path)
+        if cropped_img is None:
+            num_filterings = len(self.plan.filtering_digit)
+            num_binalizations = len(self.plan.binalize)
+            return [None] * (
+                num_binalizations * num_filterings * num_estimations
+            )
+
+        readings: list[list[str] | None] = []
+        for pipelines in self.pipelines:
+            binalized_img = None
+            contours = None
+            for i, pipeline in enumerate(pipelines):
+                # The mask of "auto" depends on the filtering parameters
+                if i == 0 or pipeline.cfg.binalize.mode == "auto":
+                    binalized_img = _try(pipeline.binalize, cropped_img)
+                    contours = None
+                digits_img = None
+                engine = pipeline.cfg.filtering_digit.engine
+                if binalized_img is not None and engine == "components":
+                    digits_img = _try(
+                        pipeline.extract_digits_area,
+                        binalized_img,
+                        cropped_img,
+                    )
+                elif binalized_img is not None:
+                    if contours is None:
+                        contours = _try(find_contours, binalized_img)
+                    if contours is not None:
+                        digits_img = _try(
+                            pipeline.digits_area_from_contours,
+                            contours,
+                            cropped_img,
+                        )
+                if digits_img is None:
+                    readings.extend([None] * num_estimations)
+                    continue
+                readings.extend(
+                    _try(estimate_digits_from_image, digits_img, e)
+                    for e in self.plan.estimation
+                )
+        return readings
+
+
+# The worker built once per worker process by `_init_worker`
+_worker: _SweepWorker | None = None
+
+
+def _init_worker(plan: _SweepPlan) -> None:
+    global _worker
+    _worker = _SweepWorker(plan)
+
+
+def _read_all(img_path: Path) -> list[list[str] | None]:
+    if _worker is None:
+        raise RuntimeError("`_init_worker` must be called first")
+    return _worker.read_all(img_path)
+
+
+def _read_images(
+    img_paths: Sequence[Path], plan: _SweepPlan, workers: int
+) -> Iterator[list[list[str] | None]]:
+    if workers > 1:
+        # Each image is one task, since it is read with every combination
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(plan,)
+        ) as executor:
+            yield from executor.map(_read_all, img_paths)
+    else:
+        worker = _SweepWorker(plan)
+        for img_path in img_paths:
+            yield worker.read_all(img_path)
+
+
+def sweep(
+    labels: Mapping[Path, Sequence[str]],
+    base_cfg: Configurations,
+    grids: Mapping[str, ParamGrid],
+    workers: int = 1,
+) -> list[SweepResult]:
+    """Evaluates every combination of parameters against labeled images
+
+    Stages are memoized, so the cost grows with the number of settings of
+    each stage rather than with the number of combinations: the crop is
+    computed once per image, the mask and its contours once per binalize
+    setting, and estimation reuses the area of digits of each filtering
+    setting. Images are spread over `workers` processes.
+
+    Args:
+        labels (Mapping[Path, Sequence[str]]): Path to an image -> expected digits, e.g. from `read_labels`.
+        base_cfg (Configurations): The configuration whose parameters are replaced.
+        grids (Mapping[str, ParamGrid]): Section of `SWEEP_SECTIONS` -> grid of its parameters. A missing section keeps the parameters of `base_cfg`.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+
+    Raises:
+        ValueError: If a section, a field or a value of `grids` is invalid.
+
+    Returns:
+        list[SweepResult]: The result of every combination, sorted by accuracy. Ties keep the order of the grids.
+    """  # noqa: E501
+    unknown = set(grids) - set(SWEEP_SECTIONS)
+    if unknown:
+        raise ValueError(f"Sections {sorted(unknown)} cannot be swept")
+    # Nothing is shown while sweeping
+    crop_cfg = base_cfg.crop_transform.model_copy(update={"imshow": False})
+    plan = _SweepPlan(
+        base_cfg.model_copy(update={"crop_transform": crop_cfg}),
+        expand_grid(base_cfg.binalize, grids.get("binalize", {})),
+        expand_grid(
+            base_cfg.filtering_digit, grids.get("filtering_digit", {})
+        ),
+        expand_grid(base_cfg.estimation, grids.get("estimation", {})),
+    )
+    combinations = list(
+        itertools.product(plan.binalize, plan.filtering_digit, plan.estimation)
+    )
+    num_correct = [0] * len(combinations)
+    num_failed = [0] * len(combinations)
+    img_paths = list(labels)
+    for img_path, readings in zip(
+        img_paths, _read_images(img_paths, plan, workers)
+    ):
+        expected = list(labels[img_path])
+        for i, reading in enumerate(readings):
+            num_correct[i] += reading == expected
+            num_failed[i] += reading is None
+    results = [
+        SweepResult(*combination, correct, failed, len(img_paths))
+        for combination, correct, failed in zip(
+            combinations, num_correct, num_failed
+        )
+    ]
+    return sorted(results, key=lambda r: r.num_correct, reverse=True)
+
+
+def sweep_columns(grids: Mapping[str, ParamGrid]) -> list[str]:
+    """Columns of `sweep_row`. Swept parameters are "<section>.<field>"."""
+    return ["accuracy", "num_correct", "num_failed", "num_images"] + [
+        f"{section}.{name}"
+        for section in SWEEP_SECTIONS
+        for name in grids.get(section, {})
+    ]
+
+
+def sweep_row(
+    result: SweepResult, grids: Mapping[str, ParamGrid]
+) -> dict[str, Any]:
+    row: dict[str, Any] = {
+        "accuracy": result.accuracy,
+        "num_correct": result.num_correct,
+        "num_failed": result.num_failed,
+        "num_images": result.num_images,
+    }
+    for section in SWEEP_SECTIONS:
+        params = getattr(result, section).model_dump(mode="json")
+        for name in grids.get(section, {}):
+            row[f"{section}.{name}"] = params[name]
+    return row
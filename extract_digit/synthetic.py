@@ -0,0 +1,276 @@
+import math
+from pathlib import Path
+from typing import Any, Sequence
+
+import cv2
+import numpy as np
+
+from .estimate_digit import SEGMENT_DIGITS
+from .param_config import Configurations, Point, QuadrilateralVertices
+
+SYNTHETIC_CONFIG_PATH = Path(__file__).parent / "configs" / "synthetic.json"
+
+# The first segment states of each digit in `SEGMENT_DIGITS`
+DIGIT_SEGMENTS = {
+    digit: states for states, digit in reversed(list(SEGMENT_DIGITS.items()))
+}
+# The 4th digit of LX1330B is only "1", drawn with the segments 1 and 2
+FOURTH_DIGIT_SEGMENTS = (0, 1, 1, 0, 0, 0, 0)
+
+LCD_VALUE = 170
+SEGMENT_VALUE = 40
+BACKGROUND_VALUE = 60
+
+
+def _segment_rects(
+    x0: int, y0: int, width: int, height: int, thickness: int
+) -> list[tuple[int, int, int, int]]:
+    """Rectangles (left, top, right, bottom) of the segments 0 to 6"""
+    middle = y0 + height // 2
+    half = thickness // 2
+    return [
+        (x0, y0, x0 + width, y0 + thickness),
+        (x0 + width - thickness, y0, x0 + width, middle + half),
+        (x0 + width - thickness, middle - half, x0 + width, y0 + height),
+        (x0, y0 + height - thickness, x0 + width, y0 + height),
+        (x0, middle - half, x0 + thickness, y0 + height),
+        (x0, y0, x0 + thickness, middle + half),
+        (x0, middle - half, x0 + width, middle + half),
+    ]
+
+
+def render_display(reading: str, size: tuple[int, int]) -> np.ndarray:
+    """Draws the rectified display of a reading
+
+    Args:
+        reading (str): 3 digits, or "1" and 3 digits.
+        size (tuple[int, int]): Size of the display. (height, width)
+
+    Returns:
+        np.ndarray: Dark segments on a bright display.
+    """
+    if len(reading) not in (3, 4) or not reading.isdigit():
+        raise ValueError(f"Expected 3 or 4 digits, but {reading!r}")
+    if len(reading) == 4 and reading[0] != "1":
+        raise ValueError(f"The 4th digit must be 1, but {reading!r}")
+
+    height, width = size
+    img = np.full(size, LCD_VALUE, np.uint8)
+    digit_height = round(height * 0.62)
+    digit_width = round(width / 6)
+    thickness = round(digit_width / 5)
+    gap = round(width * 0.06)
+    top = (height - digit_height) // 2
+    # Left of the 3rd digit. The digits are aligned to the right.
+    x_start = width - round(width / 12) - (3 * digit_width + 2 * gap)
+
+    digits = [DIGIT_SEGMENTS[d] for d in reading[-3:]]
+    if len(reading) == 4:
+        digits.insert(0, FOURTH_DIGIT_SEGMENTS)
+    for i, states in enumerate(digits, start=3 - len(digits)):
+        x0 = x_start + i * (digit_width + gap)
+        rects = _segment_rects(x0, top, digit_width, digit_height, thickness)
+        for (left, upper, right, lower), is_on in zip(rects, states):
+            if is_on:
+                img[upper:lower, left:right] = SEGMENT_VALUE
+    return img
+
+
+def display_quad(
+    img_size: tuple[int, int],
+    rotation: float = 7.0,
+    skew: float = 0.05,
+    center: tuple[float, float] = (0.87, 0.88),
+    display_width: float = 0.17,
+    aspect: float = 1.5,
+) -> QuadrilateralVertices:
+    """Vertices of a display seen from an angle
+
+    The default is close to the display in the images of LX1330B.
+
+    Args:
+        img_size (tuple[int, int]): Size of the photo. (height, width)
+        rotation (float, optional): Rotation of the display in degrees. Defaults to 7.0.
+        skew (float, optional): How much shorter the right edge is than the left edge. Defaults to 0.05.
+        center (tuple[float, float], optional): Center of the display relative to the photo. (x, y) Defaults to (0.87, 0.88).
+        display_width (float, optional): Width of the display relative to the photo. Defaults to 0.17.
+        aspect (float, optional): Width / height of the display. Defaults to 1.5.
+
+    Returns:
+        QuadrilateralVertices: Each vertex of the display.
+    """  # noqa: E501
+    height, width = img_size
+    half_w = display_width * width / 2
+    half_h = half_w / aspect
+    right_half_h = half_h * (1 - skew)
+    corners = np.array(
+        [
+            (-half_w, -half_h),
+            (half_w, -right_half_h),
+            (half_w, right_half_h),
+            (-half_w, half_h),
+        ]
+    )
+    theta = math.radians(rotation)
+    rot = np.array(
+        [
+            [math.cos(theta), -math.sin(theta)],
+            [math.sin(theta), math.cos(theta)],
+        ]
+    )
+    corners = corners @ rot.T + (center[0] * width, center[1] * height)
+    upper_left, upper_right, lower_right, lower_left = (
+        Point(x=round(x), y=round(y)) for x, y in corners
+    )
+    return QuadrilateralVertices(
+        upper_left=upper_left,
+        upper_right=upper_right,
+        lower_right=lower_right,
+        lower_left=lower_left,
+    )
+
+
+def render_photo(
+    reading: str,
+    crop_area_vertices: QuadrilateralVertices,
+    img_size: tuple[int, int],
+    noise: float = 4.0,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """Draws a grayscale photo of the display
+
+    Args:
+        reading (str): 3 digits, or "1" and 3 digits.
+        crop_area_vertices (QuadrilateralVertices): Where the display is in the photo.
+        img_size (tuple[int, int]): Size of the photo. (height, width)
+        noise (float, optional): Standard deviation of the Gaussian noise. Defaults to 4.0.
+        rng (np.random.Generator | None, optional): Generator of the noise. Defaults to None.
+
+    Returns:
+        np.ndarray: The photo.
+    """  # noqa: E501
+    return render_displays_photo(
+        [(reading, crop_area_vertices)], img_size, noise, rng
+    )
+
+
+def render_displays_photo(
+    displays: Sequence[tuple[str, QuadrilateralVertices]],
+    img_size: tuple[int, int],
+    noise: float = 4.0,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """Draws a grayscale photo of several displays
+
+    Args:
+        displays (Sequence[tuple[str, QuadrilateralVertices]]): The reading of each display and where it is in the photo.
+        img_size (tuple[int, int]): Size of the photo. (height, width)
+        noise (float, optional): Standard deviation of the Gaussian noise. Defaults to 4.0.
+        rng (np.random.Generator | None, optional): Generator of the noise. Defaults to None.
+
+    Returns:
+        np.ndarray: The photo.
+    """  # noqa: E501
+    photo = np.full(img_size, BACKGROUND_VALUE, np.uint8)
+    for reading, crop_area_vertices in displays:
+        dst = np.array(crop_area_vertices.align_vertices(), np.float32)
+        # Draw the display at about the resolution it has in the photo
+        display_width = max(
+            math.dist(dst[0], dst[1]), math.dist(dst[3], dst[2]), 60
+        )
+        display_size = (round(display_width / 1.5), round(display_width))
+        display = render_display(reading, display_size)
+        src = np.array(
+            [
+                (0, 0),
+                (display_size[1], 0),
+                (display_size[1], display_size[0]),
+                (0, display_size[0]),
+            ],
+            np.float32,
+        )
+        trans_mat = cv2.getPerspectiveTransform(src, dst)
+        cv2.warpPerspective(
+            display,
+            trans_mat,
+            (img_size[1], img_size[0]),
+            photo,
+            flags=cv2.INTER_AREA,
+            borderMode=cv2.BORDER_TRANSPARENT,
+        )
+    if noise > 0:
+        rng = np.random.default_rng() if rng is None else rng
+        noisy = photo + rng.normal(0, noise, img_size)
+        photo = np.clip(noisy, 0, 255).astype(np.uint8)
+    return photo
+
+
+def random_reading(rng: np.random.Generator, num_digits: int = 3) -> str:
+    """A random reading of 3 digits, or "1" and 3 digits"""
+    digits = "".join(rng.choice(list("0123456789"), 3))
+    return "1" + digits if num_digits == 4 else digits
+
+
+def expected_digits(reading: str) -> list[str]:
+    """Digits that the pipeline should return for a reading
+
+    Returns:
+        list[str]: The order is (4th, 3rd, 2nd, 1st).
+    """
+    return ["1" if len(reading) == 4 else "0"] + list(reading[-3:])
+
+
+def synthetic_config(
+    img_size: tuple[int, int], rotation: float = 7.0, skew: float = 0.05
+) -> Configurations:
+    """The configuration for the photos drawn by `render_photo`
+
+    Args:
+        img_size (tuple[int, int]): Size of the photo. (height, width)
+        rotation (float, optional): Rotation of the display in degrees. Defaults to 7.0.
+        skew (float, optional): How much shorter the right edge is than the left edge. Defaults to 0.05.
+
+    Returns:
+        Configurations: The configuration whose crop area is the display.
+    """  # noqa: E501
+    cfg = Configurations.load_json(SYNTHETIC_CONFIG_PATH)
+    cfg.crop_transform.crop_area_vertices = display_quad(
+        img_size, rotation, skew
+    )
+    return cfg
+
+
+def multi_display_config(
+    img_size: tuple[int, int],
+    quads: dict[str, QuadrilateralVertices],
+    estimations: dict[str, dict[str, Any]] | None = None,
+) -> Configurations:
+    """The configuration for the photos drawn by `render_displays_photo`
+
+    Args:
+        img_size (tuple[int, int]): Size of the photo. (height, width)
+        quads (dict[str, QuadrilateralVertices]): Name of a display -> its crop area, in the order of `displays`.
+        estimations (dict[str, dict[str, Any]] | None, optional): Name of a display -> the parameters of its estimation that differ from the top level. Defaults to None.
+
+    Returns:
+        Configurations: The configuration with a display of each quadrilateral and no top level crop area.
+    """  # noqa: E501
+    base = synthetic_config(img_size)
+    values = base.model_dump(exclude={"crop_transform"})
+    values["displays"] = [
+        {
+            "name": name,
+            "crop_transform": {
+                **base.crop_transform.model_dump(),
+                "crop_area_vertices": quad.model_dump(),
+            },
+        }
+        for name, quad in quads.items()
+    ]
+    for display in values["displays"]:
+        if estimations and display["name"] in estimations:
+            display["estimation"] = {
+                **base.estimation.model_dump(),
+                **estimations[display["name"]],
+            }
+    return Configurations.model_validate(values)
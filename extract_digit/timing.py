@@ -0,0 +1,243 @@
+import cProfile
+import csv
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+
+class StageRecord(NamedTuple):
+    name: str
+    wall: float
+    cpu: float
+    # Number of elements of an array, or number of items of a sequence
+    in_size: int | None = None
+    out_size: int | None = None
+    # Peak of traced memory in bytes, if tracemalloc is tracing
+    peak_memory: int | None = None
+
+
+class StageSummary(NamedTuple):
+    name: str
+    num_calls: int
+    wall_total: float
+    wall_p50: float
+    wall_p95: float
+    wall_max: float
+    cpu_total: float
+    cpu_p50: float
+    cpu_p95: float
+    cpu_max: float
+    in_size_mean: float | None
+    out_size_mean: float | None
+    peak_memory_max: int | None
+
+
+def _size_of(obj: Any) -> int | None:
+    if isinstance(obj, np.ndarray):
+        return obj.size
+    if isinstance(obj, (list, tuple)):
+        return len(obj)
+    return None
+
+
+def _mean_or_none(values: list[int | None]) -> float | None:
+    sizes = [v for v in values if v is not None]
+    return float(np.mean(sizes)) if sizes else None
+
+
+class StageTimer:
+    """Records wall time, CPU time and array sizes of each stage
+
+    Records of every call are kept, so that one timer can be shared by all
+    images of a batch and summarized at the end.
+
+    CPU time is that of the whole process, so it includes the threads of
+    OpenCV.
+    """
+
+    def __init__(self) -> None:
+        self.records: list[StageRecord] = []
+
+    @property
+    def timings(self) -> dict[str, float]:
+        """Total wall time of each stage"""
+        timings: dict[str, float] = {}
+        for record in self.records:
+            timings[record.name] = timings.get(record.name, 0.0) + record.wall
+        return timings
+
+    @contextmanager
+    def stage(self, name: str, src: Any = None) -> Iterator[list[Any]]:
+        """Measures a block as a stage
+
+        Args:
+            name (str): Name of the stage.
+            src (Any, optional): Input of the stage. Defaults to None.
+
+        Yields:
+            Iterator[list[Any]]: Append the output of the stage to record its size.
+        """  # noqa: E501
+        outputs: list[Any] = []
+        is_tracing = tracemalloc.is_tracing()
+        if is_tracing:
+            tracemalloc.reset_peak()
+            base_memory = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield outputs
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            peak_memory = None
+            if is_tracing:
+                peak_memory = tracemalloc.get_traced_memory()[1] - base_memory
+            self.records.append(
+                StageRecord(
+                    name,
+                    wall,
+                    cpu,
+                    _size_of(src),
+                    _size_of(outputs[0]) if outputs else None,
+                    peak_memory,
+                )
+            )
+
+    def call(
+        self, name: str, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Calls a function as a stage
+
+        The first positional argument is recorded as the input.
+        """
+        with self.stage(name, args[0] if args else None) as outputs:
+            result = func(*args, **kwargs)
+            outputs.append(result)
+        return result
+
+    def extend(self, records: Iterable[StageRecord]) -> None:
+        """Adds records, for example those measured in another process"""
+        self.records.extend(records)
+
+    def reset(self) -> None:
+        self.records.clear()
+
+    def summary(self) -> list[StageSummary]:
+        """Aggregates the records by stage
+
+        Returns:
+            list[StageSummary]: Number of calls, total, median, 95th percentile and maximum of each stage in the order they first ran.
+        """  # noqa: E501
+        by_name: dict[str, list[StageRecord]] = {}
+        for record in self.records:
+            by_name.setdefault(record.name, []).append(record)
+
+        summaries = []
+        for name, records in by_name.items():
+            wall = np.array([r.wall for r in records])
+            cpu = np.array([r.cpu for r in records])
+            peaks = [r.peak_memory for r in records if r.peak_memory]
+            summaries.append(
+                StageSummary(
+                    name=name,
+                    num_calls=len(records),
+                    wall_total=float(wall.sum()),
+                    wall_p50=float(np.percentile(wall, 50)),
+                    wall_p95=float(np.percentile(wall, 95)),
+                    wall_max=float(wall.max()),
+                    cpu_total=float(cpu.sum()),
+                    cpu_p50=float(np.percentile(cpu, 50)),
+                    cpu_p95=float(np.percentile(cpu, 95)),
+                    cpu_max=float(cpu.max()),
+                    in_size_mean=_mean_or_none([r.in_size for r in records]),
+                    out_size_mean=_mean_or_none([r.out_size for r in records]),
+                    peak_memory_max=max(peaks) if peaks else None,
+                )
+            )
+        return summaries
+
+    def to_json(self, path: str | Path | None = None) -> str:
+        """Exports the summary as JSON. Times are in seconds."""
+        txt = json.dumps([s._asdict() for s in self.summary()], indent=4)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(txt)
+        return txt
+
+    def to_csv(self, path: str | Path | None = None) -> str:
+        """Exports the summary as CSV. Times are in seconds."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(StageSummary._fields)
+        writer.writerows(
+            ["" if v is None else v for v in s] for s in self.summary()
+        )
+        txt = buffer.getvalue()
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(txt)
+        return txt
+
+    def export(self, path: str | Path) -> None:
+        """Exports the summary as CSV or JSON depending on the suffix"""
+        if Path(path).suffix == ".csv":
+            self.to_csv(path)
+        else:
+            self.to_json(path)
+
+
+@contextmanager
+def profile_cpu(
+    output_path: str | Path | None = None, num_lines: int = 30
+) -> Iterator[cProfile.Profile]:
+    """Profiles a block with cProfile
+
+    Args:
+        output_path (str | Path | None, optional): The stats are dumped to this file, which can be read by pstats or snakeviz. Printed if None. Defaults to None.
+        num_lines (int, optional): Number of functions printed. Defaults to 30.
+
+    Yields:
+        Iterator[cProfile.Profile]: The running profiler.
+    """  # noqa: E501
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output_path is None:
+            stats = pstats.Stats(profiler).sort_stats("cumulative")
+            stats.print_stats(num_lines)
+        else:
+            profiler.dump_stats(output_path)
+
+
+@contextmanager
+def trace_memory(num_lines: int = 10) -> Iterator[None]:
+    """Traces memory allocations of a block with tracemalloc
+
+    While tracing, StageTimer also records the peak memory of each stage.
+    The lines that allocated most and the peak are printed at the end.
+
+    Args:
+        num_lines (int, optional): Number of lines printed. Defaults to 10.
+    """
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        for stat in snapshot.statistics("lineno")[:num_lines]:
+            print(stat)
+        print(f"Peak of traced memory: {peak / 2**20:.1f} MiB")
@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Iterable, Literal, NamedTuple, Sequence
+
+# Columns that identify an image when a run is resumed
+KEY_COLUMNS = ("path", "size", "mtime_ns")
+
+ResultFormat = Literal["csv", "jsonl"]
+
+
+def _absolute(path: str | Path) -> str:
+    # A file has the same key whether its path is relative or absolute
+    return str(Path(path).resolve())
+
+
+class FileKey(NamedTuple):
+    # Absolute path
+    path: str
+    size: int
+    mtime_ns: int
+
+    @staticmethod
+    def of(path: str | Path) -> "FileKey | None":
+        """The key of a file, or None if it cannot be accessed"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return FileKey(_absolute(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _read_rows(path: Path, fmt: ResultFormat) -> Iterable[dict[str, Any]]:
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut off by a crash
+                continue
+
+
+def read_latest_rows(
+    path: str | Path, fmt: ResultFormat
+) -> dict[str, dict[str, Any]]:
+    """Reads the last row of each image written by `ResultWriter`
+
+    A resumed output is an append log. An image that failed is written
+    again each time it is retried, so only its last row is current.
+
+    Args:
+        path (str | Path): The output file. It doesn't have to exist.
+        fmt (ResultFormat): Format of the output file.
+
+    Returns:
+        dict[str, dict[str, Any]]: Absolute path of an image -> its last row, in the order of the first row of each image. Rows without a "path" are skipped.
+    """  # noqa: E501
+    path = Path(path)
+    if not path.exists():
+        return {}
+    rows: dict[str, dict[str, Any]] = {}
+    for row in _read_rows(path, fmt):
+        if row.get("path"):
+            rows[_absolute(row["path"])] = row
+    return rows
+
+
+def read_done_keys(path: str | Path, fmt: ResultFormat) -> set[FileKey]:
+    """Reads the keys of the images already written by `ResultWriter`
+
+    Args:
+        path (str | Path): The output file. It doesn't have to exist.
+        fmt (ResultFormat): Format of the output file.
+
+    Returns:
+        set[FileKey]: Keys of the images whose last row has every column of `KEY_COLUMNS` and no "error", so that failed images are processed again.
+    """  # noqa: E501
+    keys = set()
+    for img_path, row in read_latest_rows(path, fmt).items():
+        if row.get("error"):
+            continue
+        try:
+            keys.add(FileKey(img_path, int(row["size"]), int(row["mtime_ns"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return keys
+
+
+def _truncate_partial_line(path: Path) -> None:
+    """Removes a last line that was not completely written"""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        # Search for the last newline backwards, one block at a time
+        position = size
+        while position > 0:
+            block_start = max(0, position - 4096)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                end = block_start + newline + 1
+                if end != size:
+                    f.truncate(end)
+                return
+            position = block_start
+        f.truncate(0)
+
+
+class ResultWriter:
+    """Writes rows of results as CSV or JSON Lines as they complete
+
+    Rows are flushed every `flush_every` rows or `flush_interval` seconds,
+    whichever comes first, so that a crash loses at most that many rows.
+    Nothing is kept in memory after a row is written.
+    """
+
+    def __init__(
+        self,
+        file: IO[str],
+        columns: Sequence[str],
+        fmt: ResultFormat = "csv",
+        write_header: bool = True,
+        flush_every: int = 100,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.file = file
+        self.columns = tuple(columns)
+        self.fmt = fmt
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.num_rows = 0
+        self._num_unflushed = 0
+        self._last_flush = time.monotonic()
+        self._csv_writer = None
+        if fmt == "csv":
+            self._csv_writer = csv.DictWriter(
+                file, self.columns, lineterminator="\n"
+            )
+            if write_header:
+                self._csv_writer.writeheader()
+
+    @staticmethod
+    def open(
+        path: str | Path,
+        columns: Sequence[str],
+        fmt: ResultFormat = "csv",
+        append: bool = False,
+        flush_every: int = 100,
+        flush_interval: float = 5.0,
+    ) -> "ResultWriter":
+        """Opens an output file
+
+        Args:
+            path (str | Path): The output file.
+            columns (Sequence[str]): Columns of the rows.
+            fmt (ResultFormat, optional): Format of the output file. Defaults to "csv".
+            append (bool, optional): Whether to append to an existing file instead of overwriting it. A last line cut off by a crash is removed. Defaults to False.
+            flush_every (int, optional): Number of rows between flushes. Defaults to 100.
+            flush_interval (float, optional): Maximum seconds between flushes. Defaults to 5.0.
+
+        Raises:
+            ValueError: If the header of an existing CSV file is not `columns`.
+
+        Returns:
+            ResultWriter: The writer. Close it, or use it in a `with` statement.
+        """  # noqa: E501
+        path = Path(path)
+        is_empty = True
+        if append and path.exists():
+            _truncate_partial_line(path)
+            is_empty = path.stat().st_size == 0
+            if fmt == "csv" and not is_empty:
+                with open(path, newline="") as f:
+                    header = next(csv.reader(f), [])
+                if tuple(header) != tuple(columns):
+                    raise ValueError(
+                        f"The columns of {path} are {header}, "
+                        f"but {list(columns)} are expected"
+                    )
+        file = open(path, "a" if append else "w", newline="")
+        return ResultWriter(
+            file,
+            columns,
+            fmt,
+            write_header=is_empty,
+            flush_every=flush_every,
+            flush_interval=flush_interval,
+        )
+
+    def write(self, row: dict[str, Any]) -> None:
+        if self._csv_writer is not None:
+            self._csv_writer.writerow(row)
+        else:
+            row = {column: row.get(column) for column in self.columns}
+            self.file.write(json.dumps(row) + "\n")
+        self.num_rows += 1
+        self._num_unflushed += 1
+        if (
+            self._num_unflushed >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        self.file.flush()
+        self._num_unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from extract_digit.batch import process_paths
+from extract_digit.cache import ResultCache, cache_keys
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.synthetic import (
+    expected_digits,
+    render_photo,
+    synthetic_config,
+)
+
+IMG_SIZE = (720, 960)
+
+
+def _write_photo(path: Path, reading: str, seed: int = 0) -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    img = render_photo(
+        reading,
+        cfg.crop_transform.crop_area_vertices,
+        IMG_SIZE,
+        4.0,
+        np.random.default_rng(seed),
+    )
+    cv2.imwrite(str(path), img)
+
+
+def test_cache_keys_depend_on_stage_parameters() -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    keys = cache_keys(b"image", cfg)
+    assert cache_keys(b"image", cfg.model_copy(deep=True)) == keys
+    assert cache_keys(b"other", cfg).crop != keys.crop
+
+    cfg.estimation.filling_area_ratio_thresh += 0.1
+    changed = cache_keys(b"image", cfg)
+    assert changed.mask == keys.mask
+    assert changed.reading != keys.reading
+
+    cfg.binalize.adaptive_thresh_C += 1
+    changed = cache_keys(b"image", cfg)
+    assert changed.crop == keys.crop
+    assert changed.mask != keys.mask
+
+
+def test_pipeline_reuses_cached_stages(tmp_path: Path) -> None:
+    img_path = tmp_path / "img.png"
+    _write_photo(img_path, "1847")
+    cfg = synthetic_config(IMG_SIZE)
+    with ResultCache(tmp_path / "cache.sqlite") as cache:
+        pipeline = ExtractDigitPipeline(cfg, cache=cache)
+        assert pipeline.process_path(img_path) == expected_digits("1847")
+        assert pipeline.process_path(img_path) == expected_digits("1847")
+        assert cache.session_stats["reading"] == (1, 1)
+        assert cache.session_stats["crop"] == (0, 1)
+
+        # Only the estimation runs again
+        cfg = cfg.model_copy(deep=True)
+        cfg.estimation.filling_area_ratio_thresh += 0.01
+        pipeline = ExtractDigitPipeline(cfg, cache=cache)
+        assert pipeline.process_path(img_path) == expected_digits("1847")
+        assert cache.session_stats["reading"] == (1, 2)
+        assert cache.session_stats["mask"] == (1, 1)
+        assert cache.session_stats["crop"] == (1, 1)
+
+    # The statistics are kept in the database
+    with ResultCache(tmp_path / "cache.sqlite") as cache:
+        assert cache.stats()["reading"] == (1, 2)
+        assert cache.session_stats["reading"] == (0, 0)
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    with ResultCache(tmp_path / "cache.sqlite", max_bytes=280) as cache:
+        img = np.full((10, 10), 255, np.uint8)
+        cache.put_array("crop:a", img)
+        cache.put_reading("reading:b", ["", "1", "2", "3"])
+        cache.put_reading("reading:c", ["", "4", "5", "6"])
+        # Use "a" so that "b" is the oldest entry
+        np.testing.assert_array_equal(cache.get_array("crop:a"), img)
+        noise = np.random.default_rng(0).integers(0, 256, (10, 10), np.uint8)
+        cache.put_array("crop:d", noise)
+
+        assert cache.total_bytes <= 280
+        assert cache.get_reading("reading:b") is None
+        assert cache.get_reading("reading:c") == ["", "4", "5", "6"]
+
+
+def test_cache_writes_lookups_in_batches(tmp_path: Path) -> None:
+    cache_path = tmp_path / "cache.sqlite"
+    with ResultCache(cache_path, flush_every=3) as cache:
+        cache.put_reading("reading:a", ["", "1", "2", "3"])
+        # Replacing an entry does not count its size twice
+        cache.put_reading("reading:a", ["1", "2", "3", "4"])
+        assert cache._total_bytes == cache.total_bytes
+
+        with ResultCache(cache_path) as other:
+            cache.get_reading("reading:a")
+            cache.get_reading("reading:b")
+            assert other.stats()["reading"] == (0, 0)
+            # Written at the third lookup
+            cache.get_reading("reading:a")
+            assert other.stats()["reading"] == (2, 1)
+            cache.get_reading("reading:b")
+        assert cache.stats()["reading"] == (2, 2)
+    with ResultCache(cache_path) as cache:
+        assert cache.stats()["reading"] == (2, 2)
+
+
+def test_worker_processes_write_their_lookups(tmp_path: Path) -> None:
+    img_paths = []
+    for i, reading in enumerate(["905", "1847"]):
+        img_paths.append(tmp_path / f"{i}.png")
+        _write_photo(img_paths[-1], reading, seed=i)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(synthetic_config(IMG_SIZE).model_dump_json())
+    cache_path = tmp_path / "cache.sqlite"
+
+    for _ in range(2):
+        results = process_paths(
+            img_paths, config_path, workers=2, cache_path=cache_path
+        )
+        assert all(result.error is None for result in results)
+    with ResultCache(cache_path) as cache:
+        assert cache.stats()["reading"] == (2, 2)
@@ -0,0 +1,198 @@
+import io
+import json
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from extract_digit.batch import DIGIT_COLUMNS
+from extract_digit.cli import EXIT_FAILED_IMAGES, EXIT_OK, find_images, main
+from extract_digit.pipeline import MultiDisplayPipeline
+from extract_digit.synthetic import (
+    display_quad,
+    multi_display_config,
+    render_displays_photo,
+    render_photo,
+    synthetic_config,
+)
+
+IMG_SIZE = (720, 960)
+
+
+def _make_images(tmp_path: Path) -> Path:
+    cfg = synthetic_config(IMG_SIZE)
+    rng = np.random.default_rng(0)
+    (tmp_path / "imgs" / "sub").mkdir(parents=True)
+    for name, reading in [("a.jpg", "905"), ("sub/b.png", "1847")]:
+        img = render_photo(
+            reading, cfg.crop_transform.crop_area_vertices, IMG_SIZE, 4.0, rng
+        )
+        cv2.imwrite(str(tmp_path / "imgs" / name), img)
+    (tmp_path / "imgs" / "notes.txt").write_text("not an image")
+    config_path = tmp_path / "config.json"
+    config_path.write_text(cfg.model_dump_json())
+    return config_path
+
+
+def test_find_images(tmp_path: Path) -> None:
+    _make_images(tmp_path)
+    imgs_dir = tmp_path / "imgs"
+    a, b = imgs_dir / "a.jpg", imgs_dir / "sub" / "b.png"
+
+    assert find_images([str(imgs_dir)]) == [a]
+    assert find_images([str(imgs_dir)], recursive=True) == [a, b]
+    assert find_images([str(imgs_dir / "**" / "*.png"), str(a)]) == [b, a]
+    stdin = io.StringIO(f"{a}\n\n{b}\n{a}\n")
+    assert find_images(["-"], stdin=stdin) == [a, b]
+    with pytest.raises(FileNotFoundError):
+        find_images([str(imgs_dir / "missing.jpg")])
+
+
+def test_run_writes_results_and_exit_code(tmp_path: Path) -> None:
+    config_path = _make_images(tmp_path)
+    out_path = tmp_path / "out.jsonl"
+    args = ["run", str(tmp_path / "imgs"), "-r", "--config", str(config_path)]
+
+    assert main(args + ["--out", str(out_path)]) == EXIT_OK
+    with open(out_path) as f:
+        rows = [json.loads(line) for line in f]
+    assert [row["path"] for row in rows] == [
+        str(tmp_path / "imgs" / "a.jpg"),
+        str(tmp_path / "imgs" / "sub" / "b.png"),
+    ]
+    digits = [[row[k] for k in list(row)[1:5]] for row in rows]
+    assert digits == [["0", "9", "0", "5"], ["1", "8", "4", "7"]]
+
+    (tmp_path / "imgs" / "broken.jpg").write_bytes(b"not an image")
+    out_path = tmp_path / "out.csv"
+    assert main(args + ["--out", str(out_path)]) == EXIT_FAILED_IMAGES
+    lines = out_path.read_text().splitlines()
+    assert lines[0] == (
+        "path,4th-digit,3rd-digit,2nd-digit,1st-digit,error,size,mtime_ns"
+    )
+    assert lines[2].startswith(f"{tmp_path / 'imgs' / 'broken.jpg'},,,,,")
+
+    # Only the new image and the failed one are processed and appended
+    (tmp_path / "imgs" / "c.jpg").write_bytes(b"not an image")
+    resume_args = args + ["--out", str(out_path), "--resume"]
+    assert main(resume_args) == EXIT_FAILED_IMAGES
+    lines = out_path.read_text().splitlines()
+    assert len(lines) == 6
+    assert lines[-2].startswith(f"{tmp_path / 'imgs' / 'broken.jpg'},")
+    assert lines[-1].startswith(f"{tmp_path / 'imgs' / 'c.jpg'},")
+
+    # Failed images are retried until they are read
+    for name in ["broken.jpg", "c.jpg"]:
+        shutil.copy(tmp_path / "imgs" / "a.jpg", tmp_path / "imgs" / name)
+    assert main(resume_args) == EXIT_OK
+    assert len(out_path.read_text().splitlines()) == 8
+    assert main(resume_args) == EXIT_OK
+    assert len(out_path.read_text().splitlines()) == 8
+
+
+def test_run_rejects_missing_inputs(tmp_path: Path) -> None:
+    assert main(["run", str(tmp_path / "missing")]) == 2
+
+
+def test_run_writes_columns_of_each_display(tmp_path: Path) -> None:
+    quads = {
+        "a": display_quad(IMG_SIZE, center=(0.3, 0.3)),
+        "b": display_quad(IMG_SIZE, center=(0.7, 0.7)),
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        multi_display_config(IMG_SIZE, quads).model_dump_json()
+    )
+    img = render_displays_photo(
+        [("905", quads["a"]), ("1847", quads["b"])], IMG_SIZE
+    )
+    cv2.imwrite(str(tmp_path / "img.png"), img)
+    out_path = tmp_path / "out.jsonl"
+
+    args = ["run", str(tmp_path / "img.png"), "--config", str(config_path)]
+    assert main(args + ["--out", str(out_path)]) == EXIT_OK
+    (row,) = [json.loads(line) for line in out_path.read_text().splitlines()]
+    assert [row[f"a.{c}"] for c in DIGIT_COLUMNS] == ["0", "9", "0", "5"]
+    assert [row[f"b.{c}"] for c in DIGIT_COLUMNS] == ["1", "8", "4", "7"]
+    # serve only reads one display
+    assert main(["serve", "--config", str(config_path)]) == 2
+
+
+def test_run_reads_frame_stacks(tmp_path: Path) -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    rng = np.random.default_rng(0)
+    frames = np.stack(
+        [
+            render_photo(
+                reading,
+                cfg.crop_transform.crop_area_vertices,
+                IMG_SIZE,
+                4.0,
+                rng,
+            )
+            for reading in ["905", "1847"]
+        ]
+    )
+    np.save(tmp_path / "frames.npy", frames)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(cfg.model_dump_json())
+    out_path = tmp_path / "out.jsonl"
+    args = [
+        "run",
+        str(tmp_path / "frames.npy"),
+        "--config",
+        str(config_path),
+        "--out",
+        str(out_path),
+    ]
+
+    assert main(args + ["--workers", "2"]) == EXIT_OK
+    with open(out_path) as f:
+        rows = [json.loads(line) for line in f]
+    assert [row["path"] for row in rows] == [
+        f"{tmp_path / 'frames.npy'}[0]",
+        f"{tmp_path / 'frames.npy'}[1]",
+    ]
+    digits = [[row[k] for k in DIGIT_COLUMNS] for row in rows]
+    assert digits == [["0", "9", "0", "5"], ["1", "8", "4", "7"]]
+
+    # Every frame is already written
+    assert main(args + ["--resume"]) == EXIT_OK
+    assert len(out_path.read_text().splitlines()) == 2
+
+
+def test_run_reads_displays_of_frame_stacks(tmp_path: Path) -> None:
+    img_size = (1500, 2000)
+    quads = {
+        "a": display_quad(img_size, center=(0.3, 0.3)),
+        "b": display_quad(img_size, center=(0.7, 0.7)),
+    }
+    cfg = multi_display_config(img_size, quads)
+    for display in cfg.displays:
+        display.crop_transform.scale = 0.3
+    # The displays of images are decoded at a reduced size
+    assert MultiDisplayPipeline(cfg, num_threads=1).reduction > 1
+    config_path = tmp_path / "config.json"
+    config_path.write_text(cfg.model_dump_json())
+    frames = np.stack(
+        [
+            render_displays_photo([(a, quads["a"]), (b, quads["b"])], img_size)
+            for a, b in [("905", "1847"), ("260", "1133")]
+        ]
+    )
+    np.save(tmp_path / "frames.npy", frames)
+    out_path = tmp_path / "out.jsonl"
+    args = ["run", str(tmp_path / "frames.npy"), "--config", str(config_path)]
+
+    assert main(args + ["--out", str(out_path)]) == EXIT_OK
+    rows = [json.loads(line) for line in out_path.read_text().splitlines()]
+    assert [[row[f"a.{c}"] for c in DIGIT_COLUMNS] for row in rows] == [
+        ["0", "9", "0", "5"],
+        ["0", "2", "6", "0"],
+    ]
+    assert [[row[f"b.{c}"] for c in DIGIT_COLUMNS] for row in rows] == [
+        ["1", "8", "4", "7"],
+        ["1", "1", "3", "3"],
+    ]
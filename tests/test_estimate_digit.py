@@ -0,0 +1,125 @@
+from typing import Sequence
+
+import numpy as np
+import pytest
+
+from extract_digit.estimate_digit import (
+    GRID_LAYOUT,
+    SEGMENT_DIGITS,
+    SEGMENT_LOCATIONS,
+    SEGMENT_LUT,
+    SegmentStates,
+    classify_digits,
+    estimate_digit,
+    estimate_digit_integral,
+    score_segments,
+    segment_fill_ratios_integral,
+)
+from extract_digit.param_config import SegmentLayout, SegmentRegion
+
+
+def _draw_digit(states: Sequence[int], height: int, width: int) -> np.ndarray:
+    """Draws a digit whose segments fill the cells of the 3x5 grid"""
+    img = np.zeros((height, width), np.uint8)
+    row_edges = np.linspace(0, height, 6).astype(int)
+    col_edges = np.linspace(0, width, 4).astype(int)
+    for segment_idx, (i, j) in SEGMENT_LOCATIONS.items():
+        if states[segment_idx]:
+            img[
+                row_edges[i] : row_edges[i + 1],
+                col_edges[j] : col_edges[j + 1],
+            ] = 255
+    return img
+
+
+def test_segment_lut() -> None:
+    for states, digit in SEGMENT_DIGITS.items():
+        code = sum(on << i for i, on in enumerate(states))
+        assert SEGMENT_LUT[code] == digit
+    assert SEGMENT_LUT[0] == ""
+    assert SegmentStates([0] * 7).cvt_digit() == ""
+
+
+@pytest.mark.parametrize("size", [(50, 30), (67, 41), (133, 70)])
+def test_classify_digits_matches_estimate_digit(
+    size: tuple[int, int],
+) -> None:
+    patterns = list(SEGMENT_DIGITS.items())
+    digit_imgs = [_draw_digit(states, *size) for states, _ in patterns]
+
+    expected = [digit for _, digit in patterns]
+    assert [estimate_digit(img, 0.2) for img in digit_imgs] == expected
+    assert classify_digits(digit_imgs, 0.2) == expected
+    assert classify_digits([], 0.2) == []
+
+
+def test_classify_digits_matches_estimate_digit_on_noisy_crops() -> None:
+    rng = np.random.default_rng(0)
+    digit_imgs = []
+    for _ in range(1000):
+        height = int(rng.integers(5, 120))
+        width = int(rng.integers(3, 80))
+        # Blobs of random density, thresholded at random levels
+        density = rng.random((height, width)) * rng.random()
+        digit_imgs.append((density > rng.random() * 0.5).astype(np.uint8))
+    patterns = list(SEGMENT_DIGITS)
+    for _ in range(200):
+        height = int(rng.integers(5, 120))
+        width = int(rng.integers(3, 80))
+        digit_img = _draw_digit(
+            patterns[rng.integers(len(patterns))], height, width
+        )
+        noise = rng.random((height, width)) < 0.3
+        digit_imgs.append(np.where(noise, 255 - digit_img, digit_img))
+
+    for thresh in [0.2, 0.5]:
+        assert classify_digits(digit_imgs, thresh) == [
+            estimate_digit(img, thresh) for img in digit_imgs
+        ]
+
+
+@pytest.mark.parametrize("size", [(50, 30), (67, 41), (133, 70)])
+def test_estimate_digit_integral_matches_estimate_digit(
+    size: tuple[int, int],
+) -> None:
+    for states, digit in SEGMENT_DIGITS.items():
+        digit_img = _draw_digit(states, *size)
+        assert estimate_digit_integral(digit_img, 0.2) == digit
+
+
+def test_segment_fill_ratios_integral_custom_layout() -> None:
+    digit_img = np.zeros((100, 60), np.uint8)
+    digit_img[:50, :30] = 255
+    # Overlapping regions and a decimal point
+    layout = SegmentLayout(
+        segments=[
+            SegmentRegion(left=0, right=0.5, top=0, bottom=0.5),
+            SegmentRegion(left=0.25, right=0.75, top=0, bottom=0.5),
+            SegmentRegion(left=0, right=1, top=0, bottom=1),
+        ]
+        + GRID_LAYOUT.segments[3:],
+        decimal_point=SegmentRegion(
+            left=0.9, right=1, top=0.9, bottom=1, thresh=0.5
+        ),
+    )
+    ratios = segment_fill_ratios_integral(digit_img, layout)
+    np.testing.assert_allclose(ratios[:3], [1.0, 0.5, 0.25])
+    assert ratios.shape == (8,)
+
+    digit_img[90:, 54:] = 255
+    assert estimate_digit_integral(digit_img, 0.2, layout).endswith(".")
+
+
+def test_score_segments() -> None:
+    states = {digit: states for states, digit in SEGMENT_DIGITS.items()}
+    zero = np.array(states["0"]) * 0.9
+    # "1" with a faint extra segment
+    one_ish = np.array(states["1"]) * 0.9
+    one_ish[3] = 0.4
+    certain, uncertain = score_segments(
+        np.stack([zero, one_ish]), np.full(7, 0.3), 0.15
+    )
+    assert certain.digit == "0"
+    assert certain.confidence == pytest.approx(1.0)
+    assert (uncertain.distance, uncertain.nearest) == (1, "1")
+    assert uncertain.confidence < 0.5
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parents[1]
+
+
+def _loaded_packages(code: str) -> set[str]:
+    """Top-level packages that `code` imports in a fresh interpreter"""
+    script = (
+        "import sys\n"
+        "before = set(sys.modules)\n"
+        f"{code}\n"
+        "for name in set(sys.modules) - before:\n"
+        "    print(name.split('.')[0])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_headless_import_loads_only_core_dependencies() -> None:
+    # pydantic imports some of its dependencies when a model is defined
+    allowed = _loaded_packages(
+        "import cv2, numpy, pydantic\n"
+        "class Model(pydantic.BaseModel):\n"
+        "    x: int = pydantic.Field(ge=0)"
+    )
+    loaded = _loaded_packages(
+        "import extract_digit\n"
+        "import extract_digit.main\n"
+        "import extract_digit.pipeline\n"
+        "import extract_digit.stream"
+    )
+    assert not loaded & {"matplotlib", "PIL", "tkinter", "_tkinter"}
+    third_party = {
+        name
+        for name in loaded - allowed - set(sys.stdlib_module_names)
+        # Private modules such as __mp_main__ belong to the interpreter
+        if not name.startswith("_")
+    }
+    assert third_party <= {"extract_digit"}
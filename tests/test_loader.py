@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from extract_digit.loader import (
+    imread_roi,
+    open_frame_stack,
+    plan_roi_decode,
+)
+from extract_digit.param_config import Point, QuadrilateralVertices
+from extract_digit.processing import get_dst_vertices
+
+VERTICES = QuadrilateralVertices(
+    upper_left=Point(1980, 1620),
+    upper_right=Point(2400, 1670),
+    lower_right=Point(2370, 1910),
+    lower_left=Point(1950, 1850),
+)
+
+
+def test_plan_roi_decode_reduction() -> None:
+    # The crop area is about 420x240, so it can't be reduced for 300x200
+    plan = plan_roi_decode(VERTICES, (200, 300))
+    assert plan.reduction == 1
+    assert plan.area.left == 1950 - 16
+    assert plan.area.top == 1620 - 16
+    np.testing.assert_allclose(plan.src_vertices[0], (1980 - 1934, 16))
+
+    plan = plan_roi_decode(VERTICES, (50, 100))
+    assert plan.reduction == 4
+    plan = plan_roi_decode(VERTICES, (50, 100), allow_reduction=False)
+    assert plan.reduction == 1
+
+
+def test_imread_roi_matches_full_decoding(tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (2000, 2500), np.uint8)
+    img_path = tmp_path / "img.png"
+    cv2.imwrite(str(img_path), img)
+
+    dst_size = (200, 300)
+    dst_vertices = get_dst_vertices(dst_size)
+    plan = plan_roi_decode(VERTICES, dst_size)
+    roi = imread_roi(img_path, plan)
+    assert roi.shape == (plan.area.bottom - plan.area.top,) + (
+        plan.area.right - plan.area.left,
+    )
+
+    full_mat = cv2.getPerspectiveTransform(
+        np.array(VERTICES.align_vertices(), np.float32), dst_vertices
+    )
+    roi_mat = cv2.getPerspectiveTransform(plan.src_vertices, dst_vertices)
+    expected = cv2.warpPerspective(img, full_mat, (300, 200))
+    actual = cv2.warpPerspective(roi, roi_mat, (300, 200))
+    diff = np.abs(expected.astype(int) - actual.astype(int))
+    assert diff.max() <= 1
+
+
+def test_open_frame_stack(tmp_path: Path) -> None:
+    frames = np.arange(3 * 4 * 5, dtype=np.uint8).reshape(3, 4, 5)
+    np.save(tmp_path / "frames.npy", frames)
+    np.save(tmp_path / "frame.npy", frames[0])
+    (tmp_path / "frames.raw").write_bytes(b"HDR" + frames.tobytes())
+
+    stack = open_frame_stack(tmp_path / "frames.npy")
+    assert isinstance(stack, np.memmap)
+    np.testing.assert_array_equal(stack, frames)
+    assert open_frame_stack(tmp_path / "frame.npy").shape == (1, 4, 5)
+    stack = open_frame_stack(tmp_path / "frames.raw", (4, 5), offset=3)
+    np.testing.assert_array_equal(stack, frames)
+    assert not stack.flags.writeable
+
+    with pytest.raises(ValueError):
+        open_frame_stack(tmp_path / "frames.raw", (4, 5))
+    with pytest.raises(ValueError):
+        open_frame_stack(tmp_path / "frames.raw")
+    np.save(tmp_path / "float.npy", frames.astype(np.float32))
+    with pytest.raises(ValueError):
+        open_frame_stack(tmp_path / "float.npy")
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+import pytest
+
+from extract_digit.localize import DisplayLocalizer, order_vertices
+from extract_digit.param_config import LocalizeParams, QuadrilateralVertices
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.synthetic import (
+    display_quad,
+    expected_digits,
+    render_photo,
+    synthetic_config,
+)
+
+IMG_SIZE = (2000, 2500)
+
+
+def _photo(quad: QuadrilateralVertices, reading: str = "1847") -> np.ndarray:
+    return render_photo(reading, quad, IMG_SIZE, 4.0, np.random.default_rng(0))
+
+
+def test_order_vertices() -> None:
+    points = np.array([[10, 12], [0, 1], [11, 0], [1, 10]])
+    np.testing.assert_array_equal(
+        order_vertices(points), [[0, 1], [11, 0], [10, 12], [1, 10]]
+    )
+
+
+def test_localizer_tracks_the_display() -> None:
+    quad = display_quad(IMG_SIZE)
+    localizer = DisplayLocalizer(LocalizeParams(), aspect=1.5)
+    assert localizer.update(_photo(quad))
+    assert localizer.vertices is not None
+    np.testing.assert_allclose(
+        localizer.vertices, quad.align_vertices(), atol=2.0
+    )
+    assert localizer.num_full_searches == 1
+
+    # The same frame keeps the vertices without searching the whole frame
+    assert not localizer.update(_photo(quad))
+    assert localizer.num_full_searches == 1
+    assert localizer.num_tracked == 1
+
+    # A small move is tracked
+    moved = display_quad(IMG_SIZE, center=(0.85, 0.87))
+    assert localizer.update(_photo(moved))
+    assert localizer.num_full_searches == 1
+    np.testing.assert_allclose(
+        localizer.vertices, moved.align_vertices(), atol=2.0
+    )
+
+    # A display out of the tracking window is found by a full search
+    far = display_quad(IMG_SIZE, center=(0.3, 0.3))
+    assert localizer.update(_photo(far))
+    assert localizer.num_full_searches == 2
+    np.testing.assert_allclose(
+        localizer.vertices, far.align_vertices(), atol=2.0
+    )
+
+
+def test_localizer_raises_if_the_display_is_never_found() -> None:
+    localizer = DisplayLocalizer(LocalizeParams(), aspect=1.5)
+    with pytest.raises(ValueError):
+        localizer.update(np.full(IMG_SIZE, 60, np.uint8))
+
+
+def test_pipeline_localizes_the_crop_area() -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    # Start from a crop area far from the display
+    cfg.crop_transform.crop_area_vertices = display_quad(
+        IMG_SIZE, center=(0.3, 0.3)
+    )
+    cfg.crop_transform.localize = LocalizeParams()
+    pipeline = ExtractDigitPipeline(cfg)
+    assert not pipeline.uses_roi
+
+    img = _photo(display_quad(IMG_SIZE), "905")
+    assert pipeline.process(img) == expected_digits("905")
+    vertices = pipeline.cfg.crop_transform.crop_area_vertices
+    np.testing.assert_allclose(
+        vertices.align_vertices(),
+        display_quad(IMG_SIZE).align_vertices(),
+        atol=2.0,
+    )
+    # The homography keeps the subpixel vertices
+    assert pipeline.localizer is not None
+    subpixel_vertices = pipeline.localizer.vertices
+    assert subpixel_vertices is not None
+    expected = cv2.getPerspectiveTransform(
+        subpixel_vertices, pipeline.dst_vertices
+    )
+    assert np.allclose(pipeline.trans_mat, expected)
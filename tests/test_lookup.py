@@ -0,0 +1,129 @@
+from pathlib import Path
+from typing import Sequence
+
+import cv2
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from extract_digit.cache import cache_keys
+from extract_digit.cli import export_digit_crops
+from extract_digit.estimate_digit import SEGMENT_DIGITS, SEGMENT_LOCATIONS
+from extract_digit.lookup import (
+    LookupClassifier,
+    digit_masks,
+    load_lookup_classifier,
+)
+from extract_digit.param_config import EstimationParams
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.synthetic import (
+    expected_digits,
+    render_photo,
+    synthetic_config,
+)
+
+IMG_SIZE = (720, 960)
+READINGS = ["905", "1847", "263"]
+
+
+def _draw_digit(states: Sequence[int], height: int, width: int) -> np.ndarray:
+    img = np.zeros((height, width), np.uint8)
+    row_edges = np.linspace(0, height, 6).astype(int)
+    col_edges = np.linspace(0, width, 4).astype(int)
+    for segment_idx, (i, j) in SEGMENT_LOCATIONS.items():
+        if states[segment_idx]:
+            img[
+                row_edges[i] : row_edges[i + 1],
+                col_edges[j] : col_edges[j + 1],
+            ] = 255
+    return img
+
+
+def test_lookup_classifier(tmp_path: Path) -> None:
+    patterns = list(SEGMENT_DIGITS.items())
+    labels = [digit for _, digit in patterns]
+    train_imgs = [
+        _draw_digit(states, *size)
+        for size in [(50, 30), (50, 30), (67, 41)]
+        for states, _ in patterns
+    ]
+    test_imgs = [_draw_digit(states, 133, 70) for states, _ in patterns]
+
+    classifier = LookupClassifier.fit(train_imgs, labels * 3)
+    # The repeated examples are stored once
+    assert len(classifier.masks) <= 2 * len(patterns)
+    assert classifier.masks.shape[1] == 30
+    assert classifier.classify(test_imgs) == labels
+    matches = classifier.match(test_imgs)
+    assert all(m.margin > 0 and m.margin > m.distance for m in matches)
+
+    classifier.save(tmp_path / "index.npz")
+    loaded = LookupClassifier.load(tmp_path / "index.npz")
+    assert loaded.size == classifier.size
+    assert loaded.match(test_imgs) == matches
+
+    with pytest.raises(ValueError):
+        LookupClassifier(digit_masks(test_imgs), labels[:-1])
+
+
+def test_lookup_engine_reads_exported_digits(tmp_path: Path) -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    rng = np.random.default_rng(0)
+    labels: dict[Path, list[str]] = {}
+    for i, reading in enumerate(READINGS):
+        img_path = tmp_path / f"{i}.png"
+        img = render_photo(
+            reading,
+            cfg.crop_transform.crop_area_vertices,
+            IMG_SIZE,
+            4.0,
+            rng,
+        )
+        cv2.imwrite(str(img_path), img)
+        labels[img_path] = expected_digits(reading)
+
+    pipeline = ExtractDigitPipeline(cfg)
+    num_written = export_digit_crops(labels, pipeline, tmp_path / "digits")
+    assert num_written == 3 * len(READINGS)
+    index_path = tmp_path / "index.npz"
+    LookupClassifier.from_folder(tmp_path / "digits").save(index_path)
+
+    estimation = cfg.estimation.model_copy(
+        update={"engine": "lookup", "lookup_index": index_path}
+    )
+    pipeline = ExtractDigitPipeline(
+        cfg.model_copy(update={"estimation": estimation})
+    )
+    for img_path, digits in labels.items():
+        assert pipeline.process_cropped(pipeline.crop_path(img_path)) == digits
+
+    with pytest.raises(ValidationError):
+        EstimationParams(
+            aspect_thresh=1.0,
+            three_digits_aspect=1.0,
+            filling_area_ratio_thresh=0.2,
+            engine="lookup",
+        )
+
+
+def test_rewritten_index_is_reloaded(tmp_path: Path) -> None:
+    patterns = list(SEGMENT_DIGITS.items())
+    digit_imgs = [_draw_digit(states, 50, 30) for states, _ in patterns]
+    labels = [digit for _, digit in patterns]
+    index_path = tmp_path / "index.npz"
+    LookupClassifier.fit(digit_imgs, labels).save(index_path)
+    cfg = synthetic_config(IMG_SIZE)
+    cfg.estimation = cfg.estimation.model_copy(
+        update={"engine": "lookup", "lookup_index": index_path}
+    )
+    keys = cache_keys(b"image", cfg)
+    assert len(load_lookup_classifier(index_path).digits) == len(set(labels))
+
+    # Rewritten at the same path, as by `train-lookup --out`
+    LookupClassifier.fit(digit_imgs[:3], labels[:3]).save(index_path)
+    assert len(load_lookup_classifier(index_path).digits) == len(
+        set(labels[:3])
+    )
+    changed = cache_keys(b"image", cfg)
+    assert changed.mask == keys.mask
+    assert changed.reading != keys.reading
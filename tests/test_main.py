@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from extract_digit.main import run_on_directory
+from extract_digit.synthetic import render_photo, synthetic_config
+
+IMG_SIZE = (720, 960)
+CONFIG_PATH = (
+    Path(__file__).parents[1] / "extract_digit" / "configs" / "config.json"
+)
+
+
+def _read_rows(csv_path: Path) -> list[list[str]]:
+    with open(csv_path, "r") as f:
+        return [line.rstrip("\n").split(",") for line in f][1:]
+
+
+def test_run_on_directory_parallel_keeps_order(tmp_path: Path) -> None:
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    for i in range(4):
+        img = np.full((2000, 2500), 60 * i, np.uint8)
+        cv2.imwrite(str(src_dir / f"img_{i}.png"), img)
+    # A broken image must not stop the other images from being processed
+    (src_dir / "img_broken.jpg").write_bytes(b"not an image")
+
+    serial_dir = tmp_path / "serial"
+    parallel_dir = tmp_path / "parallel"
+    serial_dir.mkdir()
+    parallel_dir.mkdir()
+    run_on_directory(src_dir, serial_dir, config_path=CONFIG_PATH)
+    run_on_directory(src_dir, parallel_dir, workers=2, config_path=CONFIG_PATH)
+
+    serial_rows = _read_rows(serial_dir / "recognized_digits.csv")
+    parallel_rows = _read_rows(parallel_dir / "recognized_digits.csv")
+    assert [row[0] for row in parallel_rows] == [
+        "img_0",
+        "img_1",
+        "img_2",
+        "img_3",
+        "img_broken",
+    ]
+    assert parallel_rows == serial_rows
+    assert parallel_rows[-1][:5] == ["img_broken", "", "", "", ""]
+
+
+def test_run_on_directory_resumes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(cfg.model_dump_json())
+    rng = np.random.default_rng(0)
+
+    def write_photo(name: str, reading: str) -> None:
+        img = render_photo(
+            reading, cfg.crop_transform.crop_area_vertices, IMG_SIZE, 4.0, rng
+        )
+        cv2.imwrite(str(src_dir / name), img)
+
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    for i, reading in enumerate(["905", "1847", "260"]):
+        write_photo(f"img_{i}.png", reading)
+    (src_dir / "img_broken.jpg").write_bytes(b"not an image")
+    csv_path = tmp_path / "recognized_digits.csv"
+
+    # Relative paths are the same images as absolute ones
+    monkeypatch.chdir(tmp_path)
+    run_on_directory("src", ".", config_path=config_path)
+    rows = _read_rows(csv_path)
+    assert rows[-1][:5] == ["img_broken", "", "", "", ""]
+    assert rows[-1][5].startswith("FileNotFoundError")
+
+    # A rerun only processes the new, the modified and the failed images
+    write_photo("img_3.png", "1133")
+    write_photo("img_0.png", "770")
+    run_on_directory(src_dir, tmp_path, config_path=config_path)
+    assert [row[0] for row in _read_rows(csv_path)] == [
+        "img_0",
+        "img_1",
+        "img_2",
+        "img_broken",
+        "img_0",
+        "img_3",
+        "img_broken",
+    ]
+
+    run_on_directory(src_dir, tmp_path, config_path=config_path, resume=False)
+    assert len(_read_rows(csv_path)) == 5
@@ -0,0 +1,219 @@
+import cv2
+import numpy as np
+import pytest
+
+from extract_digit.param_config import (
+    DEFAULT_CONFIG_PATH,
+    Configurations,
+    RangeTuple,
+)
+from extract_digit.pipeline import ExtractDigitPipeline, MultiDisplayPipeline
+from extract_digit.processing import (
+    AllocationCounter,
+    binalize_image,
+    contour_features,
+    count_digit_contours,
+    crop_transform_show_digits,
+    filtering_digit_contour_features,
+    find_contours,
+)
+from extract_digit.synthetic import (
+    display_quad,
+    expected_digits,
+    multi_display_config,
+    render_displays_photo,
+    render_photo,
+    synthetic_config,
+)
+from extract_digit.timing import StageTimer
+
+
+def test_pipeline_matches_processing_functions() -> None:
+    cfg = Configurations.load_json(DEFAULT_CONFIG_PATH)
+    pipeline = ExtractDigitPipeline(cfg)
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (2000, 2500), np.uint8)
+
+    cropped_img = pipeline.crop(img)
+    expected = crop_transform_show_digits(
+        img,
+        cfg.crop_transform.crop_area_vertices,
+        cfg.crop_transform.dst_size,
+    )
+    np.testing.assert_array_equal(cropped_img, expected)
+
+    binalized_img = pipeline.binalize(cropped_img)
+    expected = binalize_image(
+        cropped_img,
+        gb_ksize=cfg.binalize.gb_ksize,
+        gb_sigmaX=cfg.binalize.gb_sigmaX,
+        epf_sigma_s=cfg.binalize.epf_sigma_s,
+        epf_sigma_r=cfg.binalize.epf_sigma_r,
+        adaptive_thresh_blocksize=cfg.binalize.adaptive_thresh_blocksize,
+        adaptive_thresh_C=cfg.binalize.adaptive_thresh_C,
+        closing_ksize=cfg.binalize.closing_ksize,
+    )
+    np.testing.assert_array_equal(binalized_img, expected)
+
+
+def test_binalize_auto_falls_back_to_full() -> None:
+    cfg = Configurations.load_json(DEFAULT_CONFIG_PATH)
+    cfg.binalize.mode = "auto"
+    # No number of digits is accepted, so the full path is always used
+    cfg.binalize.auto_num_digits = ()
+    timer = StageTimer()
+    pipeline = ExtractDigitPipeline(cfg, timer)
+    rng = np.random.default_rng(0)
+    cropped_img = rng.integers(0, 256, (200, 300), np.uint8)
+
+    binalized_img = pipeline.binalize(cropped_img)
+    assert set(timer.timings) == {
+        "binalize.fast",
+        "binalize.auto_check",
+        "binalize.full",
+    }
+    cfg.binalize.mode = "full"
+    np.testing.assert_array_equal(
+        binalized_img, ExtractDigitPipeline(cfg).binalize(cropped_img)
+    )
+
+
+def test_count_digit_contours_ignores_holes() -> None:
+    img = np.zeros((100, 200), np.uint8)
+    # "0" with a hole and "1"
+    img[10:90, 10:60] = 255
+    img[30:70, 25:45] = 0
+    img[10:90, 100:115] = 255
+    contours = find_contours(img)
+    assert len(contours) == 3
+    assert count_digit_contours(contours) == 2
+
+
+def test_contour_features_match_opencv() -> None:
+    rng = np.random.default_rng(0)
+    img = (rng.random((120, 160)) < 0.3).astype(np.uint8) * 255
+    contours = find_contours(img)
+    features = contour_features(contours)
+    assert len(features) == len(contours) > 100
+    for contour, row in zip(contours, features):
+        bbox = (row["x"], row["y"], row["width"], row["height"])
+        assert bbox == cv2.boundingRect(contour)
+        assert row["area"] == pytest.approx(cv2.contourArea(contour))
+    assert len(contour_features([])) == 0
+
+    indices, selected = filtering_digit_contour_features(
+        contours, img, 0.1, 1e-4, RangeTuple(1.0, 10)
+    )
+    expected = [
+        i
+        for i, row in enumerate(features)
+        if row["height"] > row["width"]
+        and row["fill"] > 0.1
+        and row["area"] / img.size > 1e-4
+        and 1.0 < row["aspect"] < 10
+    ]
+    assert indices.tolist() == expected
+    np.testing.assert_array_equal(selected, features[expected])
+
+
+def test_components_engine_matches_contours_engine() -> None:
+    img_size = (720, 960)
+    cfg = synthetic_config(img_size)
+    img = render_photo(
+        "1847",
+        cfg.crop_transform.crop_area_vertices,
+        img_size,
+        4.0,
+        np.random.default_rng(0),
+    )
+    contours_counter = AllocationCounter()
+    contours_pipeline = ExtractDigitPipeline(cfg, allocations=contours_counter)
+    cropped_img = contours_pipeline.crop(img)
+    binalized_img = contours_pipeline.binalize(cropped_img)
+    expected = contours_pipeline.extract_digits_area(
+        binalized_img, cropped_img
+    )
+
+    cfg = cfg.model_copy(deep=True)
+    cfg.filtering_digit.engine = "components"
+    components_counter = AllocationCounter()
+    components_pipeline = ExtractDigitPipeline(
+        cfg, allocations=components_counter
+    )
+    digits_img = components_pipeline.extract_digits_area(
+        binalized_img, cropped_img
+    )
+    # The same digits are selected, but their holes are never filled
+    assert digits_img.shape == expected.shape
+    assert np.all(digits_img <= expected)
+    assert components_pipeline.process(img) == expected_digits("1847")
+    assert components_counter.num_arrays < contours_counter.num_arrays
+
+
+def test_scaled_pipeline_processes_a_smaller_crop() -> None:
+    img_size = (2000, 2500)
+    cfg = synthetic_config(img_size)
+    cfg.crop_transform.scale = 0.5
+    rescaled = cfg.rescaled()
+    height, width = cfg.crop_transform.dst_size
+    assert rescaled.crop_transform.dst_size == (height // 2, width // 2)
+    assert rescaled.crop_transform.scale == 1.0
+    assert rescaled.binalize.gb_ksize == (7, 7)
+    assert rescaled.binalize.adaptive_thresh_blocksize == 151
+    assert rescaled.binalize.epf_sigma_s == cfg.binalize.epf_sigma_s / 2
+    assert rescaled.filtering_digit == cfg.filtering_digit
+    # Rounded to odd as in the "fast" mode, upwards at a tie
+    binalize_cfg = cfg.binalize.model_copy(update={"gb_ksize": (12, 13)})
+    assert binalize_cfg.scaled(0.5).gb_ksize == (7, 7)
+
+    pipeline = ExtractDigitPipeline(cfg)
+    img = render_photo(
+        "1847",
+        cfg.crop_transform.crop_area_vertices,
+        img_size,
+        4.0,
+        np.random.default_rng(0),
+    )
+    assert pipeline.crop(img).shape == (height // 2, width // 2)
+    assert pipeline.process(img) == expected_digits("1847")
+
+
+def test_multi_display_pipeline_reads_every_display() -> None:
+    img_size = (2000, 2500)
+    quads = {
+        "left": display_quad(img_size, center=(0.25, 0.3)),
+        "right": display_quad(img_size, rotation=-5.0, center=(0.7, 0.3)),
+        "bottom": display_quad(img_size, center=(0.5, 0.8)),
+    }
+    readings = {"left": "905", "right": "1847", "bottom": "260"}
+    # A display that only differs in estimation
+    cfg = multi_display_config(
+        img_size, quads, {"right": {"filling_area_ratio_thresh": 0.25}}
+    )
+    # The top level crop area defaults to that of the first display
+    assert cfg.crop_transform.crop_area_vertices == quads["left"]
+    display_cfgs = cfg.display_configs()
+    assert display_cfgs["right"].estimation.filling_area_ratio_thresh == 0.25
+    assert display_cfgs["bottom"].estimation == cfg.estimation
+
+    img = render_displays_photo(
+        [(readings[name], quad) for name, quad in quads.items()],
+        img_size,
+        4.0,
+        np.random.default_rng(0),
+    )
+    pipeline = MultiDisplayPipeline(cfg)
+    results = pipeline.process(img)
+    pipeline.close()
+    assert [r.name for r in results] == list(quads)
+    assert [r.digits for r in results] == [
+        expected_digits(readings[name]) for name in quads
+    ]
+    assert all(r.error is None for r in results)
+    # The image shared by the threads is left writeable for the caller
+    assert img.flags.writeable
+
+    with pytest.raises(ValueError):
+        Configurations.model_validate(
+            {**cfg.model_dump(), "displays": [cfg.displays[0]] * 2}
+        )
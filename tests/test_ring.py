@@ -0,0 +1,58 @@
+import pickle
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from extract_digit.batch import process_paths
+from extract_digit.ring import FrameRing, process_paths_shared
+from extract_digit.synthetic import render_photo, synthetic_config
+from extract_digit.timing import StageTimer
+
+IMG_SIZE = (720, 960)
+
+
+def test_frame_ring_is_shared_by_name() -> None:
+    ring = FrameRing(3, (2, 4, 5))
+    try:
+        attached = pickle.loads(pickle.dumps(ring))
+        attached.slot(1)[0] = 7
+        assert ring.slot(1)[0].sum() == 7 * 20
+        assert ring.slot(0).sum() == 0
+        attached.close()
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_process_paths_shared_matches_process_paths(tmp_path: Path) -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    rng = np.random.default_rng(0)
+    img_paths = []
+    for i, reading in enumerate(["905", "1847", "312", "1265", "770"]):
+        img_path = tmp_path / f"{i}.png"
+        img = render_photo(
+            reading, cfg.crop_transform.crop_area_vertices, IMG_SIZE, 4.0, rng
+        )
+        cv2.imwrite(str(img_path), img)
+        img_paths.append(img_path)
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    img_paths.insert(2, tmp_path / "broken.jpg")
+    config_path = tmp_path / "config.json"
+    config_path.write_text(cfg.model_dump_json())
+
+    expected = list(process_paths(img_paths, config_path))
+    timer = StageTimer()
+    # Fewer slots than images, so the readers wait for free slots
+    results = list(
+        process_paths_shared(
+            img_paths, config_path, num_croppers=2, num_slots=2, timer=timer
+        )
+    )
+    assert [r.path for r in results] == img_paths
+    assert [r.digits for r in results] == [r.digits for r in expected]
+    assert [r.error is None for r in results] == [
+        r.error is None for r in expected
+    ]
+    names = {record.name for record in timer.records}
+    assert {"imread", "crop", "find_contours"} <= names
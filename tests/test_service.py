@@ -0,0 +1,174 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from extract_digit.batch import process_paths
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.service import DigitService, ServiceClient, ServiceError
+from extract_digit.synthetic import (
+    expected_digits,
+    random_reading,
+    render_photo,
+    synthetic_config,
+)
+
+IMG_SIZE = (720, 960)
+READINGS = ["905", "1847", "260", "1013"]
+
+
+def _encoded_photos() -> list[bytes]:
+    cfg = synthetic_config(IMG_SIZE)
+    rng = np.random.default_rng(0)
+    contents = []
+    for reading in READINGS:
+        img = render_photo(
+            reading, cfg.crop_transform.crop_area_vertices, IMG_SIZE, 4.0, rng
+        )
+        contents.append(cv2.imencode(".png", img)[1].tobytes())
+    return contents
+
+
+def _service(queue_size: int = 16) -> DigitService:
+    pipeline = ExtractDigitPipeline(synthetic_config(IMG_SIZE))
+    return DigitService(
+        pipeline, num_threads=2, queue_size=queue_size, max_batch_delay=0.02
+    )
+
+
+def test_service_reads_images_over_http(tmp_path: Path) -> None:
+    contents = _encoded_photos()
+
+    def read_all(port: int) -> list[list[str]]:
+        # One client per thread
+        def read(content: bytes) -> list[str]:
+            with ServiceClient(port=port) as client:
+                return client.read(content)
+
+        with ThreadPoolExecutor(len(contents)) as executor:
+            return list(executor.map(read, contents))
+
+    async def scenario() -> None:
+        loop = asyncio.get_running_loop()
+        service = _service()
+        await service.start(port=0)
+        port = service.address[1]
+        readings = await loop.run_in_executor(None, read_all, port)
+        assert readings == [expected_digits(r) for r in READINGS]
+
+        with ServiceClient(port=port) as client:
+            with pytest.raises(ServiceError) as e:
+                await loop.run_in_executor(None, client.read, b"not an image")
+            assert e.value.status == 422
+            stats = await loop.run_in_executor(None, client.stats)
+        assert stats["num_requests"] == 5
+        assert stats["num_failed"] == 1
+        assert stats["prepare_queue_depth"] == 0
+        assert stats["latency"]["max"] > 0
+        assert stats["batch_size_mean"] >= 1
+        await service.stop()
+
+        service = _service()
+        unix_path = tmp_path / "service.sock"
+        await service.start(unix_path=unix_path)
+        with ServiceClient(unix_path=unix_path) as client:
+            digits = await loop.run_in_executor(None, client.read, contents[1])
+        assert digits == expected_digits(READINGS[1])
+        await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_service_rejects_images_beyond_the_queue() -> None:
+    content = _encoded_photos()[0]
+
+    async def scenario() -> None:
+        service = _service(queue_size=2)
+        await service.start(port=0)
+        # Every read is queued before the workers take any of them
+        results = await asyncio.gather(
+            *(service.read(content) for _ in range(6)),
+            return_exceptions=True,
+        )
+        rejected = [r for r in results if isinstance(r, ServiceError)]
+        assert len(rejected) == 4
+        assert all(e.status == 503 for e in rejected)
+        assert results[:2] == [expected_digits(READINGS[0])] * 2
+        assert service.stats()["num_rejected"] == 4
+
+        # Accepted images are still answered when stopping
+        pending = asyncio.ensure_future(service.read(content))
+        await asyncio.sleep(0)
+        await service.stop()
+        assert pending.result() == expected_digits(READINGS[0])
+        with pytest.raises(ServiceError):
+            await service.read(content)
+
+    asyncio.run(scenario())
+
+
+def test_service_prepares_images_with_a_pipeline_per_thread() -> None:
+    async def scenario() -> None:
+        loop = asyncio.get_running_loop()
+        service = _service()
+        await service.start(port=0)
+        # Both threads of the pool are busy at the same time
+        barrier = threading.Barrier(service.num_threads)
+
+        def thread_pipeline() -> ExtractDigitPipeline:
+            barrier.wait(timeout=5)
+            pipeline: ExtractDigitPipeline = service._local.pipeline
+            return pipeline
+
+        pipelines = await asyncio.gather(
+            *(
+                loop.run_in_executor(service._executor, thread_pipeline)
+                for _ in range(service.num_threads)
+            )
+        )
+        await service.stop()
+        assert len({id(p) for p in pipelines}) == service.num_threads
+        assert all(p is not service.pipeline for p in pipelines)
+
+    asyncio.run(scenario())
+
+
+def test_service_reads_as_the_run_command(tmp_path: Path) -> None:
+    cfg = synthetic_config(IMG_SIZE)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(cfg.model_dump_json())
+    rng = np.random.default_rng(1)
+    img_paths = []
+    for i in range(6):
+        reading = random_reading(rng, num_digits=3 + i % 2)
+        # Noisier photos too, which may be misread the same way
+        noise = 4.0 + 6.0 * (i % 3)
+        img = render_photo(
+            reading,
+            cfg.crop_transform.crop_area_vertices,
+            IMG_SIZE,
+            noise,
+            rng,
+        )
+        img_path = tmp_path / f"{i}.png"
+        cv2.imwrite(str(img_path), img)
+        img_paths.append(img_path)
+    expected = [
+        result.digits for result in process_paths(img_paths, config_path)
+    ]
+
+    async def scenario() -> list[list[str]]:
+        service = _service()
+        await service.start(port=0)
+        # Read at once so that they are estimated in batches
+        readings = await asyncio.gather(
+            *(service.read(img_path.read_bytes()) for img_path in img_paths)
+        )
+        await service.stop()
+        return list(readings)
+
+    assert asyncio.run(scenario()) == expected
@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from extract_digit.estimate_digit import DigitEstimate
+from extract_digit.param_config import DEFAULT_CONFIG_PATH
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.stream import (
+    ChangeDetector,
+    TemporalFilter,
+    open_capture,
+    read_frames,
+    stream_readings,
+)
+
+
+def _write_video(path: Path, num_frames: int, fps: float) -> None:
+    writer = cv2.VideoWriter(
+        str(path), cv2.VideoWriter.fourcc(*"MJPG"), fps, (320, 240), False
+    )
+    for i in range(num_frames):
+        writer.write(np.full((240, 320), i * 8, np.uint8))
+    writer.release()
+
+
+def test_read_frames_skips_frames(tmp_path: Path) -> None:
+    video_path = tmp_path / "display.avi"
+    _write_video(video_path, 20, 10)
+
+    frames = list(read_frames(open_capture(str(video_path)), frame_step=3))
+    assert [f.frame_index for f in frames] == [0, 3, 6, 9, 12, 15, 18]
+    assert frames[0].img.ndim == 2
+
+    frames = list(read_frames(open_capture(str(video_path)), sample_rate=4))
+    assert [f.frame_index for f in frames] == [0, 3, 6, 9, 12, 15, 18]
+    np.testing.assert_allclose(
+        [f.timestamp for f in frames][:3], [0.0, 0.3, 0.6]
+    )
+
+
+def test_stream_readings_survives_bad_frames(tmp_path: Path) -> None:
+    video_path = tmp_path / "display.avi"
+    _write_video(video_path, 5, 10)
+    pipeline = ExtractDigitPipeline.from_json(DEFAULT_CONFIG_PATH)
+
+    # The crop area is outside of these small frames
+    readings = list(stream_readings(str(video_path), pipeline))
+    assert [r.frame_index for r in readings] == [0, 1, 2, 3, 4]
+    assert all(r.digits == [""] * 4 for r in readings)
+
+
+def test_change_detector_counts_unchanged_frames() -> None:
+    detector = ChangeDetector(thresh=2.0)
+    rng = np.random.default_rng(0)
+    img = np.full((200, 300), 170, np.uint8)
+    img[40:160, 100:120] = 40
+    noisy = np.clip(img + rng.normal(0, 4, img.shape), 0, 255)
+
+    assert detector.is_changed(img)
+    assert not detector.is_changed(noisy.astype(np.uint8))
+    changed = img.copy()
+    changed[40:160, 200:220] = 40
+    assert detector.is_changed(changed)
+    assert not detector.is_changed(changed)
+    assert (detector.num_frames, detector.num_unchanged) == (4, 2)
+
+
+def _estimates(digits: str, confidences: list[float]) -> list[DigitEstimate]:
+    return [
+        DigitEstimate(d, c, 0.2, 0, d) for d, c in zip(digits, confidences)
+    ]
+
+
+def test_temporal_filter_corrects_outlying_digits() -> None:
+    temporal_filter = TemporalFilter(min_confidence=0.5, confirm_frames=2)
+    assert temporal_filter.update(_estimates("123", [1, 1, 1])) == (
+        ["1", "2", "3"],
+        False,
+    )
+    # A single outlier is not accepted
+    assert temporal_filter.update(_estimates("128", [1, 1, 1])) == (
+        ["1", "2", "3"],
+        True,
+    )
+    # A low confidence digit is replaced by the accepted one
+    assert temporal_filter.update(_estimates("723", [0.2, 1, 1])) == (
+        ["1", "2", "3"],
+        True,
+    )
+    # A change read in consecutive frames is accepted
+    temporal_filter.update(_estimates("124", [1, 1, 1]))
+    assert temporal_filter.update(_estimates("124", [1, 1, 1])) == (
+        ["1", "2", "4"],
+        False,
+    )
+    assert (temporal_filter.num_frames, temporal_filter.num_corrected) == (
+        5,
+        3,
+    )
+    # An unconfident read in between breaks the consecutive frames
+    temporal_filter.update(_estimates("125", [1, 1, 1]))
+    temporal_filter.update(_estimates("125", [1, 1, 0.2]))
+    assert temporal_filter.update(_estimates("125", [1, 1, 1])) == (
+        ["1", "2", "4"],
+        True,
+    )
+    assert temporal_filter.update(_estimates("125", [1, 1, 1])) == (
+        ["1", "2", "5"],
+        False,
+    )
@@ -0,0 +1,156 @@
+import csv
+import json
+from pathlib import Path
+from typing import Any
+
+import cv2
+import numpy as np
+import pytest
+
+import extract_digit.sweep as sweep_module
+from extract_digit.cli import EXIT_OK, main
+from extract_digit.param_config import BinalizeParams, Configurations
+from extract_digit.sweep import expand_grid, read_labels, sweep
+from extract_digit.synthetic import (
+    expected_digits,
+    render_photo,
+    synthetic_config,
+)
+
+IMG_SIZE = (720, 960)
+READINGS = ["905", "1847", "260"]
+GRIDS: dict[str, dict[str, list[Any]]] = {
+    "binalize": {"adaptive_thresh_C": [1, 3]},
+    "estimation": {"filling_area_ratio_thresh": [0.2, 0.95]},
+}
+
+
+def _make_labeled_images(tmp_path: Path) -> Path:
+    cfg = synthetic_config(IMG_SIZE)
+    rng = np.random.default_rng(0)
+    labels_path = tmp_path / "labels.csv"
+    with open(labels_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["path", "4th-digit", "3rd-digit", "2nd-digit", "1st-digit"]
+        )
+        for i, reading in enumerate(READINGS):
+            img = render_photo(
+                reading,
+                cfg.crop_transform.crop_area_vertices,
+                IMG_SIZE,
+                4.0,
+                rng,
+            )
+            cv2.imwrite(str(tmp_path / f"img_{i}.png"), img)
+            writer.writerow(
+                [tmp_path / f"img_{i}.png", *expected_digits(reading)]
+            )
+    return labels_path
+
+
+def test_expand_grid() -> None:
+    base = synthetic_config(IMG_SIZE).binalize
+    grid: dict[str, list[Any]] = {
+        "adaptive_thresh_C": [1, 3],
+        "mode": ["full", "fast"],
+    }
+    params = expand_grid(base, grid)
+    assert [(p.adaptive_thresh_C, p.mode) for p in params] == [
+        (1, "full"),
+        (1, "fast"),
+        (3, "full"),
+        (3, "fast"),
+    ]
+    assert all(isinstance(p, BinalizeParams) for p in params)
+    assert expand_grid(base, {}) == [base]
+    with pytest.raises(ValueError):
+        expand_grid(base, {"unknown": [1]})
+    with pytest.raises(ValueError):
+        expand_grid(base, {"mode": ["slow"]})
+    with pytest.raises(ValueError, match="has no values"):
+        expand_grid(base, {"adaptive_thresh_C": []})
+
+
+def test_sweep_memoizes_stages(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    labels_path = _make_labeled_images(tmp_path)
+    labels = read_labels(labels_path)
+    assert labels[tmp_path / "img_1.png"] == ["1", "8", "4", "7"]
+    # A later row of the same image, as appended by a resumed run
+    with open(labels_path, "a", newline="") as f:
+        csv.writer(f).writerow([tmp_path / "img_1.png", "1", "8", "4", "1"])
+    assert read_labels(labels_path)[tmp_path / "img_1.png"][-1] == "1"
+
+    num_calls = 0
+    find_contours = sweep_module.find_contours
+
+    def counted_find_contours(*args: Any) -> Any:
+        nonlocal num_calls
+        num_calls += 1
+        return find_contours(*args)
+
+    monkeypatch.setattr(sweep_module, "find_contours", counted_find_contours)
+    results = sweep(labels, synthetic_config(IMG_SIZE), GRIDS)
+
+    # Contours are found once per image and binalize setting
+    assert num_calls == len(READINGS) * 2
+    assert len(results) == 4
+    best = results[0]
+    assert best.accuracy == 1.0
+    assert best.estimation.filling_area_ratio_thresh == 0.2
+    assert results[-1].accuracy < 1.0
+    assert all(r.num_images == len(READINGS) for r in results)
+
+
+def test_sweep_command(tmp_path: Path) -> None:
+    labels_path = _make_labeled_images(tmp_path)
+    grid_path = tmp_path / "grid.json"
+    grid_path.write_text(json.dumps(GRIDS))
+    config_path = tmp_path / "config.json"
+    config_path.write_text(synthetic_config(IMG_SIZE).model_dump_json())
+    out_path = tmp_path / "sweep.csv"
+    best_path = tmp_path / "best.json"
+    args = ["sweep", str(labels_path), str(grid_path)]
+    args += ["--config", str(config_path), "--out", str(out_path)]
+    args += ["--workers", "2", "--best-config", str(best_path)]
+
+    assert main(args) == EXIT_OK
+    with open(out_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 4
+    assert list(rows[0]) == [
+        "accuracy",
+        "num_correct",
+        "num_failed",
+        "num_images",
+        "binalize.adaptive_thresh_C",
+        "estimation.filling_area_ratio_thresh",
+    ]
+    assert float(rows[0]["accuracy"]) == 1.0
+    best_cfg = Configurations.load_json(best_path)
+    assert best_cfg.estimation.filling_area_ratio_thresh == 0.2
+
+    # A field without values is a usage error, not a crash
+    grid_path.write_text(json.dumps({"binalize": {"adaptive_thresh_C": []}}))
+    assert main(args) == 2
+
+
+def test_sweep_reads_labels_written_by_run(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _make_labeled_images(tmp_path)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(synthetic_config(IMG_SIZE).model_dump_json())
+    (tmp_path / "out").mkdir()
+    labels_path = tmp_path / "out" / "labels.csv"
+    # Paths are written as given, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    args = ["run", "img_0.png", "img_1.png", "--config", str(config_path)]
+    assert main(args + ["--out", str(labels_path)]) == EXIT_OK
+
+    labels = read_labels(labels_path)
+    assert list(labels) == [Path("img_0.png"), Path("img_1.png")]
+    results = sweep(labels, synthetic_config(IMG_SIZE), GRIDS)
+    assert results[0].accuracy == 1.0
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import numpy as np
+
+from extract_digit.benchmark import benchmark_case
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.synthetic import (
+    expected_digits,
+    render_photo,
+    synthetic_config,
+)
+
+
+def test_pipeline_reads_synthetic_photos() -> None:
+    rng = np.random.default_rng(0)
+    for img_size, rotation, skew in [
+        ((720, 960), 0.0, 0.0),
+        ((2000, 2500), 7.0, 0.05),
+        ((3000, 4000), -10.0, 0.15),
+    ]:
+        cfg = synthetic_config(img_size, rotation, skew)
+        pipeline = ExtractDigitPipeline(cfg)
+        for reading in ["905", "1847", "260", "1013"]:
+            img = render_photo(
+                reading,
+                cfg.crop_transform.crop_area_vertices,
+                img_size,
+                4.0,
+                rng,
+            )
+            assert pipeline.process(img) == expected_digits(reading)
+
+
+def test_benchmark_case_report(tmp_path: Path) -> None:
+    result = benchmark_case(
+        (720, 960), num_images=4, mode="fast", work_dir=tmp_path
+    )
+    assert result["num_images"] == 4
+    assert 0 <= result["accuracy"] <= 1
+    assert result["throughput"] > 0
+    assert {s["name"] for s in result["stages"]} >= {
+        "imread",
+        "crop",
+        "binalize.fast",
+        "estimate",
+    }
+    assert all(s["num_calls"] == 4 for s in result["stages"])
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from extract_digit.param_config import DEFAULT_CONFIG_PATH, Configurations
+from extract_digit.pipeline import ExtractDigitPipeline
+from extract_digit.timing import StageTimer, trace_memory
+
+
+def test_stage_timer_summary() -> None:
+    timer = StageTimer()
+    src = np.zeros((10, 20), np.uint8)
+    for _ in range(3):
+        timer.call("twice", np.repeat, src, 2, axis=0)
+    with timer.stage("block", [src, src]) as outputs:
+        outputs.append(src[:5])
+
+    summaries = {s.name: s for s in timer.summary()}
+    assert summaries["twice"].num_calls == 3
+    assert summaries["twice"].in_size_mean == 200
+    assert summaries["twice"].out_size_mean == 400
+    assert summaries["twice"].wall_p50 <= summaries["twice"].wall_max
+    assert summaries["block"].in_size_mean == 2
+    assert summaries["block"].out_size_mean == 100
+    assert timer.timings["twice"] == summaries["twice"].wall_total
+
+
+def test_pipeline_records_each_stage(tmp_path: Path) -> None:
+    cfg = Configurations.load_json(DEFAULT_CONFIG_PATH)
+    timer = StageTimer()
+    pipeline = ExtractDigitPipeline(cfg, timer)
+    # Three dark bars on a bright display
+    cropped_img = np.full(cfg.crop_transform.dst_size, 170, np.uint8)
+    for left in (60, 130, 200):
+        cropped_img[40:160, left : left + 40] = 40
+    with trace_memory(num_lines=0):
+        pipeline.process_cropped(cropped_img)
+
+    assert [s.name for s in timer.summary()] == [
+        "binalize.full",
+        "find_contours",
+        "filtering_digit_contours",
+        "fill_contours",
+        "remove_image_margins",
+        "pad_image",
+        "estimate",
+    ]
+    assert timer.records[0].in_size == cropped_img.size
+    assert timer.records[0].out_size == cropped_img.size
+    assert timer.records[0].peak_memory is not None
+
+    timer.to_json(tmp_path / "stages.json")
+    timer.to_csv(tmp_path / "stages.csv")
+    with open(tmp_path / "stages.json") as f:
+        assert len(json.load(f)) == 7
+    with open(tmp_path / "stages.csv") as f:
+        assert len(f.readlines()) == 8
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+
+from extract_digit.writer import (
+    KEY_COLUMNS,
+    FileKey,
+    ResultFormat,
+    ResultWriter,
+    read_done_keys,
+    read_latest_rows,
+)
+
+COLUMNS = KEY_COLUMNS + ("digits",)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_result_writer_resumes_after_crash(
+    tmp_path: Path, fmt: ResultFormat
+) -> None:
+    img_paths = []
+    for i in range(3):
+        img_path = tmp_path / f"{i}.png"
+        img_path.write_bytes(b"0" * i)
+        img_paths.append(img_path)
+    out_path = tmp_path / f"out.{fmt}"
+
+    with ResultWriter.open(out_path, COLUMNS, fmt) as writer:
+        for img_path in img_paths[:2]:
+            key = FileKey.of(img_path)
+            assert key is not None
+            writer.write({**key._asdict(), "digits": "0123"})
+    # A row cut off by a crash
+    with open(out_path, "a") as f:
+        f.write(f"{img_paths[2]},2")
+
+    done_keys = read_done_keys(out_path, fmt)
+    assert done_keys == {FileKey.of(p) for p in img_paths[:2]}
+
+    with ResultWriter.open(out_path, COLUMNS, fmt, append=True) as writer:
+        key = FileKey.of(img_paths[2])
+        assert key is not None
+        writer.write({**key._asdict(), "digits": "0456"})
+    assert read_done_keys(out_path, fmt) == {FileKey.of(p) for p in img_paths}
+    num_header_lines = 1 if fmt == "csv" else 0
+    assert len(out_path.read_text().splitlines()) == 3 + num_header_lines
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_retried_images_keep_their_last_row(
+    tmp_path: Path, fmt: ResultFormat
+) -> None:
+    img_paths = [tmp_path / "ok.png", tmp_path / "broken.png"]
+    for img_path in img_paths:
+        img_path.write_bytes(b"0")
+    out_path = tmp_path / f"out.{fmt}"
+    columns = COLUMNS + ("error",)
+
+    # The first run and two resumed runs, in which the broken image fails
+    # again each time
+    for i in range(3):
+        done_keys = read_done_keys(out_path, fmt)
+        with ResultWriter.open(out_path, columns, fmt, append=i > 0) as writer:
+            for img_path in img_paths:
+                key = FileKey.of(img_path)
+                assert key is not None
+                if key in done_keys:
+                    continue
+                is_broken = img_path.name == "broken.png"
+                writer.write(
+                    {
+                        **key._asdict(),
+                        "digits": "" if is_broken else "0123",
+                        "error": f"error {i}" if is_broken else "",
+                    }
+                )
+    num_header_lines = 1 if fmt == "csv" else 0
+    # A row per attempt of the broken image
+    assert len(out_path.read_text().splitlines()) == 4 + num_header_lines
+    assert read_done_keys(out_path, fmt) == {FileKey.of(img_paths[0])}
+
+    rows = read_latest_rows(out_path, fmt)
+    assert list(rows) == [str(p) for p in img_paths]
+    assert rows[str(img_paths[1])]["error"] == "error 2"
+
+
+def test_result_writer_rejects_other_columns(tmp_path: Path) -> None:
+    out_path = tmp_path / "out.csv"
+    out_path.write_text("img_name,digits\na,0123\n")
+    with pytest.raises(ValueError):
+        ResultWriter.open(out_path, COLUMNS, append=True)